@@ -1,53 +1,161 @@
-import torch
+import os
+import sys
+import csv
+import json
+import argparse
 import numpy as np
-from sklearn.preprocessing import StandardScaler
-import torch.nn as nn
-import joblib
-
-class Model(nn.Module):
-    def __init__(self, input_features):
-        super(Model, self).__init__()
-        self.fc1 = nn.Linear(input_features, 5)
-        self.fc2 = nn.Linear(5, 4)
-        self.fc3 = nn.Linear(4, 3)
-        self.fc4 = nn.Linear(3, 1)
-        self.sigmoid = nn.Sigmoid()
-        self.tanh = nn.Tanh()
-
-    def forward(self, x):
-        out = self.fc1(x)
-        out = self.tanh(out)
-        out = self.fc2(out)
-        out = self.tanh(out)
-        out = self.fc3(out)
-        out = self.tanh(out)
-        out = self.fc4(out)
-        out = self.sigmoid(out)
-        return out
-
-loaded_net = Model(input_features=7)
-loaded_net.load_state_dict(torch.load('./models/diabetes_prediction/diabetes_model.pth', weights_only=True))
-loaded_net.eval()
-
-sc = StandardScaler()
-
-X_train = np.array([[6, 148, 72, 35, 0, 33.6, 50],
-                    [1, 85, 66, 29, 0, 26.6, 31],
-                    [8, 183, 64, 0, 0, 23.3, 32]])
-sc.fit(X_train)
-
-joblib.dump(sc, './models/diabetes_prediction/scaler.pkl')
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from models.npz_mlp import NpzMLP, source_digest
+
+model_dir = os.path.dirname(os.path.abspath(__file__))
+weights_path = os.path.join(model_dir, 'diabetes_model.pth')
+scaler_path = os.path.join(model_dir, 'scaler.pkl')
+npz_path = os.path.join(model_dir, 'diabetes_model.npz')
+
+feature_names = ['Pregnancies', 'Glucose', 'BloodPressure', 'SkinThickness', 'Insulin', 'BMI', 'Age']
 
 sample_data = np.array([[6, 148, 72, 35, 0, 33.6, 50]])
-sample_data = sc.transform(sample_data)
-sample_data = torch.tensor(sample_data, dtype=torch.float32)
 
-with torch.no_grad():
-    prediction = loaded_net(sample_data)
+def load_network():
+    """Loads the NumPy export of the network and scaler.
+
+    diabetes_model.npz is evaluated without importing PyTorch or scikit-learn.
+    It is regenerated from diabetes_model.pth and scaler.pkl (which does need
+    them) when it is missing or was exported from different files.
+    """
+    if os.path.exists(npz_path):
+        net = NpzMLP(npz_path)
+        if net.source_digest == source_digest([weights_path, scaler_path]):
+            return net
+    from models.diabetes_prediction.torch_model import export
+    export(npz_path)
+    return NpzMLP(npz_path)
+
+# The exported weights are only read, never written, so concurrent runs can share them safely
+loaded_net = load_network()
+
+def predict_batch(features):
+    """Scores a batch of patients.
+
+    Args:
+        features (array-like): An (n, 7) array of raw features in the order of
+            `feature_names`.
+
+    Returns:
+        np.ndarray: The probability of diabetes for each row, shape (n,).
+    """
+    features = np.asarray(features, dtype=np.float64)
+    if features.ndim != 2 or features.shape[1] != len(feature_names):
+        raise ValueError(f"Expected an (n, {len(feature_names)}) array, got shape {features.shape}")
+    if len(features) == 0:
+        return np.zeros(0)
+
+    return loaded_net.predict(features).reshape(-1)
+
+def run():
+    probability = predict_batch(sample_data)[0]
+    result = "Positive" if probability > 0.5 else "Negative"
+
+    # print(f"Probability of diabetes: {probability:.4f}")
+    # print(f"Prediction: {result}")
+    print(result)
+
+def read_csv_rows(f):
+    reader = csv.reader(f)
+    columns = None
+    for row in reader:
+        if not row:
+            continue
+        if columns is None:
+            columns = list(range(len(feature_names)))
+            # A header row selects the feature columns by name
+            if row[0].strip() and not _is_number(row[0]):
+                header = [name.strip() for name in row]
+                missing = [name for name in feature_names if name not in header]
+                if missing:
+                    raise ValueError(f"CSV header is missing the columns {', '.join(missing)}")
+                columns = [header.index(name) for name in feature_names]
+                continue
+        yield [float(row[i]) for i in columns]
+
+def read_jsonl_rows(f):
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        if isinstance(record, dict):
+            missing = [name for name in feature_names if name not in record]
+            if missing:
+                raise ValueError(f"JSONL record is missing the fields {', '.join(missing)}: {line}")
+            yield [float(record[name]) for name in feature_names]
+        else:
+            yield [float(value) for value in record]
+
+def _is_number(value):
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+def iter_chunks(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield np.array(chunk)
+            chunk = []
+    if chunk:
+        yield np.array(chunk)
+
+def score_file(input_file, output_file, input_format, chunk_size=10000):
+    """Streams rows from a CSV or JSONL file and writes one probability per row.
+
+    Rows are read and scored `chunk_size` at a time, so memory use does not
+    depend on the size of the file.
+
+    Returns:
+        int: The number of rows scored.
+    """
+    rows = read_csv_rows(input_file) if input_format == 'csv' else read_jsonl_rows(input_file)
+    if input_format == 'csv':
+        output_file.write('probability\n')
+
+    count = 0
+    for chunk in iter_chunks(rows, chunk_size):
+        probabilities = predict_batch(chunk)
+        if input_format == 'csv':
+            output_file.writelines(f"{p:.6f}\n" for p in probabilities)
+        else:
+            output_file.writelines(json.dumps({'probability': round(float(p), 6)}) + '\n' for p in probabilities)
+        count += len(probabilities)
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description='Score patients for diabetes risk.')
+    parser.add_argument('-i', '--input', help="CSV or JSONL file of patients, or '-' for stdin. Without it the built-in sample is scored.")
+    parser.add_argument('-o', '--output', default='-', help="File to write probabilities to, or '-' for stdout")
+    parser.add_argument('-f', '--format', choices=['csv', 'jsonl'], help='Input format, inferred from the file extension by default')
+    parser.add_argument('-c', '--chunk-size', type=int, default=10000, help='Rows scored per batch')
+    args = parser.parse_args()
+
+    if args.input is None:
+        run()
+        return
 
-probability = prediction.item()
-result = "Positive" if probability > 0.5 else "Negative"
+    input_format = args.format or ('jsonl' if args.input.endswith(('.jsonl', '.json')) else 'csv')
+    input_file = sys.stdin if args.input == '-' else open(args.input, newline='')
+    output_file = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    try:
+        score_file(input_file, output_file, input_format, chunk_size=args.chunk_size)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
 
-# print(f"Probability of diabetes: {probability:.4f}")
-# print(f"Prediction: {result}")
-print(result)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import os
+import sys
+import torch
+import torch.nn as nn
+import joblib
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from models.npz_mlp import export_mlp
+
+model_dir = os.path.dirname(os.path.abspath(__file__))
+weights_path = os.path.join(model_dir, 'diabetes_model.pth')
+scaler_path = os.path.join(model_dir, 'scaler.pkl')
+npz_path = os.path.join(model_dir, 'diabetes_model.npz')
+
+input_features = 7
+# Activation after each Linear layer of `Model`, in forward order
+layer_activations = ['tanh', 'tanh', 'tanh', 'sigmoid']
+
+class Model(nn.Module):
+    def __init__(self, input_features):
+        super(Model, self).__init__()
+        self.fc1 = nn.Linear(input_features, 5)
+        self.fc2 = nn.Linear(5, 4)
+        self.fc3 = nn.Linear(4, 3)
+        self.fc4 = nn.Linear(3, 1)
+        self.sigmoid = nn.Sigmoid()
+        self.tanh = nn.Tanh()
+
+    def forward(self, x):
+        out = self.fc1(x)
+        out = self.tanh(out)
+        out = self.fc2(out)
+        out = self.tanh(out)
+        out = self.fc3(out)
+        out = self.tanh(out)
+        out = self.fc4(out)
+        out = self.sigmoid(out)
+        return out
+
+def load_model():
+    """Loads the trained network and its fitted scaler."""
+    net = Model(input_features=input_features)
+    net.load_state_dict(torch.load(weights_path, weights_only=True))
+    net.eval()
+    return net, joblib.load(scaler_path)
+
+def export(path=npz_path):
+    """Converts diabetes_model.pth and scaler.pkl into the .npz that predict.py evaluates."""
+    net, scaler = load_model()
+    export_mlp(net.state_dict(), layer_activations, path, scaler=scaler, sources=[weights_path, scaler_path])
+    return path
+
+if __name__ == "__main__":
+    print(f"Wrote {export()}")
@@ -0,0 +1,100 @@
+import os
+import hashlib
+import numpy as np
+
+# Elementwise activations the runtime can apply after a Linear layer
+activations = {
+    'identity': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'tanh': np.tanh,
+    # The tanh form of the logistic function cannot overflow for large negative inputs
+    'sigmoid': lambda x: 0.5 * (1 + np.tanh(0.5 * x)),
+}
+
+
+def source_digest(paths):
+    """Hashes the files an export was made from, so a stale .npz can be detected."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def export_mlp(state_dict, layer_activations, path, scaler=None, sources=()):
+    """Writes the Linear layers of a PyTorch MLP, and its input scaler, to a .npz file.
+
+    Only torch tensors' `.numpy()` is needed here; evaluating the file with
+    `NpzMLP` needs NumPy alone.
+
+    Args:
+        state_dict (dict): `module.state_dict()` of an MLP whose Linear layers
+            appear in forward order as '<name>.weight' / '<name>.bias'.
+        layer_activations (list): Activation after each Linear layer, one of
+            `activations`.
+        path (str): The .npz file to write.
+        scaler: A fitted sklearn StandardScaler applied to raw inputs, or None.
+        sources (list): Files the weights and scaler were loaded from; their
+            digest is stored so callers can tell when to re-export.
+    """
+    names = [key[:-len('.weight')] for key in state_dict if key.endswith('.weight')]
+    if len(names) != len(layer_activations):
+        raise ValueError(f"{len(names)} Linear layers but {len(layer_activations)} activations")
+    unknown = [name for name in layer_activations if name not in activations]
+    if unknown:
+        raise ValueError(f"Unknown activation {unknown[0]!r}, expected one of {sorted(activations)}")
+
+    arrays = {'activations': np.array(layer_activations)}
+    for i, name in enumerate(names):
+        arrays[f'weight_{i}'] = state_dict[f'{name}.weight'].detach().cpu().numpy().astype(np.float32)
+        arrays[f'bias_{i}'] = state_dict[f'{name}.bias'].detach().cpu().numpy().astype(np.float32)
+    if scaler is not None:
+        n_features = arrays['weight_0'].shape[1]
+        mean = scaler.mean_ if getattr(scaler, 'with_mean', True) and scaler.mean_ is not None else np.zeros(n_features)
+        scale = scaler.scale_ if getattr(scaler, 'with_std', True) and scaler.scale_ is not None else np.ones(n_features)
+        arrays['scaler_mean'] = np.asarray(mean, dtype=np.float64)
+        arrays['scaler_scale'] = np.asarray(scale, dtype=np.float64)
+    if sources:
+        arrays['source_digest'] = np.array(source_digest(sources))
+
+    # Per process, since predictor workers that find the export stale may all regenerate it at once;
+    # np.savez appends .npz to any other name
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+class NpzMLP:
+    """Evaluates an MLP exported by `export_mlp` with vectorised NumPy.
+
+    Layers are evaluated in float32, like the PyTorch model, on a whole batch
+    at once; loading takes a few KB and no PyTorch import.
+
+    Args:
+        path (str): The .npz file written by `export_mlp`.
+    """
+
+    def __init__(self, path):
+        with np.load(path, allow_pickle=False) as data:
+            layer_activations = [str(name) for name in data['activations']]
+            self.weights = [np.ascontiguousarray(data[f'weight_{i}'].T) for i in range(len(layer_activations))]
+            self.biases = [data[f'bias_{i}'] for i in range(len(layer_activations))]
+            self.mean = data['scaler_mean'] if 'scaler_mean' in data else None
+            self.scale = data['scaler_scale'] if 'scaler_scale' in data else None
+            self.source_digest = str(data['source_digest']) if 'source_digest' in data else None
+        self.activations = [activations[name] for name in layer_activations]
+        self.n_features = self.weights[0].shape[0]
+
+    def predict(self, features):
+        """Runs the scaler and every layer on an (n, n_features) batch.
+
+        Returns:
+            np.ndarray: The network output, shape (n, n_outputs), float64.
+        """
+        x = np.asarray(features, dtype=np.float64)
+        if self.mean is not None:
+            x = (x - self.mean) / self.scale
+        x = x.astype(np.float32)
+        for weight, bias, activation in zip(self.weights, self.biases, self.activations):
+            x = activation(x @ weight + bias)
+        return x.astype(np.float64)
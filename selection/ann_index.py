@@ -0,0 +1,214 @@
+import os
+import threading
+import numpy as np
+
+
+class IVFIndex:
+    """Inverted-file (IVF) index for inner-product search over unit vectors.
+
+    Vectors are partitioned by a spherical k-means coarse quantizer. A query is
+    compared against the centroids first and then only against the vectors of
+    the `nprobe` closest partitions, so a lookup touches a small fraction of the
+    data instead of every row.
+
+    Args:
+        dim (int): Dimensionality of the vectors.
+        nlist (int): Number of partitions. Chosen from the size of the first
+            batch passed to `add` when omitted.
+        nprobe (int): Number of partitions scanned per query.
+    """
+
+    def __init__(self, dim, nlist=None, nprobe=8, tag=''):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        # Free-form string persisted with the index, e.g. a fingerprint of its source data
+        self.tag = tag
+        self.centroids = None
+        self._list_vectors = []
+        self._list_ids = []
+        # Vectors added since the last search, merged into their lists lazily
+        self._pending = []
+        self._lock = threading.Lock()
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def train(self, vectors, iterations=10, max_samples=None, seed=0):
+        """Fits the coarse quantizer with spherical k-means.
+
+        Args:
+            vectors (np.ndarray): Training vectors, one per row.
+            iterations (int): Number of k-means iterations.
+            max_samples (int): Upper bound on the rows used for training.
+                Defaults to 32 rows per partition.
+            seed (int): Seed for sampling and centroid initialisation.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.nlist is None:
+            self.nlist = max(1, int(4 * np.sqrt(len(vectors))))
+        self.nlist = max(1, min(self.nlist, len(vectors)))
+
+        rng = np.random.default_rng(seed)
+        max_samples = max_samples or 32 * self.nlist
+        if len(vectors) > max_samples:
+            vectors = vectors[rng.choice(len(vectors), max_samples, replace=False)]
+
+        centroids = vectors[rng.choice(len(vectors), self.nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, vectors)
+            empty = np.bincount(assignment, minlength=self.nlist) == 0
+            # Partitions that lost all their vectors are reseeded from random rows
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+            centroids = _normalize(sums)
+
+        self.centroids = centroids
+        self._list_vectors = [np.zeros((0, self.dim), dtype=np.float32) for _ in range(self.nlist)]
+        self._list_ids = [np.zeros(0, dtype=np.int64) for _ in range(self.nlist)]
+
+    def add(self, vectors, ids):
+        """Inserts vectors into the index, training it first if needed.
+
+        Args:
+            vectors (np.ndarray): Unit vectors to insert, one per row.
+            ids (array-like): Integer id returned by `search` for each row.
+        """
+        vectors = np.ascontiguousarray(np.atleast_2d(vectors), dtype=np.float32)
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        if len(vectors) != len(ids):
+            raise ValueError("vectors and ids must have the same length")
+        if len(vectors) == 0:
+            return
+        if not self.is_trained:
+            self.train(vectors)
+
+        # Under the lock, so a concurrent flush never swaps _pending out from under this append
+        with self._lock:
+            self._pending.append((vectors, ids))
+            self._size += len(ids)
+
+    def _flush(self):
+        if not self._pending:
+            return
+        with self._lock:
+            if self._pending:
+                self._merge_pending()
+
+    def _merge_pending(self):
+        vectors = np.concatenate([v for v, _ in self._pending])
+        ids = np.concatenate([i for _, i in self._pending])
+        self._pending = []
+
+        assignment = np.argmax(vectors @ self.centroids.T, axis=1)
+        order = np.argsort(assignment, kind='stable')
+        lists, starts = np.unique(assignment[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        for list_id, start, end in zip(lists, starts, ends):
+            rows = order[start:end]
+            self._list_vectors[list_id] = np.concatenate([self._list_vectors[list_id], vectors[rows]])
+            self._list_ids[list_id] = np.concatenate([self._list_ids[list_id], ids[rows]])
+
+    def remapped(self, mapping):
+        """Returns a copy of the index with its ids renumbered, dropping those mapped to -1.
+
+        Lets an index follow its source data when rows are removed or reordered
+        without re-inserting the vectors that stayed. The centroids are shared
+        and this index is left untouched, so it can keep serving searches.
+
+        Args:
+            mapping (np.ndarray): New id for every old id, indexed by old id.
+        """
+        mapping = np.asarray(mapping, dtype=np.int64)
+        self._flush()
+        index = IVFIndex(self.dim, nlist=self.nlist, nprobe=self.nprobe, tag=self.tag)
+        index.centroids = self.centroids
+        for vectors, ids in zip(self._list_vectors, self._list_ids):
+            new_ids = mapping[ids]
+            keep = new_ids >= 0
+            index._list_vectors.append(vectors if keep.all() else vectors[keep])
+            index._list_ids.append(new_ids[keep])
+            index._size += int(keep.sum())
+        return index
+
+    def search(self, query, k=10, nprobe=None):
+        """Returns the approximate top-k vectors by inner product.
+
+        Args:
+            query (np.ndarray): A single unit vector.
+            k (int): Number of results.
+            nprobe (int): Partitions to scan, overriding the index default.
+
+        Returns:
+            tuple: (scores, ids) arrays sorted by descending score. Fewer than
+            k results are returned when the probed partitions are too small.
+        """
+        if self._size == 0:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+        self._flush()
+
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        centroid_scores = self.centroids @ query
+        if nprobe < self.nlist:
+            probed = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probed = np.arange(self.nlist)
+
+        scores = [self._list_vectors[list_id] @ query for list_id in probed]
+        ids = [self._list_ids[list_id] for list_id in probed]
+        scores = np.concatenate(scores)
+        ids = np.concatenate(ids)
+
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            scores, ids = scores[top], ids[top]
+        order = np.argsort(-scores, kind='stable')
+        return scores[order], ids[order]
+
+    def save(self, path):
+        """Writes the index to an .npz file atomically."""
+        self._flush()
+        if not self.is_trained:
+            raise ValueError("Cannot save an index that has not been trained")
+
+        lengths = np.array([len(ids) for ids in self._list_ids], dtype=np.int64)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                vectors=np.concatenate(self._list_vectors),
+                ids=np.concatenate(self._list_ids),
+                lengths=lengths,
+                nprobe=np.array(self.nprobe),
+                tag=np.array(self.tag),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Reads an index written by `save`."""
+        with np.load(path) as data:
+            centroids = data['centroids']
+            index = cls(centroids.shape[1], nlist=len(centroids),
+                        nprobe=int(data['nprobe']), tag=str(data['tag']))
+            index.centroids = centroids
+            offsets = np.concatenate([[0], np.cumsum(data['lengths'])])
+            vectors, ids = data['vectors'], data['ids']
+            index._list_vectors = [vectors[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+            index._list_ids = [ids[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+            index._size = len(ids)
+        return index
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
@@ -0,0 +1,91 @@
+import asyncio
+
+
+class MicroBatcher:
+    """Groups concurrent requests into batches for a function that handles many inputs at once.
+
+    The first request of a batch waits at most `max_wait` seconds for others
+    to join it, and a batch is sent as soon as it holds `max_batch_size`
+    requests. Batches run one at a time on a worker thread, so the event loop
+    keeps accepting requests, and those arriving while a batch is running form
+    the next one.
+
+    Args:
+        batch_fn (callable): Maps a list of inputs to a list of results of the
+            same length, e.g. `embedding_model_selection_batch`.
+        max_batch_size (int): Largest number of inputs per call to `batch_fn`.
+        max_wait (float): Seconds the first input waits for a batch to fill.
+        executor (concurrent.futures.Executor): Runs `batch_fn`; defaults to
+            the event loop's default executor.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=32, max_wait=0.005, executor=None):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.executor = executor
+        self.batches = 0
+        self.items = 0
+        self._queue = None
+        self._task = None
+
+    async def submit(self, item):
+        """Queues one input and returns its result once its batch has run."""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                # Requests that arrived while the last batch was running are taken without waiting
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.batch_fn, items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"batch_fn returned {len(results)} results for {len(items)} inputs")
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+
+            self.batches += 1
+            self.items += len(items)
+            for (_, future), result in zip(batch, results):
+                # The client may have disconnected and cancelled its future
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': self.items / self.batches if self.batches else 0.0,
+        }
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
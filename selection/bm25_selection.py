@@ -0,0 +1,325 @@
+import re
+import math
+import threading
+from collections import Counter
+import numpy as np
+from selection.registry import get_registry
+from selection.tracing import span
+
+word_pattern = re.compile(r'\w+')
+
+# Standard BM25 parameters: term frequency saturation and document length normalisation
+default_k1 = 1.2
+default_b = 0.75
+
+
+def model_terms(model):
+    """The words BM25 indexes for a registry entry: its description, tags and keywords."""
+    text = ' '.join([model.get('description', '')] + model.get('tags', []) + model.get('keywords', []))
+    return word_pattern.findall(text.lower())
+
+
+class BM25Index:
+    """Inverted index over registry entries scored with Okapi BM25.
+
+    Each term's postings are two NumPy arrays, document slots and term
+    frequencies, so scoring a query term is a handful of vectorised
+    operations over the documents that contain it rather than a loop over
+    the registry. Documents are numbered by slot; removing an entry marks its
+    slot dead and its postings are dropped lazily the next time one of its
+    terms is queried. The whole index is rebuilt once dead slots outnumber
+    live ones.
+
+    Query terms are scored rarest first. Once the k-th best score so far
+    beats the most the remaining, common terms could add to any document
+    (their idf times the largest term-frequency weight in their postings),
+    those terms are only looked up for the documents that can still reach
+    the top k, and that set shrinks again after every term. Words like "for"
+    that occur in every description so never cost a pass over the whole
+    registry. Each posting's term-frequency weight is cached until the average
+    document length changes, so scoring a term is one multiply-add; terms in
+    at least half the registry also keep their weights as a dense row over
+    all slots, no bigger than their postings, so scoring them needs no
+    scattered writes at all.
+
+    `update` applies a new version of the registry by touching only the
+    entries that were added, changed or removed.
+
+    Args:
+        models (list): Model entries as found in models.json.
+        k1 (float): Term frequency saturation.
+        b (float): Strength of document length normalisation.
+    """
+
+    def __init__(self, models, k1=default_k1, b=default_b):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._build(models)
+
+    def _build(self, models):
+        self._vocabulary = {}
+        self._models = {}
+        self._slots = {}
+        self._paths = []
+        doc_terms = []
+        doc_lengths = []
+        term_ids, doc_ids, frequencies = [], [], []
+        for slot, model in enumerate(models):
+            counts = Counter(model_terms(model))
+            terms = np.array([self._vocabulary.setdefault(term, len(self._vocabulary)) for term in counts],
+                             dtype=np.int32)
+            doc_terms.append(terms)
+            doc_lengths.append(sum(counts.values()))
+            term_ids.append(terms)
+            doc_ids.append(np.full(len(terms), slot, dtype=np.int32))
+            frequencies.append(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+            self._models[model['model_path']] = model
+            self._slots[model['model_path']] = slot
+            self._paths.append(model['model_path'])
+
+        n_terms = len(self._vocabulary)
+        if term_ids:
+            term_ids = np.concatenate(term_ids)
+            doc_ids = np.concatenate(doc_ids)
+            frequencies = np.concatenate(frequencies)
+        else:
+            term_ids = doc_ids = np.zeros(0, dtype=np.int32)
+            frequencies = np.zeros(0, dtype=np.float32)
+        # Stable, so every term's postings stay in slot order
+        order = np.argsort(term_ids, kind='stable')
+        bounds = np.searchsorted(term_ids[order], np.arange(n_terms + 1))
+        sorted_docs, sorted_frequencies = doc_ids[order], frequencies[order]
+        self._postings = [(sorted_docs[bounds[t]:bounds[t + 1]], sorted_frequencies[bounds[t]:bounds[t + 1]])
+                          for t in range(n_terms)]
+        self._pending = {}
+        self._dirty = set()
+        self._df = np.diff(bounds).tolist()
+        # term id -> (slots, weights, largest weight, dense weights or None) for the average length below
+        self._weights = {}
+        self._weights_length = None
+
+        self._doc_terms = doc_terms
+        self._doc_len = np.array(doc_lengths, dtype=np.float32)
+        self._alive = np.ones(len(models), dtype=bool)
+        self._live = len(models)
+        self._total_len = float(self._doc_len.sum())
+        self._order = np.arange(len(models), dtype=np.int64)
+
+    def _grow(self, size):
+        capacity = len(self._alive)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 16)
+        for name, dtype in (('_doc_len', np.float32), ('_alive', bool), ('_order', np.int64)):
+            grown = np.zeros(capacity, dtype=dtype)
+            old = getattr(self, name)
+            grown[:len(old)] = old
+            setattr(self, name, grown)
+
+    def _add(self, model):
+        slot = len(self._paths)
+        self._grow(slot + 1)
+        counts = Counter(model_terms(model))
+        terms = []
+        for term, count in counts.items():
+            term_id = self._vocabulary.get(term)
+            if term_id is None:
+                term_id = self._vocabulary[term] = len(self._vocabulary)
+                self._postings.append((np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)))
+                self._df.append(0)
+            self._pending.setdefault(term_id, []).append((slot, count))
+            self._df[term_id] += 1
+            terms.append(term_id)
+        self._doc_terms.append(np.array(terms, dtype=np.int32))
+        length = sum(counts.values())
+        self._doc_len[slot] = length
+        self._alive[slot] = True
+        self._live += 1
+        self._total_len += length
+        self._models[model['model_path']] = model
+        self._slots[model['model_path']] = slot
+        self._paths.append(model['model_path'])
+
+    def _remove(self, model_path):
+        slot = self._slots.pop(model_path)
+        del self._models[model_path]
+        terms = self._doc_terms[slot]
+        for term_id in terms.tolist():
+            self._df[term_id] -= 1
+        self._dirty.update(terms.tolist())
+        self._alive[slot] = False
+        self._live -= 1
+        self._total_len -= float(self._doc_len[slot])
+        self._doc_len[slot] = 0
+
+    def update(self, models):
+        """Brings the index in line with `models`, re-indexing only the entries that differ.
+
+        Returns:
+            int: Number of entries added, changed or removed.
+        """
+        new_models = {model['model_path']: model for model in models}
+        with self._lock:
+            removed = [path for path in self._models if path not in new_models]
+            touched = [model for path, model in new_models.items() if self._models.get(path) != model]
+            if not removed and not touched:
+                return 0
+            for model_path in removed:
+                self._remove(model_path)
+            for model in touched:
+                if model['model_path'] in self._models:
+                    self._remove(model['model_path'])
+                self._add(model)
+
+            if len(self._paths) - self._live > self._live:
+                self._build(list(new_models.values()))
+            else:
+                # Ties go to the earliest model in models.json, so registry order is kept
+                for position, path in enumerate(new_models):
+                    self._order[self._slots[path]] = position
+        return len(removed) + len(touched)
+
+    def _term_postings(self, term_id):
+        """Returns (slots, frequencies) for a term, merging pending additions and dropping dead slots."""
+        ids, frequencies = self._postings[term_id]
+        pending = self._pending.pop(term_id, None)
+        if pending:
+            ids = np.concatenate([ids, np.array([slot for slot, _ in pending], dtype=np.int32)])
+            frequencies = np.concatenate([frequencies, np.array([count for _, count in pending], dtype=np.float32)])
+        if term_id in self._dirty:
+            self._dirty.discard(term_id)
+            keep = self._alive[ids]
+            ids, frequencies = ids[keep], frequencies[keep]
+        if pending or len(ids) != len(self._postings[term_id][0]):
+            self._postings[term_id] = (ids, frequencies)
+        return ids, frequencies
+
+    def _term_weights(self, term_id, average_length):
+        """Returns (slots, weights, largest weight, dense weights) with each posting's BM25 term-frequency part.
+
+        Dense weights, one per slot, are only kept for terms in at least half the slots and are None otherwise.
+        """
+        if average_length != self._weights_length:
+            self._weights = {}
+            self._weights_length = average_length
+        ids, frequencies = self._term_postings(term_id)
+        cached = self._weights.get(term_id)
+        # _term_postings returns new arrays whenever the postings changed
+        if cached is None or cached[0] is not ids:
+            norm = self.k1 * (1 - self.b + self.b * self._doc_len[ids] / average_length)
+            weights = frequencies * (self.k1 + 1) / (frequencies + norm)
+            dense = None
+            if 2 * len(ids) >= len(self._paths):
+                dense = np.zeros(len(self._paths), dtype=np.float32)
+                dense[ids] = weights
+            cached = self._weights[term_id] = (ids, weights, float(weights.max()) if len(weights) else 0.0, dense)
+        return cached
+
+    def top_k(self, user_message, k=5):
+        """Ranks registry models by BM25 score for the query.
+
+        Only models sharing at least one word with the query are returned.
+
+        Returns:
+            list: Up to k (model_path, score) tuples, best first.
+        """
+        query_terms = set(word_pattern.findall(user_message.lower()))
+        with self._lock:
+            if not self._live:
+                return []
+            average_length = self._total_len / self._live
+            term_ids = [self._vocabulary[term] for term in query_terms if term in self._vocabulary]
+            term_ids = sorted((term_id for term_id in term_ids if self._df[term_id] > 0), key=self._df.__getitem__)
+            terms = []
+            for term_id in term_ids:
+                df = self._df[term_id]
+                idf = math.log(1 + (self._live - df + 0.5) / (df + 0.5))
+                ids, weights, largest, dense = self._term_weights(term_id, average_length)
+                terms.append((idf, ids, weights, dense, idf * largest))
+            bounds = [bound for *_, bound in terms]
+            # remaining[i]: the most terms i.. could add to any one document's score
+            remaining = np.cumsum(bounds[::-1])[::-1].tolist() + [0.0]
+            # Every matching document scores above zero, since idf and the weights are positive
+            scores = np.zeros(len(self._paths), dtype=np.float32)
+            candidates = None
+            for i, (idf, ids, weights, dense, _) in enumerate(terms):
+                # Until the terms seen so far could outscore the rest, no document can be ruled out
+                if i and (candidates is not None or sum(bounds[:i]) > remaining[i]):
+                    if candidates is not None:
+                        pooled = candidates
+                    else:
+                        # A boolean scan is several times cheaper than one over the float scores
+                        pooled = terms[0][1] if i == 1 else np.flatnonzero(scores > 0)
+                    if len(pooled) >= k:
+                        pooled_scores = scores[pooled]
+                        kth = np.partition(pooled_scores, len(pooled) - k)[len(pooled) - k]
+                        # Strictly greater, so an unseen document cannot even tie its way in
+                        if candidates is not None or kth > remaining[i]:
+                            candidates = pooled[pooled_scores + remaining[i] >= kth]
+                if dense is not None:
+                    if candidates is None:
+                        scores += idf * dense
+                    else:
+                        scores[candidates] += idf * dense[candidates]
+                # Binary searches only pay off for candidates well under a tenth of the postings;
+                # otherwise adding every posting is cheaper, and only the candidates' scores are read
+                elif candidates is None or 10 * len(candidates) >= len(ids):
+                    scores[ids] += idf * weights
+                else:
+                    # Postings are in slot order, so each candidate is a binary search away
+                    positions = np.minimum(np.searchsorted(ids, candidates), len(ids) - 1)
+                    hit = ids[positions] == candidates
+                    scores[candidates[hit]] += idf * weights[positions[hit]]
+            if candidates is None:
+                candidates = np.flatnonzero(scores > 0)
+            if not len(candidates):
+                return []
+            candidate_scores = scores[candidates]
+            if len(candidates) > k:
+                kth = np.partition(candidate_scores, len(candidates) - k)[len(candidates) - k]
+                above = np.flatnonzero(candidate_scores > kth)
+                tied = np.flatnonzero(candidate_scores == kth)
+                # Of the models tied at the k-th score only the earliest in registry order make it,
+                # found without sorting what can be thousands of ties
+                needed = k - len(above)
+                if len(tied) > needed:
+                    tied = tied[np.argpartition(self._order[candidates[tied]], needed - 1)[:needed]]
+                keep = np.concatenate([above, tied])
+                candidates, candidate_scores = candidates[keep], candidate_scores[keep]
+            ranked = np.lexsort((self._order[candidates], -candidate_scores))[:k]
+            return [(self._paths[candidates[i]], float(candidate_scores[i])) for i in ranked]
+
+    def select(self, user_message):
+        top = self.top_k(user_message, k=1)
+        return top[0][0] if top else None
+
+
+# Built on first selection, so importing this module neither reads models.json
+# nor starts the registry watcher
+_bm25_index = None
+_index_lock = threading.Lock()
+
+def get_bm25_index():
+    """Returns the index over the shared registry, building it and following reloads on first use."""
+    global _bm25_index
+    if _bm25_index is None:
+        with _index_lock:
+            if _bm25_index is None:
+                registry = get_registry()
+                index = BM25Index(registry.models)
+                registry.subscribe(lambda change: index.update(change.metadata['models']))
+                _bm25_index = index
+    return _bm25_index
+
+def bm25_top_k(user_message, k=5):
+    return get_bm25_index().top_k(user_message, k)
+
+def bm25_model_selection(user_message):
+    with span('selection', selector='bm25'):
+        return get_bm25_index().select(user_message)
+
+if __name__ == "__main__":
+    user_query = input("User: ")
+    for model_path, score in bm25_top_k(user_query):
+        print(f"{score:6.3f}  {model_path}")
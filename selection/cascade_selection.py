@@ -0,0 +1,154 @@
+import os
+import time
+from selection.registry import get_registry
+from selection.tracing import current_span, span, traced
+
+# Cheapest first; a query moves down the list until a tier is confident enough
+default_tiers = tuple((os.getenv("CASCADE_TIERS") or 'keyword,bm25,embedding,llm').split(','))
+
+# Minimum confidence for each tier's answer to be accepted. The last tier, by
+# default the LLM, has no threshold: any answer with confidence above zero is
+# taken, and otherwise the most confident earlier answer is used.
+# `test/tune_cascade.py` picks these for a given registry and query mix.
+default_thresholds = {
+    'keyword': float(os.getenv("CASCADE_KEYWORD_THRESHOLD") or 0.5),
+    'bm25': float(os.getenv("CASCADE_BM25_THRESHOLD") or 0.5),
+    'embedding': float(os.getenv("CASCADE_EMBEDDING_THRESHOLD") or 0.05),
+}
+
+# gpt-4o list prices, in dollars per million tokens
+input_price_per_million = 2.50
+output_price_per_million = 10.00
+# A model path answer is a handful of tokens
+answer_tokens = 10
+
+
+def margin_confidence(ranked):
+    """How far the best score is ahead of the runner-up, relative to the best: 1 for a clear
+    winner, 0 for a tie.
+
+    Args:
+        ranked (list): (model_path, score) tuples, best first.
+
+    Returns:
+        tuple: (model_path, confidence), or (None, 0.0) when nothing was ranked.
+    """
+    if not ranked or ranked[0][1] <= 0:
+        return None, 0.0
+    best = ranked[0][1]
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+    return ranked[0][0], max(0.0, (best - runner_up) / best)
+
+def keyword_tier(user_message):
+    from selection.keyword_based_selection import keyword_model_scores
+    scores = keyword_model_scores(user_message)
+    # sorted() is stable, so equal scores keep registry order
+    return margin_confidence(sorted(scores.items(), key=lambda item: -item[1])[:2])
+
+def bm25_tier(user_message):
+    from selection.bm25_selection import bm25_top_k
+    return margin_confidence(bm25_top_k(user_message, k=2))
+
+def embedding_tier(user_message):
+    from selection.embedding_based_selection import embedding_top_k
+    return margin_confidence(embedding_top_k(user_message, k=2))
+
+def estimate_llm_call(user_message, models_metadata=None):
+    """Estimates the tokens and dollars of one LLM selection call with the full registry in the prompt.
+
+    A shortlisted prompt or a cache hit costs less, so this is an upper bound.
+
+    Returns:
+        tuple: (tokens, dollars).
+    """
+    from selection.llm_based_selection import selection_messages
+    from selection.memory import count_tokens
+
+    metadata = models_metadata if models_metadata is not None else get_registry().metadata
+    prompt_tokens = sum(count_tokens(message['content']) for message in selection_messages(user_message, metadata))
+    dollars = (prompt_tokens * input_price_per_million + answer_tokens * output_price_per_million) / 1e6
+    return prompt_tokens + answer_tokens, dollars
+
+def llm_tier(user_message, use_cache=True):
+    from selection.llm_based_selection import llm_model_selection
+    model_path = (llm_model_selection(user_message, use_cache=use_cache) or '').strip()
+    # The LLM gives no score; an answer that is not a registry path is treated as unsure
+    return model_path, 1.0 if any(model['model_path'] == model_path for model in get_registry().models) else 0.0
+
+# Each takes the user query and returns (model_path or None, confidence in [0, 1])
+tier_selectors = {
+    'keyword': keyword_tier,
+    'bm25': bm25_tier,
+    'embedding': embedding_tier,
+    'llm': llm_tier,
+}
+
+
+@traced('selection', selector='cascade')
+def cascade_model_selection(user_message, thresholds=None, tiers=default_tiers, return_details=False):
+    """Selects a model with the cheapest tier that is confident enough.
+
+    Tiers run one at a time in order. A tier's answer is accepted when its
+    confidence reaches the tier's threshold; otherwise the query moves on to
+    the next, more expensive tier. The last tier's answer is accepted with any
+    confidence above zero; when it gives nothing usable, the most confident
+    answer seen so far is used.
+
+    Args:
+        user_message (str): The user query.
+        thresholds (dict): Minimum confidence per tier, merged over
+            `default_thresholds`.
+        tiers (tuple): Names from `tier_selectors`, cheapest first.
+        return_details (bool): Also return which tier answered and what it cost.
+
+    Returns:
+        str or tuple: The model path, or (model_path, details) when
+        `return_details` is set. details has 'tier', 'confidence', 'seconds'
+        (time spent in the cascade), 'llm_calls', 'estimated_tokens' and
+        'estimated_cost' (dollars, see `estimate_llm_call`) of those calls,
+        and 'attempts', one {'tier', 'model_path', 'confidence', 'seconds'}
+        dict per tier tried.
+    """
+    thresholds = {**default_thresholds, **(thresholds or {})}
+    start = time.perf_counter()
+    attempts = []
+    chosen = None
+    for position, tier in enumerate(tiers):
+        tier_start = time.perf_counter()
+        with span('cascade.tier', tier=tier):
+            model_path, confidence = tier_selectors[tier](user_message)
+        attempt = {'tier': tier, 'model_path': model_path, 'confidence': confidence,
+                   'seconds': time.perf_counter() - tier_start}
+        attempts.append(attempt)
+        last = position == len(tiers) - 1
+        # An unsure last tier (e.g. an LLM answer that is not a registry path) is not taken on trust
+        if model_path and (confidence > 0 if last else confidence >= thresholds.get(tier, 0.0)):
+            chosen = attempt
+            break
+    if chosen is None:
+        answered = [attempt for attempt in attempts if attempt['model_path']]
+        chosen = max(answered, key=lambda attempt: attempt['confidence']) if answered else attempts[-1]
+
+    llm_calls = sum(attempt['tier'] == 'llm' for attempt in attempts)
+    tokens, dollars = estimate_llm_call(user_message) if llm_calls else (0, 0.0)
+    details = {
+        'tier': chosen['tier'],
+        'confidence': chosen['confidence'],
+        'seconds': time.perf_counter() - start,
+        'llm_calls': llm_calls,
+        'estimated_tokens': tokens * llm_calls,
+        'estimated_cost': dollars * llm_calls,
+        'attempts': attempts,
+    }
+    current_span().set(tier=details['tier'], tiers_tried=len(attempts))
+
+    if return_details:
+        return chosen['model_path'], details
+    return chosen['model_path']
+
+if __name__ == "__main__":
+    user_query = input("User: ")
+    selected_model, details = cascade_model_selection(user_query, return_details=True)
+    print(f"Selected Model: {selected_model} (from {details['tier']}, confidence {details['confidence']:.2f}, "
+          f"{details['seconds'] * 1000:.1f} ms, {details['llm_calls']} LLM calls, "
+          f"~${details['estimated_cost']:.4f})")
@@ -1,40 +1,338 @@
 import os
-from transformers import BertTokenizer, BertModel
-import torch
-import json
+import re
+import hashlib
+import threading
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+from selection.ann_index import IVFIndex
+from selection.encoders import load_encoder
+from selection.registry import get_registry
+from selection.tracing import span
 
 base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-models_path = os.path.join(base_dir, 'models.json')
-
-
-with open(models_path) as f:
-    models_metadata = json.load(f)
-
-tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
-bert_model = BertModel.from_pretrained('bert-base-uncased')
-
-def get_embeddings(text):
-    inputs = tokenizer(text, return_tensors='pt')
-    outputs = bert_model(**inputs)
-    embeddings = outputs.last_hidden_state.mean(dim=1).detach().numpy()
-    return embeddings
-
-def embedding_model_selection(user_message):
-    user_embedding = get_embeddings(user_message)
-    best_similarity = -1
-    best_model_path = None
-
-    for model in models_metadata['models']:
-        model_description = model['description'] + ' ' + ' '.join(model['tags'])
-        model_embedding = get_embeddings(model_description)
-        similarity = cosine_similarity(user_embedding, model_embedding)[0][0]
-        if similarity > best_similarity:
-            best_similarity = similarity
-            best_model_path = model['model_path']
-    
-    return best_model_path
+cache_dir = os.path.join(base_dir, '.cache')
+encoder_name = 'bert-base-uncased'
+# One of selection.encoders.encoder_backends; int8 and onnx trade a little accuracy for speed and memory
+encoder_backend = os.getenv("ENCODER_BACKEND") or 'fp32'
+
+# Registries at least this large are searched through the IVF index by default
+ann_min_models = 10000
+
+# torch, transformers and BERT are loaded on first use so importing this module
+# (or anything that imports it) stays cheap
+_encoder = None
+_load_lock = threading.Lock()
+
+# (models, embeddings, hashes, index): the registry entries the matrix was built
+# from, their L2-normalised (description + tags) embeddings one row per entry,
+# the entry hash of every row, and the IVF index over the rows once it is built.
+# Swapped as a whole so a reader never pairs rows with the wrong entries.
+# Built on first selection, which is also when the registry starts being watched.
+_embedding_state = None
+_embeddings_lock = threading.Lock()
+
+def get_encoder():
+    """Returns the shared encoder for `encoder_backend`, loading it on first use.
+
+    Loading is guarded by a lock so concurrent first calls load BERT only once.
+    """
+    global _encoder
+    if _encoder is None:
+        with _load_lock:
+            if _encoder is None:
+                with span('encoder.load', backend=encoder_backend):
+                    _encoder = load_encoder(encoder_name, encoder_backend)
+    return _encoder
+
+def warm_up():
+    """Loads BERT and the model embedding matrix ahead of the first query."""
+    get_encoder()
+    get_model_embeddings()
+
+def get_embeddings(texts, batch_size=32):
+    """Embeds one string or a list of strings with mean-pooled BERT outputs.
+
+    Texts are padded per batch and run through the configured encoder backend;
+    padding positions are masked out of the mean so a text embeds the same
+    whether it is encoded alone or in a batch.
+
+    Args:
+        texts (str or list): The text(s) to embed.
+        batch_size (int): Maximum number of texts per forward pass.
+
+    Returns:
+        np.ndarray: A (len(texts), hidden_size) float32 matrix.
+    """
+    encoder = get_encoder()
+    if isinstance(texts, str):
+        texts = [texts]
+
+    batches = [encoder.embed(texts[start:start + batch_size]) for start in range(0, len(texts), batch_size)]
+    if not batches:
+        return np.zeros((0, encoder.hidden_size), dtype=np.float32)
+    return np.concatenate(batches).astype(np.float32)
+
+def normalize(embeddings):
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+def model_text(model):
+    return model['description'] + ' ' + ' '.join(model['tags'])
+
+def encoder_key():
+    # mmap runs the same fp32 weights, so it shares fp32's vectors; fp32 keeps the
+    # bare model name so existing caches stay valid
+    backend = 'fp32' if encoder_backend == 'mmap' else encoder_backend
+    return encoder_name if backend == 'fp32' else f"{encoder_name}:{backend}"
+
+def cache_path(name):
+    """Returns the path of a cache file for the current encoder.
+
+    Each encoder_key() gets its own embedding cache and index, so switching
+    ENCODER_BACKEND back and forth does not re-embed the whole registry.
+    """
+    key = encoder_key()
+    if key == encoder_name:
+        return os.path.join(cache_dir, f"{name}.npz")
+    suffix = re.sub(r'[^\w.-]+', '_', key)
+    return os.path.join(cache_dir, f"{name}.{suffix}.npz")
+
+def entry_hash(model):
+    # The encoder is part of the key so vectors from another encoder or backend are never reused
+    content = encoder_key() + '\n' + model_text(model)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def load_embedding_cache():
+    """Loads the on-disk embedding cache.
+
+    Returns:
+        dict: Maps the content hash of a model entry to its normalised embedding.
+    """
+    path = cache_path('model_embeddings')
+    if not os.path.exists(path):
+        return {}
+    try:
+        with np.load(path) as data:
+            return dict(zip(data['hashes'].tolist(), data['embeddings']))
+    except (OSError, ValueError, KeyError):
+        # A corrupt or outdated cache is rebuilt rather than trusted
+        return {}
+
+def save_embedding_cache(cache):
+    path = cache_path('model_embeddings')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    hashes = list(cache)
+    # Per process, since workers with the same backend share the file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, hashes=np.array(hashes), embeddings=np.stack([cache[h] for h in hashes]))
+    os.replace(tmp_path, path)
+
+def build_model_embeddings(models, known=None):
+    """Builds the normalised embedding matrix for the given model entries.
+
+    Only entries whose content hash is in neither `known` nor the on-disk cache
+    are run through BERT; the cache is rewritten to hold exactly the current
+    entries.
+
+    Args:
+        models (list): Model entries as found in models.json.
+        known (dict): Embeddings already in memory, by entry hash. When given,
+            the on-disk cache is not read.
+
+    Returns:
+        np.ndarray: A (len(models), hidden_size) float32 matrix of unit vectors.
+    """
+    cache = dict(known) if known is not None else load_embedding_cache()
+    hashes = [entry_hash(model) for model in models]
+    missing = [(h, model) for h, model in zip(hashes, models) if h not in cache]
+
+    if missing:
+        with span('embedding.build', models=len(missing)):
+            new_embeddings = normalize(get_embeddings([model_text(model) for _, model in missing]))
+        for (h, _), embedding in zip(missing, new_embeddings):
+            cache[h] = embedding
+
+    current = {h: cache[h] for h in hashes}
+    if missing or len(current) != len(cache):
+        if current:
+            save_embedding_cache(current)
+
+    if not hashes:
+        return np.zeros((0, get_encoder().hidden_size), dtype=np.float32)
+    return np.stack([current[h] for h in hashes]).astype(np.float32)
+
+def _get_embedding_state():
+    global _embedding_state
+    if _embedding_state is None:
+        with _embeddings_lock:
+            if _embedding_state is None:
+                registry = get_registry()
+                models = registry.models
+                _embedding_state = (models, build_model_embeddings(models),
+                                    [entry_hash(model) for model in models], None)
+                registry.subscribe(lambda change: update_model_embeddings(change.metadata['models']))
+        # A reload that landed while the matrix was built found nothing to update
+        models = get_registry().models
+        if models is not _embedding_state[0]:
+            update_model_embeddings(models)
+    return _embedding_state
+
+def get_model_embeddings():
+    return _get_embedding_state()[1]
+
+def update_model_embeddings(models):
+    """Moves the embedding matrix and IVF index to a new version of the registry.
+
+    Rows of entries whose text is unchanged are reused, so only added or edited
+    entries are run through BERT, and a built index is renumbered and extended
+    instead of being rebuilt. The new matrix and index are computed without
+    holding `_embeddings_lock`; readers keep using the previous ones until the
+    new state is swapped in. Nothing happens if the matrix has not been built yet.
+
+    Returns:
+        int: Number of entries that had to be embedded.
+    """
+    global _embedding_state
+    hashes = [entry_hash(model) for model in models]
+    known = {}
+    missing = None
+    while True:
+        state = _embedding_state
+        if state is None:
+            return 0
+        _, old_embeddings, old_hashes, old_index = state
+        known.update(zip(old_hashes, old_embeddings))
+        if missing is None:
+            missing = len({h for h in hashes if h not in known})
+        embeddings = build_model_embeddings(models, known=known)
+
+        index = None
+        if old_index is not None:
+            # Old row -> new row for entries that kept their text; the rest are dropped and re-added
+            new_rows = {}
+            for row, h in enumerate(hashes):
+                new_rows.setdefault(h, []).append(row)
+            mapping = np.full(len(old_hashes), -1, dtype=np.int64)
+            for row, h in enumerate(old_hashes):
+                if new_rows.get(h):
+                    mapping[row] = new_rows[h].pop(0)
+            index = old_index.remapped(mapping)
+            added = np.array(sorted(row for rows in new_rows.values() for row in rows), dtype=np.int64)
+            index.add(embeddings[added], added)
+            index.tag = _fingerprint(hashes)
+
+        with _embeddings_lock:
+            # The index may have been built meanwhile; start again from that state, reusing these rows
+            if _embedding_state is state:
+                _embedding_state = (models, embeddings, hashes, index)
+                # Saved under the lock so it never races the save in _get_indexed_state
+                if index is not None and len(index):
+                    index.save(cache_path('model_index'))
+                return missing
+        known.update(zip(hashes, embeddings))
+
+def _fingerprint(hashes):
+    return hashlib.sha256(''.join(hashes).encode('utf-8')).hexdigest()
+
+def registry_fingerprint(models):
+    return _fingerprint([entry_hash(model) for model in models])
+
+def _get_indexed_state():
+    """Returns the embedding state with its IVF index, loading or building the index once.
+
+    A persisted index is reused only when it was built from the current registry.
+    """
+    global _embedding_state
+    state = _get_embedding_state()
+    if state[3] is None:
+        with _embeddings_lock:
+            state = _embedding_state
+            if state[3] is None:
+                models, embeddings, hashes, _ = state
+                fingerprint = _fingerprint(hashes)
+                index = None
+                index_path = cache_path('model_index')
+                if os.path.exists(index_path):
+                    try:
+                        index = IVFIndex.load(index_path)
+                    except (OSError, ValueError, KeyError):
+                        index = None
+                if index is None or index.tag != fingerprint:
+                    index = IVFIndex(embeddings.shape[1], tag=fingerprint)
+                    index.add(embeddings, np.arange(len(embeddings)))
+                    if len(index):
+                        index.save(index_path)
+                state = _embedding_state = (models, embeddings, hashes, index)
+    return state
+
+def get_model_index():
+    return _get_indexed_state()[3]
+
+def embedding_top_k(user_message, k=5, use_index=None):
+    """Ranks registry models by cosine similarity to the query.
+
+    Args:
+        user_message (str): The user query.
+        k (int): Number of models to return.
+        use_index (bool): Search the approximate IVF index instead of scanning
+            every embedding. Defaults to True for registries of at least
+            `ann_min_models` entries.
+
+    Returns:
+        list: Up to k (model_path, similarity) tuples, best first.
+    """
+    models, embeddings, _, _ = _get_embedding_state()
+    if len(embeddings) == 0:
+        return []
+    if use_index is None:
+        use_index = len(embeddings) >= ann_min_models
+
+    user_embedding = normalize(get_embeddings(user_message))[0]
+    with span('embedding.search', models=len(embeddings), index=bool(use_index)):
+        if use_index:
+            models, embeddings, _, index = _get_indexed_state()
+            scores, indices = index.search(user_embedding, k)
+        else:
+            similarities = embeddings @ user_embedding
+            if len(similarities) > k:
+                indices = np.argpartition(-similarities, k - 1)[:k]
+            else:
+                indices = np.arange(len(similarities))
+            indices = indices[np.argsort(-similarities[indices], kind='stable')]
+            scores = similarities[indices]
+
+    return [(models[i]['model_path'], float(score)) for i, score in zip(indices, scores)]
+
+def embedding_model_selection(user_message, use_index=None):
+    with span('selection', selector='embedding'):
+        top = embedding_top_k(user_message, k=1, use_index=use_index)
+    if not top:
+        return None
+    return top[0][0]
+
+def embedding_model_selection_batch(user_messages, batch_size=32):
+    """Selects the best model for many queries with batched BERT passes.
+
+    Args:
+        user_messages (list): The user queries.
+        batch_size (int): Maximum number of queries per forward pass.
+
+    Returns:
+        list: One (model_path, similarity) tuple per query, or (None, None) for
+        every query when the registry is empty.
+    """
+    with span('selection.batch', selector='embedding', queries=len(user_messages)):
+        models, embeddings, _, _ = _get_embedding_state()
+        if len(embeddings) == 0:
+            return [(None, None) for _ in user_messages]
+
+        user_embeddings = normalize(get_embeddings(list(user_messages), batch_size=batch_size))
+        with span('embedding.search', models=len(embeddings), index=False):
+            similarities = user_embeddings @ embeddings.T
+            best_indices = np.argmax(similarities, axis=1)
+
+    return [(models[i]['model_path'], float(similarities[row, i]))
+            for row, i in enumerate(best_indices)]
 
 if __name__ == "__main__":
     user_query = input("User: ")
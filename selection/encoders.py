@@ -0,0 +1,206 @@
+import os
+import threading
+import numpy as np
+from selection.tracing import span
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# Pointing this at /dev/shm keeps the mmap backend's weights in shared memory instead of on disk
+export_dir = os.getenv("ENCODER_EXPORT_DIR") or os.path.join(base_dir, '.cache', 'encoders')
+
+# fp32: eager PyTorch, the reference
+# int8: PyTorch with the Linear layers dynamically quantized to int8
+# torchscript: the fp32 model traced with TorchScript
+# onnx / onnx-int8: exported to ONNX (optionally int8-quantized) and run with onnxruntime,
+#   which needs `pip install onnx onnxruntime`; torch is only needed for the first export
+# mmap: fp32 with the weights memory-mapped from a safetensors export, so every process
+#   on the host that uses it shares one physical copy
+encoder_backends = ('fp32', 'int8', 'torchscript', 'onnx', 'onnx-int8', 'mmap')
+
+_export_lock = threading.Lock()
+
+
+def mean_pool(last_hidden_state, attention_mask):
+    """Averages token vectors over the non-padding positions of each text."""
+    mask = attention_mask[..., None].astype(last_hidden_state.dtype)
+    summed = (last_hidden_state * mask).sum(axis=1)
+    return summed / np.maximum(mask.sum(axis=1), 1)
+
+
+class TorchEncoder:
+    """Runs a PyTorch BERT (eager, quantized or traced) and mean-pools its output.
+
+    Args:
+        tokenizer: A Hugging Face BERT tokenizer.
+        model (callable): Maps (input_ids, attention_mask) tensors to the last hidden state.
+        hidden_size (int): Width of the embeddings.
+    """
+
+    def __init__(self, tokenizer, model, hidden_size):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.hidden_size = hidden_size
+
+    def embed(self, texts):
+        import torch
+
+        with span('encoder.tokenize', texts=len(texts)):
+            inputs = self.tokenizer(texts, return_tensors='pt', padding=True, truncation=True)
+        with span('encoder.forward', texts=len(texts)):
+            with torch.inference_mode():
+                hidden = self.model(inputs['input_ids'], inputs['attention_mask'])
+            return mean_pool(hidden.float().numpy(), inputs['attention_mask'].numpy())
+
+
+class OnnxEncoder:
+    """Runs an exported BERT with onnxruntime and mean-pools its output.
+
+    Args:
+        tokenizer: A Hugging Face BERT tokenizer.
+        model_path (str): The .onnx file written by `export_onnx`.
+    """
+
+    def __init__(self, tokenizer, model_path):
+        import onnxruntime
+
+        self.tokenizer = tokenizer
+        self.session = onnxruntime.InferenceSession(model_path, providers=['CPUExecutionProvider'])
+        self.hidden_size = self.session.get_outputs()[0].shape[-1]
+
+    def embed(self, texts):
+        with span('encoder.tokenize', texts=len(texts)):
+            inputs = self.tokenizer(texts, return_tensors='np', padding=True, truncation=True)
+        feed = {
+            'input_ids': inputs['input_ids'].astype(np.int64),
+            'attention_mask': inputs['attention_mask'].astype(np.int64),
+        }
+        with span('encoder.forward', texts=len(texts)):
+            hidden = self.session.run(None, feed)[0]
+            return mean_pool(hidden, feed['attention_mask'])
+
+
+def _hidden_state_model(bert_model):
+    """Wraps a BertModel so it takes positional tensors and returns only the last hidden state."""
+    import torch
+
+    class HiddenState(torch.nn.Module):
+        def __init__(self, bert):
+            super().__init__()
+            self.bert = bert
+
+        def forward(self, input_ids, attention_mask):
+            return self.bert(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    return HiddenState(bert_model).eval()
+
+def _example_inputs(tokenizer):
+    inputs = tokenizer(['an example query', 'a second, somewhat longer example query'],
+                       return_tensors='pt', padding=True)
+    return inputs['input_ids'], inputs['attention_mask']
+
+def export_onnx(encoder_name, tokenizer, quantize=False):
+    """Exports `encoder_name` to ONNX once and returns the path of the .onnx file.
+
+    The export is cached under .cache/encoders, so later processes load it
+    without importing torch.
+    """
+    name = encoder_name.replace('/', '--')
+    fp32_path = os.path.join(export_dir, f"{name}.onnx")
+    path = os.path.join(export_dir, f"{name}-int8.onnx") if quantize else fp32_path
+    if os.path.exists(path):
+        return path
+
+    with _export_lock:
+        if not os.path.exists(fp32_path):
+            import torch
+            from transformers import BertModel
+
+            os.makedirs(export_dir, exist_ok=True)
+            model = _hidden_state_model(BertModel.from_pretrained(encoder_name))
+            tmp_path = f"{fp32_path}.{os.getpid()}.tmp"
+            dynamic = {0: 'batch', 1: 'sequence'}
+            torch.onnx.export(
+                model, _example_inputs(tokenizer), tmp_path,
+                input_names=['input_ids', 'attention_mask'],
+                output_names=['last_hidden_state'],
+                dynamic_axes={'input_ids': dynamic, 'attention_mask': dynamic, 'last_hidden_state': dynamic},
+                opset_version=17,
+                dynamo=False,
+            )
+            os.replace(tmp_path, fp32_path)
+
+        if quantize and not os.path.exists(path):
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, path)
+    return path
+
+def export_safetensors(encoder_name):
+    """Writes the fp32 weights and config of `encoder_name` to .cache/encoders once.
+
+    Returns:
+        tuple: Paths of the .safetensors weights and the config .json.
+    """
+    from selection.mmap_weights import save_module_weights
+
+    name = encoder_name.replace('/', '--')
+    path = os.path.join(export_dir, f"{name}.safetensors")
+    config_path = os.path.join(export_dir, f"{name}.config.json")
+    if os.path.exists(path) and os.path.exists(config_path):
+        return path, config_path
+
+    with _export_lock:
+        if not (os.path.exists(path) and os.path.exists(config_path)):
+            from transformers import BertModel
+
+            os.makedirs(export_dir, exist_ok=True)
+            bert_model = BertModel.from_pretrained(encoder_name)
+            save_module_weights(bert_model, path)
+            tmp_path = f"{config_path}.{os.getpid()}.tmp"
+            bert_model.config.to_json_file(tmp_path)
+            os.replace(tmp_path, config_path)
+    return path, config_path
+
+def _mmap_bert_model(encoder_name):
+    """Builds a BertModel whose weights are the memory-mapped safetensors export, not a private copy."""
+    import torch
+    from transformers import BertConfig, BertModel
+    from selection.mmap_weights import assign_weights, mmap_state_dict
+
+    path, config_path = export_safetensors(encoder_name)
+    # On the meta device no memory is allocated for the randomly initialised weights
+    with torch.device('meta'):
+        bert_model = BertModel(BertConfig.from_json_file(config_path))
+    assign_weights(bert_model, mmap_state_dict(path))
+    return bert_model
+
+def load_encoder(encoder_name, backend='fp32'):
+    """Loads the tokenizer and model for `encoder_name` with the given backend.
+
+    Returns:
+        An encoder with `embed(texts) -> np.ndarray` and `hidden_size`.
+    """
+    if backend not in encoder_backends:
+        raise ValueError(f"Unknown encoder backend {backend!r}, expected one of {encoder_backends}")
+
+    from transformers import BertTokenizer
+    tokenizer = BertTokenizer.from_pretrained(encoder_name)
+
+    if backend in ('onnx', 'onnx-int8'):
+        return OnnxEncoder(tokenizer, export_onnx(encoder_name, tokenizer, quantize=backend == 'onnx-int8'))
+
+    import torch
+    from transformers import BertModel
+
+    bert_model = _mmap_bert_model(encoder_name) if backend == 'mmap' else BertModel.from_pretrained(encoder_name)
+    bert_model.eval()
+    hidden_size = bert_model.config.hidden_size
+    model = _hidden_state_model(bert_model)
+    if backend == 'int8':
+        # In place, so the fp32 Linear weights are freed instead of kept alongside a quantized copy
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    elif backend == 'torchscript':
+        with torch.no_grad():
+            model = torch.jit.freeze(torch.jit.trace(model, _example_inputs(tokenizer), strict=False))
+    return TorchEncoder(tokenizer, model, hidden_size)
@@ -0,0 +1,105 @@
+import os
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
+from selection.result_cache import cached_run
+from selection.tracing import span
+
+# Seconds all models of one fan-out share; models still running then are reported as timed out
+default_deadline = float(os.getenv("FANOUT_DEADLINE_SECONDS") or 30)
+# Candidates taken from the embedding ranking, and how far below the best score they may be
+default_fanout_k = int(os.getenv("FANOUT_K") or 3)
+default_margin = 0.05
+
+# Threads only wait on the model runtime's worker processes, which do the actual work
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='fan-out')
+
+
+def candidate_models(user_message, k=default_fanout_k, margin=default_margin):
+    """Picks the models a query plausibly asks about from the embedding ranking.
+
+    Args:
+        user_message (str): The user query.
+        k (int): Largest number of candidates.
+        margin (float): Keep candidates whose cosine similarity is at most this
+            far below the best one.
+
+    Returns:
+        list: Model paths, best first.
+    """
+    from selection.embedding_based_selection import embedding_top_k
+
+    ranked = embedding_top_k(user_message, k=k)
+    if not ranked:
+        return []
+    best = ranked[0][1]
+    return [model_path for model_path, score in ranked if score >= best - margin]
+
+def _run_one(runtime, model_path, start, deadline, cache):
+    if time.monotonic() >= start + deadline:
+        return None
+    # Absolute, so a model queued behind busy workers only gets what is left once it starts
+    result = cached_run(runtime, model_path, cache=cache, deadline=start + deadline)
+    return result, time.monotonic() - start
+
+def _summarize(model_path, future, done, deadline):
+    if future not in done or (future.exception() is None and future.result() is None):
+        return {'model_path': model_path, 'status': 'timeout',
+                'output': f"Timed out after {deadline} seconds", 'elapsed': None}
+    if future.exception() is not None:
+        error = future.exception()
+        return {'model_path': model_path, 'status': 'error', 'output': f"{type(error).__name__}: {error}", 'elapsed': None}
+    result, elapsed = future.result()
+    if result.returncode == 0:
+        return {'model_path': model_path, 'status': 'ok', 'output': result.stdout.strip(), 'elapsed': elapsed}
+    # The runtime kills a model that overruns its share of the deadline
+    status = 'timeout' if result.stderr.startswith('Model timed out') else 'error'
+    return {'model_path': model_path, 'status': status, 'output': result.stderr.strip(), 'elapsed': elapsed}
+
+def run_models(model_paths, deadline=default_deadline, runtime=None, cache=None):
+    """Runs several models concurrently under one shared deadline.
+
+    Every model is submitted at once to the model runtime, whose worker
+    processes run as many of them side by side as it has workers. Models that
+    have not finished when the deadline passes are reported as timed out; the
+    results of the others are returned regardless. The deadline is passed to
+    the runtime, which stops a model when it passes and never starts one that
+    was still waiting for a worker.
+
+    Args:
+        model_paths (list): Paths of the predictor scripts to run.
+        deadline (float): Seconds to wait for all of them together.
+        runtime: Object with a blocking `run(path, deadline=...)`; defaults to
+            the shared model runtime.
+        cache (ResultCache): Result cache for the runs; defaults to the process-wide one.
+
+    Returns:
+        list: One dict per distinct model path, in the given order, with
+        'model_path', 'status' ('ok', 'error' or 'timeout'), 'output' and
+        'elapsed' seconds (None for timeouts).
+    """
+    if runtime is None:
+        from selection.model_runtime import get_runtime
+        runtime = get_runtime()
+    model_paths = list(dict.fromkeys(model_paths))
+
+    with span('fanout', models=len(model_paths)) as fanout:
+        start = time.monotonic()
+        futures = [_executor.submit(contextvars.copy_context().run, _run_one, runtime, model_path, start, deadline, cache)
+                   for model_path in model_paths]
+        done, _ = wait(futures, timeout=deadline)
+        results = [_summarize(model_path, future, done, deadline) for model_path, future in zip(model_paths, futures)]
+        fanout.set(timeouts=sum(result['status'] == 'timeout' for result in results))
+    return results
+
+def merge_results(results):
+    """Formats fan-out results as one reply, one line per model."""
+    lines = []
+    for result in results:
+        if result['status'] == 'ok':
+            lines.append(f"{result['model_path']}: {result['output']}")
+        elif result['status'] == 'timeout':
+            lines.append(f"{result['model_path']}: no answer ({result['output'].lower()})")
+        else:
+            lines.append(f"Error running the model at {result['model_path']}: {result['output']}")
+    return '\n'.join(lines)
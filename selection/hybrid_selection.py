@@ -1,22 +1,58 @@
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
 from selection.llm_based_selection import llm_model_selection
 from selection.embedding_based_selection import embedding_model_selection
+from selection.tracing import current_span, traced
 
-def hybrid_model_selection(user_message):
-    # get LLM's suggestion
-    llm_suggestion = llm_model_selection(user_message)
-    
-    # get embedding-based suggestion
-    embedding_suggestion = embedding_model_selection(user_message)
-    
-    # Combine both suggestions
-    if llm_suggestion == embedding_suggestion:
-        return llm_suggestion
-    else:
-        # Decide which one to trust or ask the user for clarification
+# Seconds to wait for the LLM before falling back to the embedding suggestion
+default_deadline = 10.0
+
+# Shared so an LLM call that misses its deadline can finish in the background
+# without blocking the caller
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='hybrid-selection')
+
+@traced('selection', selector='hybrid')
+def hybrid_model_selection(user_message, deadline=default_deadline, return_source=False):
+    """Selects a model with the LLM and embedding selectors running concurrently.
+
+    The LLM's suggestion is preferred. If it does not answer within the
+    deadline, or fails, the embedding suggestion is used instead, so latency is
+    bounded by the slower of the two selectors rather than their sum. Why the
+    LLM was passed over is recorded on the selection span as `llm_outcome`
+    ('timeout' or 'error').
+
+    Args:
+        user_message (str): The user query.
+        deadline (float): Seconds to wait for the LLM, or None to wait indefinitely.
+        return_source (bool): Also return which selector the answer came from.
+
+    Returns:
+        str or tuple: The model path, or (model_path, source) with source
+        'llm' or 'embedding' when `return_source` is set.
+    """
+    start = time.monotonic()
+    # Each selector runs in a copy of this context so its spans join the caller's trace
+    llm_future = _executor.submit(contextvars.copy_context().run, llm_model_selection, user_message)
+    embedding_future = _executor.submit(contextvars.copy_context().run, embedding_model_selection, user_message)
+
+    remaining = None if deadline is None else max(0.0, deadline - (time.monotonic() - start))
+    try:
         # we prioritize the LLM's suggestion
-        return llm_suggestion
+        selected_model, source = llm_future.result(timeout=remaining), 'llm'
+    except TimeoutError:
+        current_span().set(llm_outcome='timeout')
+        selected_model, source = embedding_future.result(), 'embedding'
+    except Exception as e:
+        current_span().set(llm_outcome='error', llm_error=type(e).__name__)
+        selected_model, source = embedding_future.result(), 'embedding'
+    current_span().set(source=source)
+
+    if return_source:
+        return selected_model, source
+    return selected_model
 
 if __name__ == "__main__":
     user_query = input("User: ")
-    selected_model = hybrid_model_selection(user_query)
-    print(f"Selected Model: {selected_model}")
+    selected_model, source = hybrid_model_selection(user_query, return_source=True)
+    print(f"Selected Model: {selected_model} (from {source})")
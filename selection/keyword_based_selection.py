@@ -1,30 +1,172 @@
-import json
-import os
 import re
+import threading
+from selection.registry import get_registry
+from selection.tracing import span
 
-base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-models_path = os.path.join(base_dir, 'models.json')
+word_pattern = re.compile(r'\w+')
 
-with open(models_path) as f:
-    models_metadata = json.load(f)
+# Marks the trie node where a complete keyword ends
+_KEYWORD_END = None
 
-keyword_model_map = {}
 
-for model in models_metadata['models']:
-    keywords = model.get('keywords', [])
-    for keyword in keywords:
-        keyword_lower = keyword.lower()
-        if keyword_lower not in keyword_model_map:
-            keyword_model_map[keyword_lower] = model['model_path']
-        else:
-            pass
+class KeywordMatcher:
+    """Matches every registry keyword against a message in a single pass.
+
+    Keywords are stored in a trie over their words, so a message is scanned
+    once word by word and the cost does not grow with the number of keywords.
+    Matching is on whole words, like a `\\b...\\b` regex.
+
+    Each matched keyword adds 1 / (number of models listing it) to the score of
+    those models, so a keyword shared by many models ("predict") counts for
+    less than one that identifies a single model.
+
+    `update` applies a new version of the registry by touching only the
+    entries that were added, changed or removed.
+
+    Args:
+        models (list): Model entries as found in models.json.
+    """
+
+    def __init__(self, models):
+        self.trie = {}
+        # keyword -> model paths listing it, as an insertion-ordered dict used as a set
+        self.keyword_models = {}
+        self._models = {}
+        self._model_keywords = {}
+        self._positions = {}
+        self._lock = threading.Lock()
+        self.update(models)
+
+    @staticmethod
+    def _keyword_words(model):
+        for keyword in model.get('keywords', []):
+            words = word_pattern.findall(keyword.lower())
+            if words:
+                yield words
+
+    def _add(self, model):
+        model_path = model['model_path']
+        keywords = []
+        for words in self._keyword_words(model):
+            keyword_lower = ' '.join(words)
+            model_paths = self.keyword_models.setdefault(keyword_lower, {})
+            if model_path in model_paths:
+                continue
+            model_paths[model_path] = None
+            keywords.append(keyword_lower)
+
+            node = self.trie
+            for word in words:
+                node = node.setdefault(word, {})
+            node[_KEYWORD_END] = keyword_lower
+        self._models[model_path] = model
+        self._model_keywords[model_path] = keywords
+
+    def _remove(self, model_path):
+        del self._models[model_path]
+        for keyword in self._model_keywords.pop(model_path):
+            model_paths = self.keyword_models[keyword]
+            del model_paths[model_path]
+            if not model_paths:
+                del self.keyword_models[keyword]
+                self._remove_from_trie(keyword.split(' '))
+
+    def _remove_from_trie(self, words):
+        path = [self.trie]
+        for word in words:
+            path.append(path[-1][word])
+        del path[-1][_KEYWORD_END]
+        # Prune the nodes that no longer lead to any keyword
+        for depth in range(len(words), 0, -1):
+            if path[depth]:
+                break
+            del path[depth - 1][words[depth - 1]]
+
+    def update(self, models):
+        """Brings the matcher in line with `models`, re-indexing only the entries that differ.
+
+        Returns:
+            int: Number of entries added, changed or removed.
+        """
+        new_models = {model['model_path']: model for model in models}
+        with self._lock:
+            removed = [path for path in self._models if path not in new_models]
+            touched = [model for path, model in new_models.items() if self._models.get(path) != model]
+            for model_path in removed:
+                self._remove(model_path)
+            for model in touched:
+                if model['model_path'] in self._models:
+                    self._remove(model['model_path'])
+                self._add(model)
+            # Ties go to the earliest model in models.json, so registry order is kept
+            self._positions = {path: position for position, path in enumerate(new_models)}
+        return len(removed) + len(touched)
+
+    def find_keywords(self, user_message):
+        """Returns the distinct keywords found in the message, in order of appearance."""
+        words = word_pattern.findall(user_message.lower())
+        found = {}
+        with self._lock:
+            for start in range(len(words)):
+                node = self.trie
+                for position in range(start, len(words)):
+                    node = node.get(words[position])
+                    if node is None:
+                        break
+                    if _KEYWORD_END in node:
+                        found[node[_KEYWORD_END]] = True
+        return list(found)
+
+    def scores(self, user_message):
+        """Scores every model with at least one matching keyword.
+
+        Returns:
+            dict: Maps model_path to its keyword score, in registry order.
+        """
+        keywords = self.find_keywords(user_message)
+        scores = {}
+        with self._lock:
+            for keyword in keywords:
+                model_paths = self.keyword_models.get(keyword)
+                if not model_paths:
+                    continue
+                weight = 1.0 / len(model_paths)
+                for model_path in model_paths:
+                    scores[model_path] = scores.get(model_path, 0.0) + weight
+            positions = self._positions
+        return {path: scores[path] for path in sorted(scores, key=positions.__getitem__)}
+
+    def select(self, user_message):
+        scores = self.scores(user_message)
+        if not scores:
+            return None
+        # max() keeps the first of equal scores, i.e. the earliest model in models.json
+        return max(scores, key=scores.get)
+
+
+# Built on first selection, so importing this module neither reads models.json
+# nor starts the registry watcher
+_keyword_matcher = None
+_matcher_lock = threading.Lock()
+
+def get_keyword_matcher():
+    """Returns the matcher for the shared registry, building it and following reloads on first use."""
+    global _keyword_matcher
+    if _keyword_matcher is None:
+        with _matcher_lock:
+            if _keyword_matcher is None:
+                registry = get_registry()
+                matcher = KeywordMatcher(registry.models)
+                registry.subscribe(lambda change: matcher.update(change.metadata['models']))
+                _keyword_matcher = matcher
+    return _keyword_matcher
+
+def keyword_model_scores(user_message):
+    return get_keyword_matcher().scores(user_message)
 
 def keyword_model_selection(user_message):
-    user_message_lower = user_message.lower()
-    for keyword, model_path in keyword_model_map.items():
-        if re.search(r'\b' + re.escape(keyword) + r'\b', user_message_lower):
-            return model_path
-    return None
+    with span('selection', selector='keyword'):
+        return get_keyword_matcher().select(user_message)
 
 if __name__ == "__main__":
     user_query = input("User: ")
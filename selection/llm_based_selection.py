@@ -1,24 +1,42 @@
-import openai
 import json
 import os
+import threading
 from dotenv import load_dotenv
+from selection.llm_cache import LLMCache, default_cache_path
+from selection.llm_client import get_openai_client, chat_completion
+from selection.registry import get_registry
+from selection.shortlist import shortlist_models
+from selection.tracing import current_span, span, traced
 
 load_dotenv()
 
-base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-models_path = os.path.join(base_dir, 'models.json')
+llm_model_name = "gpt-4o"
 
-with open(models_path) as f:
-    models_metadata = json.load(f)
+# Number of registry entries retrieved into the prompt; unset sends all of models.json
+default_shortlist_k = int(os.getenv("LLM_SHORTLIST_K") or 0) or None
+default_shortlist_method = os.getenv("LLM_SHORTLIST_METHOD") or 'embedding'
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
 
-def llm_model_selection(user_message):
+def get_llm_cache():
+    """Returns the shared response cache, creating it on first use.
+
+    Setting LLM_CACHE_SEMANTIC_THRESHOLD (e.g. 0.95) enables the semantic tier,
+    and LLM_CACHE_PATH moves the database (':memory:' keeps it per process).
+    """
+    global _llm_cache
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                threshold = os.getenv("LLM_CACHE_SEMANTIC_THRESHOLD")
+                _llm_cache = LLMCache(path=os.getenv("LLM_CACHE_PATH") or default_cache_path,
+                                      semantic_threshold=float(threshold) if threshold else None)
+    return _llm_cache
+
+def selection_messages(user_message, models_metadata):
     models_metadata_str = json.dumps(models_metadata)
-    
-    response = openai.chat.completions.create(
-        model="gpt-4o",
-        messages=[
+    return [
             {"role": "system", 
              "content": 
             f"""
@@ -32,9 +50,53 @@ def llm_model_selection(user_message):
             },
             {"role": "user", "content": user_message}
         ]
-    )
+
+@traced('selection', selector='llm')
+def llm_model_selection(user_message, use_cache=True, shortlist_k=None, shortlist_method=None):
+    """Asks the LLM which model_path fits the query.
+
+    Args:
+        user_message (str): The user query.
+        use_cache (bool): Serve and store answers through the response cache.
+        shortlist_k (int): Put only the k most relevant registry entries in the
+            prompt instead of all of models.json. Defaults to LLM_SHORTLIST_K,
+            and to the full registry when that is unset.
+        shortlist_method (str): 'embedding' or 'lexical' retrieval for the
+            shortlist. Defaults to LLM_SHORTLIST_METHOD, or 'embedding'.
+
+    Returns:
+        str: The LLM's answer, normally a model path.
+    """
+    shortlist_k = default_shortlist_k if shortlist_k is None else shortlist_k
+    shortlist_method = shortlist_method or default_shortlist_method
+    # Read once so the prompt and the cache scope come from the same version of the registry
+    models_metadata, registry_hash = get_registry().snapshot()
+    with span('shortlist', method=shortlist_method, k=shortlist_k):
+        prompt_metadata = shortlist_models(user_message, models_metadata, shortlist_k, method=shortlist_method)
+
+    # A shortlisted prompt can get a different answer than the full registry
+    cache_scope = registry_hash
+    if prompt_metadata is not models_metadata:
+        cache_scope = f"{registry_hash}:{shortlist_method}-top{shortlist_k}"
+
+    if use_cache:
+        with span('llm.cache_get'):
+            cached = get_llm_cache().get(user_message, llm_model_name, cache_scope)
+        current_span().set(cached=cached is not None)
+        if cached is not None:
+            return cached
+
+    with span('llm.request', model=llm_model_name, models=len(prompt_metadata['models'])):
+        response = chat_completion(
+            get_openai_client(),
+            model=llm_model_name,
+            messages=selection_messages(user_message, prompt_metadata)
+        )
     
-    return response.choices[0].message.content
+    selected_model = response.choices[0].message.content
+    if use_cache:
+        get_llm_cache().put(user_message, llm_model_name, cache_scope, selected_model)
+    return selected_model
     
 
 if __name__ == "__main__":
@@ -0,0 +1,227 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+default_cache_path = os.path.join(base_dir, '.cache', 'llm_cache.sqlite3')
+
+default_max_entries = 10000
+# Cached answers older than this many seconds are treated as misses and dropped
+default_ttl = 7 * 24 * 3600
+
+_whitespace = re.compile(r'\s+')
+
+def normalize_query(query):
+    """Lowercases, collapses whitespace and drops trailing punctuation."""
+    return _whitespace.sub(' ', query.lower()).strip().rstrip('?!. ')
+
+
+class LLMCache:
+    """Persistent cache of LLM answers keyed by query, LLM and registry version.
+
+    Exact hits are looked up by the hash of the normalised query, the LLM name
+    and a hash of models.json, so editing the registry or switching LLMs never
+    serves a stale answer. Entries are evicted least-recently-used beyond
+    `max_entries` and expire after `ttl` seconds.
+
+    With a `semantic_threshold`, a query that misses exactly is embedded and
+    compared with the cached queries for the same LLM and registry; the answer
+    of the most similar one is reused if its cosine similarity reaches the
+    threshold.
+
+    Args:
+        path (str): SQLite database file, or ':memory:'.
+        max_entries (int): Maximum number of cached answers.
+        ttl (float): Lifetime of an entry in seconds, or None to keep entries forever.
+        semantic_threshold (float): Cosine similarity for semantic hits, or None
+            to disable the semantic tier.
+        embed (callable): Maps a list of strings to an embedding matrix. Defaults
+            to the BERT embeddings from embedding_based_selection.
+    """
+
+    def __init__(self, path=default_cache_path, max_entries=default_max_entries, ttl=default_ttl,
+                 semantic_threshold=None, embed=None):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.semantic_threshold = semantic_threshold
+        self._embed = embed
+        # The embedding of the last semantic miss, reused when its answer is stored
+        self._last_embedding = (None, None)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                scope TEXT NOT NULL,
+                query TEXT NOT NULL,
+                response TEXT NOT NULL,
+                embedding BLOB,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_scope ON responses (scope)')
+        # Kept up to date by put and _delete so a put does not have to run COUNT(*)
+        (self._count,) = self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()
+        # scope -> (keys, normalised embedding matrix), loaded on first semantic lookup
+        self._semantic_index = {}
+        self.metrics = {
+            'hits': 0,
+            'semantic_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'lookup_seconds': 0.0,
+        }
+
+    @staticmethod
+    def _scope(model, registry_hash):
+        return f"{model}:{registry_hash}"
+
+    @staticmethod
+    def _key(query, scope):
+        return hashlib.sha256(f"{scope}\n{normalize_query(query)}".encode('utf-8')).hexdigest()
+
+    def _embed_query(self, query):
+        normalized = normalize_query(query)
+        last_query, last_embedding = self._last_embedding
+        if last_query == normalized:
+            return last_embedding
+        if self._embed is None:
+            from selection.embedding_based_selection import get_embeddings
+            self._embed = get_embeddings
+        embedding = np.asarray(self._embed([normalized]), dtype=np.float32)[0]
+        embedding = embedding / max(float(np.linalg.norm(embedding)), 1e-12)
+        self._last_embedding = (normalized, embedding)
+        return embedding
+
+    def _expired(self, created_at, now):
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def get(self, query, model, registry_hash):
+        """Returns the cached answer for a query, or None on a miss."""
+        start = time.perf_counter()
+        now = time.time()
+        scope = self._scope(model, registry_hash)
+        key = self._key(query, scope)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT response, created_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and self._expired(row[1], now):
+                self._delete([key])
+                row = None
+            if row is not None:
+                self._conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+                self.metrics['hits'] += 1
+                self.metrics['lookup_seconds'] += time.perf_counter() - start
+                return row[0]
+
+        response = self._semantic_get(query, scope, now) if self.semantic_threshold is not None else None
+        with self._lock:
+            if response is None:
+                self.metrics['misses'] += 1
+            else:
+                self.metrics['semantic_hits'] += 1
+            self.metrics['lookup_seconds'] += time.perf_counter() - start
+        return response
+
+    def _load_semantic_index(self, scope):
+        if scope not in self._semantic_index:
+            rows = self._conn.execute(
+                'SELECT key, embedding FROM responses WHERE scope = ? AND embedding IS NOT NULL', (scope,)
+            ).fetchall()
+            keys = [key for key, _ in rows]
+            if rows:
+                matrix = np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+            else:
+                matrix = np.zeros((0, 0), dtype=np.float32)
+            self._semantic_index[scope] = (keys, matrix)
+        return self._semantic_index[scope]
+
+    def _semantic_get(self, query, scope, now):
+        embedding = self._embed_query(query)
+        with self._lock:
+            keys, matrix = self._load_semantic_index(scope)
+            if not keys:
+                return None
+            similarities = matrix @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.semantic_threshold:
+                return None
+            row = self._conn.execute(
+                'SELECT response, created_at FROM responses WHERE key = ?', (keys[best],)
+            ).fetchone()
+            if row is None or self._expired(row[1], now):
+                return None
+            self._conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, keys[best]))
+            return row[0]
+
+    def put(self, query, model, registry_hash, response):
+        """Stores an answer, evicting the least recently used entries if the cache is full."""
+        now = time.time()
+        scope = self._scope(model, registry_hash)
+        key = self._key(query, scope)
+        embedding = self._embed_query(query) if self.semantic_threshold is not None else None
+        with self._lock:
+            if self._conn.execute('SELECT 1 FROM responses WHERE key = ?', (key,)).fetchone() is None:
+                self._count += 1
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, scope, normalize_query(query), response,
+                 None if embedding is None else embedding.tobytes(), now, now)
+            )
+            if embedding is not None and scope in self._semantic_index:
+                keys, matrix = self._semantic_index[scope]
+                if key not in keys:
+                    matrix = embedding[None, :] if not keys else np.vstack([matrix, embedding])
+                    self._semantic_index[scope] = (keys + [key], matrix)
+            self._evict(now)
+
+    def _evict(self, now):
+        if self.ttl is not None:
+            expired = [key for (key,) in self._conn.execute(
+                'SELECT key FROM responses WHERE created_at < ?', (now - self.ttl,))]
+            self._delete(expired)
+
+        if self._count > self.max_entries:
+            # Other processes sharing the file add and evict entries too, so recount before deleting
+            (self._count,) = self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()
+            if self._count > self.max_entries:
+                oldest = [key for (key,) in self._conn.execute(
+                    'SELECT key FROM responses ORDER BY accessed_at LIMIT ?', (self._count - self.max_entries,))]
+                self._delete(oldest)
+
+    def _delete(self, keys):
+        if not keys:
+            return
+        deleted = self._conn.executemany('DELETE FROM responses WHERE key = ?', [(key,) for key in keys]).rowcount
+        self._count = max(0, self._count - deleted)
+        self.metrics['evictions'] += deleted
+        # Rebuilt from SQLite on the next semantic lookup
+        self._semantic_index.clear()
+
+    def stats(self):
+        """Returns hit/miss counters, the hit rate and the mean lookup time in microseconds."""
+        with self._lock:
+            stats = dict(self.metrics)
+            (stats['entries'],) = self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()
+        lookups = stats['hits'] + stats['semantic_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['semantic_hits']) / lookups if lookups else 0.0
+        stats['mean_lookup_us'] = stats.pop('lookup_seconds') / lookups * 1e6 if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM responses')
+            self._count = 0
+            self._semantic_index.clear()
@@ -0,0 +1,167 @@
+import os
+import threading
+import httpx
+from tenacity import AsyncRetrying, Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+from selection.tracing import current_span
+
+# Seconds to open a connection, and to wait for each read of the response
+default_connect_timeout = float(os.getenv("LLM_CONNECT_TIMEOUT") or 5)
+default_read_timeout = float(os.getenv("LLM_READ_TIMEOUT") or 60)
+# Connections kept open per client, and how long an idle one is kept for the next request
+default_max_connections = int(os.getenv("LLM_MAX_CONNECTIONS") or 20)
+default_keepalive_expiry = float(os.getenv("LLM_KEEPALIVE_EXPIRY") or 60)
+# Retries after the first attempt for rate limits (429), server errors (5xx) and dropped connections
+default_max_retries = int(os.getenv("LLM_MAX_RETRIES") or 4)
+backoff_base = 0.5
+backoff_max = 30.0
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class ConnectionStats:
+    """Counts requests and the new connections they needed.
+
+    httpx reports through its `trace` extension when it opens a TCP
+    connection; every request that did not open one reused a pooled
+    connection and skipped the TCP and TLS handshakes.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.handshakes = 0
+        self._lock = threading.Lock()
+
+    def _on_event(self, event_name):
+        if event_name == 'connection.connect_tcp.complete':
+            with self._lock:
+                self.connections += 1
+        elif event_name == 'connection.start_tls.complete':
+            with self._lock:
+                self.handshakes += 1
+
+    def trace(self, event_name, info):
+        self._on_event(event_name)
+
+    async def async_trace(self, event_name, info):
+        self._on_event(event_name)
+
+    def on_request(self, request):
+        with self._lock:
+            self.requests += 1
+        request.extensions['trace'] = self.trace
+
+    async def on_async_request(self, request):
+        with self._lock:
+            self.requests += 1
+        request.extensions['trace'] = self.async_trace
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'connections': self.connections,
+                'tls_handshakes': self.handshakes,
+                'reused': self.requests - self.connections,
+            }
+
+connection_stats = ConnectionStats()
+
+
+def timeouts(connect=None, read=None):
+    return httpx.Timeout(default_read_timeout if read is None else read,
+                         connect=default_connect_timeout if connect is None else connect)
+
+def limits():
+    return httpx.Limits(max_connections=default_max_connections,
+                        max_keepalive_connections=default_max_connections,
+                        keepalive_expiry=default_keepalive_expiry)
+
+def build_http_client(stats=connection_stats, **kwargs):
+    """Creates a pooled keep-alive httpx.Client that records connection reuse in `stats`."""
+    return httpx.Client(timeout=timeouts(), limits=limits(), event_hooks={'request': [stats.on_request]}, **kwargs)
+
+def build_async_http_client(stats=connection_stats, **kwargs):
+    """Async counterpart of `build_http_client`, for SDKs' async clients."""
+    return httpx.AsyncClient(timeout=timeouts(), limits=limits(),
+                             event_hooks={'request': [stats.on_async_request]}, **kwargs)
+
+def get_openai_client(api_key=None, base_url=None):
+    """Returns the process-wide OpenAI client for the given key and endpoint.
+
+    All callers share its connection pool, so a request reuses a warm
+    connection instead of opening a new one. The SDK's own retries are
+    turned off; wrap calls in `chat_completion` to retry transient failures.
+    """
+    import openai
+
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    key = ('openai', api_key, base_url)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = openai.OpenAI(api_key=api_key, base_url=base_url, max_retries=0,
+                                                   timeout=timeouts(), http_client=build_http_client())
+    return client
+
+
+def _status_code(error):
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        # google.api_core exceptions carry the HTTP status as `code`
+        status = getattr(error, 'code', None)
+    return status if isinstance(status, int) else None
+
+def is_retryable(error):
+    """Rate limits, overload, server errors, timeouts and dropped connections are worth retrying."""
+    status = _status_code(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    if isinstance(error, httpx.TransportError):
+        return True
+    try:
+        import openai
+    except ImportError:
+        return False
+    return isinstance(error, openai.APIConnectionError)
+
+def _retry_after(error):
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if headers is None:
+        return None
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+_jitter = wait_random_exponential(multiplier=backoff_base, max=backoff_max)
+
+def backoff(retry_state):
+    """Tenacity wait: the server's Retry-After when it sends one, otherwise full-jitter exponential backoff."""
+    retry_after = _retry_after(retry_state.outcome.exception())
+    if retry_after is not None:
+        return min(retry_after, backoff_max)
+    return _jitter(retry_state)
+
+def _count_retry(retry_state):
+    current_span().set(retries=retry_state.attempt_number)
+
+def retrying(max_retries=None):
+    """A tenacity `Retrying` with the shared policy; iterate it to retry a block."""
+    return Retrying(stop=stop_after_attempt((default_max_retries if max_retries is None else max_retries) + 1),
+                    wait=backoff, retry=retry_if_exception(is_retryable), before_sleep=_count_retry, reraise=True)
+
+def async_retrying(max_retries=None):
+    """Like `retrying`, for use with `async for` around awaited calls."""
+    return AsyncRetrying(stop=stop_after_attempt((default_max_retries if max_retries is None else max_retries) + 1),
+                         wait=backoff, retry=retry_if_exception(is_retryable), before_sleep=_count_retry, reraise=True)
+
+def chat_completion(client, max_retries=None, **kwargs):
+    """Calls `client.chat.completions.create(**kwargs)`, retrying transient failures.
+
+    With `stream=True` only opening the stream is retried; chunks already
+    handed to the caller are never sent twice.
+    """
+    return retrying(max_retries)(client.chat.completions.create, **kwargs)
@@ -1,24 +1,50 @@
-import subprocess
-import openai
+import sys
 import os
 import json
+import argparse
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from langchain.memory import ConversationBufferMemory
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selection.model_runtime import get_runtime
+from selection.registry import get_registry
+from selection.result_cache import cached_run
+from selection.llm_client import get_openai_client, chat_completion
+from selection.fanout import run_models as fan_out, merge_results
+from selection.shortlist import shortlist_models
+from selection.memory import TokenBudgetMemory, llm_summarizer
+from selection.tracing import span, traced
 
 load_dotenv()
 
-with open('models.json') as f:
-    models_metadata = json.load(f)
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+registry = get_registry()
+
+client = get_openai_client()
 
-client = openai.OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY")
+memory = TokenBudgetMemory(
+    max_tokens=int(os.getenv("MEMORY_MAX_TOKENS") or 1000),
+    summary_max_tokens=int(os.getenv("MEMORY_SUMMARY_MAX_TOKENS") or 250),
+    summarize=llm_summarizer(client)
 )
 
-memory = ConversationBufferMemory(return_messages=True)
+# Number of registry entries retrieved into the prompt; unset sends all of models.json
+shortlist_k = int(os.getenv("LLM_SHORTLIST_K") or 0) or None
+shortlist_method = os.getenv("LLM_SHORTLIST_METHOD") or 'embedding'
+
+# Runs models requested mid-stream while the rest of the response is still arriving
+_model_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='run-model')
 
 def run_model(model_path):
     """Executes the selected model by running the script at the given path.
 
+    The script runs in a warm worker process from the shared model runtime, so
+    its libraries and weights are loaded once rather than on every call.
+    Successful outputs are cached until the script or its weights change, so
+    asking the same model again returns without running it.
+
     Args:
         model_path (str): The path to the Python script that should be executed.
 
@@ -26,12 +52,41 @@ def run_model(model_path):
         str: The standard output of the script if execution is successful, 
         or an error message if the script fails.
     """
-    result = subprocess.run(['python', model_path], capture_output=True, text=True)
+    with span('run_model', model_path=model_path):
+        result = cached_run(get_runtime(), model_path)
     if result.returncode == 0:
         return result.stdout.strip()  # Return the output if successful
     else:
         return f"Error running the model at {model_path}: {result.stderr}"
 
+def run_models(model_paths):
+    """Runs several models at once for a question that spans more than one of them.
+
+    The models run concurrently and share one deadline (FANOUT_DEADLINE_SECONDS),
+    so the answer takes about as long as the slowest model rather than the sum
+    of all of them. Models that miss the deadline are named in the reply while
+    the others' outputs are still returned.
+
+    Args:
+        model_paths (list): The paths to the Python scripts that should be executed.
+
+    Returns:
+        str: One line per model with its output, error or timeout.
+    """
+    return merge_results(fan_out(model_paths))
+
+def _run_function(name, arguments):
+    """Runs a `function_definitions` call; returns None if it is unknown or incomplete."""
+    try:
+        arguments = json.loads(arguments)
+    except (ValueError, TypeError):
+        return None
+    if name == 'run_model' and isinstance(arguments, dict) and 'model_path' in arguments:
+        return run_model(arguments['model_path'])
+    if name == 'run_models' and isinstance(arguments, dict) and arguments.get('model_paths'):
+        return run_models(arguments['model_paths'])
+    return None
+
 
 function_definitions = [
     {
@@ -47,16 +102,31 @@ function_definitions = [
             },
             "required": ["model_path"]
         }
+    },
+    {
+        "name": "run_models",
+        "description": "Run several models at once when the user asks about more than one of them, e.g. heart and diabetes risk.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "model_paths": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "The paths of all models that should be run."
+                }
+            },
+            "required": ["model_paths"]
+        }
     }
 ]
 
-def get_completion(message):
-    models_metadata_str = json.dumps(models_metadata)
-    history = memory.load_memory_variables({})['history']
+def completion_messages(message):
+    with span('shortlist', method=shortlist_method, k=shortlist_k):
+        models_metadata_str = json.dumps(shortlist_models(message, registry.metadata, shortlist_k, method=shortlist_method))
+    with span('memory.load'):
+        history = memory.load_memory_variables({})['history']
 
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[
+    return [
             {"role": "system", 
              "content": 
             f"""
@@ -65,21 +135,43 @@ def get_completion(message):
             If the user's query is related to any description or tag in the models metadata but is too vague, ask follow-up questions to determine the specific issue.
             If the user confirms a specific model-related issue (e.g., diabetes), immediately provide the model path without asking any further questions.
             If the user's query matches multiple models, suggest those models to the user and let them pick. If there is a clear match with a single model and the user confirms it, provide the model path directly.
+            If the user explicitly asks about several of the models at once (e.g. heart and diabetes risk), call run_models with all of their paths instead of running them one turn at a time.
             If the query is unrelated to any model, answer as you normally would.
             Current conversation history: {history}
             """
             },
             {"role": "user", "content": message}
-        ],
-        functions=function_definitions
-    )
+        ]
+
+@traced('completion')
+def get_completion(message, stream=False, on_token=None):
+    """Answers a chat message, running the selected model when one is chosen.
+
+    Args:
+        message (str): The user's message.
+        stream (bool): Request a streamed response. Text is passed to
+            `on_token` as it arrives, and a `run_model` call starts as soon as
+            its arguments are complete rather than when the stream ends.
+        on_token (callable): Receives each streamed text fragment.
+
+    Returns:
+        str: The model output, or the assistant's reply when no model was run.
+    """
+    if stream:
+        return _get_streamed_completion(message, on_token)
+
+    messages = completion_messages(message)
+    with span('llm.request', model="gpt-3.5-turbo"):
+        response = chat_completion(
+            client,
+            model="gpt-3.5-turbo",
+            messages=messages,
+            functions=function_definitions
+        )
     
     if response.choices[0].message.function_call:
         tool_call = response.choices[0].message.function_call
-        if tool_call.name == 'run_model':
-            model_path = json.loads(tool_call.arguments)['model_path']
-            result = run_model(model_path)
-            return result
+        return _run_function(tool_call.name, tool_call.arguments)
     else:
         output = response.choices[0].message.content.strip()
         if output.startswith('./'):
@@ -88,14 +180,86 @@ def get_completion(message):
         memory.save_context({"input": message}, {"output": response.choices[0].message.content})
         return response.choices[0].message.content
 
-def main():
+def _parse_model_path(arguments):
+    try:
+        return json.loads(arguments)['model_path']
+    except (ValueError, KeyError, TypeError):
+        return None
+
+def _get_streamed_completion(message, on_token=None):
+    messages = completion_messages(message)
+    with span('llm.request', model="gpt-3.5-turbo", stream=True):
+        response = chat_completion(
+            client,
+            model="gpt-3.5-turbo",
+            messages=messages,
+            functions=function_definitions,
+            stream=True
+        )
+
+    content = []
+    function_name = ''
+    arguments = ''
+    model_future = None
+
+    with span('llm.stream'):
+        for chunk in response:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                content.append(delta.content)
+                if on_token is not None:
+                    on_token(delta.content)
+            if delta.function_call:
+                function_name += delta.function_call.name or ''
+                arguments += delta.function_call.arguments or ''
+                # Arguments arrive in fragments; start the model once they form valid JSON
+                if model_future is None and function_name == 'run_model':
+                    model_path = _parse_model_path(arguments)
+                    if model_path is not None:
+                        model_future = _model_executor.submit(contextvars.copy_context().run, run_model, model_path)
+
+    if function_name:
+        if model_future is None and function_name == 'run_model':
+            model_path = _parse_model_path(arguments)
+            if model_path is not None:
+                model_future = _model_executor.submit(contextvars.copy_context().run, run_model, model_path)
+        if model_future is not None:
+            return model_future.result()
+        # run_models needs the whole list of paths, so it starts once the stream has ended
+        return _run_function(function_name, arguments)
+
+    output = ''.join(content).strip()
+    if output.startswith('./'):
+        return run_model(output)
+    memory.save_context({"input": message}, {"output": ''.join(content)})
+    return ''.join(content)
+
+def main(stream=True):
     print("Welcome to the terminal chat app. Type your query below:")
     while True:
         user_query = input("> ")
         if user_query.lower() in ["exit", "quit"]:
             break
-        answer = get_completion(user_query)
-        print(f"Assistant: {answer}")
+        if not stream:
+            answer = get_completion(user_query)
+            print(f"Assistant: {answer}")
+            continue
+
+        print("Assistant: ", end='', flush=True)
+        streamed = []
+        def on_token(text):
+            streamed.append(text)
+            print(text, end='', flush=True)
+        answer = get_completion(user_query, stream=True, on_token=on_token)
+        # Model output is only known once the model has run, so it is printed whole
+        if answer is not None and answer.strip() != ''.join(streamed).strip():
+            print(answer if not streamed else f"\nAssistant: {answer}", end='')
+        print()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Terminal chat that routes questions to specialised models.')
+    parser.add_argument('--no-stream', action='store_true', help='Wait for complete responses instead of streaming them')
+    args = parser.parse_args()
+    main(stream=not args.no_stream)
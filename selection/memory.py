@@ -0,0 +1,160 @@
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from selection.llm_client import chat_completion
+from selection.tracing import span, traced
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding('cl100k_base')
+except Exception:
+    _encoding = None
+
+def count_tokens(text):
+    """Counts tokens with tiktoken when it is installed, else estimates ~4 characters per token."""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+def truncate_to_tokens(text, max_tokens):
+    """Keeps the end of `text` so it fits in `max_tokens`."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text)[-max_tokens:])
+    return text[-max_tokens * 4:]
+
+def format_turns(turns):
+    return '\n'.join(f"Human: {human}\nAI: {ai}" for human, ai, _ in turns)
+
+def llm_summarizer(client, model="gpt-3.5-turbo", max_tokens=250):
+    """Builds a summarize(summary, turns_text) function backed by a chat model."""
+    def summarize(summary, turns_text):
+        response = chat_completion(
+            client,
+            model=model,
+            max_tokens=max_tokens,
+            messages=[
+                {"role": "system",
+                 "content": "Progressively summarize the conversation, adding the new lines to the previous summary. "
+                            "Keep model paths, user conditions and open questions. Return only the new summary."},
+                {"role": "user", "content": f"Current summary:\n{summary}\n\nNew lines of conversation:\n{turns_text}"}
+            ]
+        )
+        return response.choices[0].message.content.strip()
+    return summarize
+
+
+class TokenBudgetMemory:
+    """Conversation memory whose prompt footprint stays within a token budget.
+
+    The most recent turns are kept verbatim in a sliding window of at most
+    `max_tokens` tokens. Turns that fall out of the window are folded into a
+    running summary of at most `summary_max_tokens` tokens, so the history put
+    into each prompt never grows past `max_tokens + summary_max_tokens`.
+
+    Summarisation runs on a background thread and never blocks `save_context`
+    or `load_memory_variables`; until it finishes, evicted turns are simply
+    absent from the history.
+
+    Args:
+        max_tokens (int): Budget for the verbatim window of recent turns.
+        summary_max_tokens (int): Budget for the summary of older turns.
+        summarize (callable): summarize(summary, turns_text) -> new summary. Without
+            one, the summary keeps the most recent evicted text that fits its budget.
+        background (bool): Summarise on a background thread. Set to False to
+            summarise inline, e.g. in tests.
+    """
+
+    def __init__(self, max_tokens=1000, summary_max_tokens=250, summarize=None, background=True):
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.summarize = summarize
+        self.summary = ''
+        self._turns = []
+        self._window_tokens = 0
+        self._evicted = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='memory-summary') if background else None
+        self._pending = None
+
+    @traced('memory.save')
+    def save_context(self, inputs, outputs):
+        human = inputs['input']
+        ai = outputs['output']
+        tokens = count_tokens(f"Human: {human}\nAI: {ai}\n")
+        with self._lock:
+            self._turns.append((human, ai, tokens))
+            self._window_tokens += tokens
+            while self._window_tokens > self.max_tokens and len(self._turns) > 1:
+                evicted = self._turns.pop(0)
+                self._window_tokens -= evicted[2]
+                self._evicted.append(evicted)
+            # A single turn larger than the whole budget is cut down to fit
+            if self._window_tokens > self.max_tokens:
+                human, ai, _ = self._turns[0]
+                text = truncate_to_tokens(f"Human: {human}\nAI: {ai}", self.max_tokens)
+                self._turns[0] = ('', text, count_tokens(text))
+                self._window_tokens = self._turns[0][2]
+            has_evicted = bool(self._evicted)
+
+        if has_evicted:
+            self._schedule_summary()
+
+    def _schedule_summary(self):
+        if self._executor is None:
+            self._update_summary()
+            return
+        with self._lock:
+            if self._pending is None:
+                self._pending = self._executor.submit(self._update_summary)
+
+    def _update_summary(self):
+        while True:
+            with self._lock:
+                if not self._evicted:
+                    self._pending = None
+                    return
+                evicted, self._evicted = self._evicted, []
+                summary = self.summary
+
+            turns_text = format_turns(evicted)
+            if self.summarize is None:
+                new_summary = f"{summary}\n{turns_text}".strip()
+            else:
+                try:
+                    with span('memory.summarize', turns=len(evicted)):
+                        new_summary = self.summarize(summary, turns_text)
+                except Exception:
+                    # Keep the conversation going with the raw text if the summariser fails
+                    new_summary = f"{summary}\n{turns_text}".strip()
+
+            with self._lock:
+                self.summary = truncate_to_tokens(new_summary, self.summary_max_tokens)
+
+    def wait(self):
+        """Blocks until pending summarisation has finished."""
+        while True:
+            with self._lock:
+                pending = self._pending
+            if pending is None:
+                return
+            pending.result()
+
+    def load_memory_variables(self, inputs=None):
+        with self._lock:
+            parts = []
+            if self.summary:
+                parts.append(f"Summary of earlier conversation: {self.summary}")
+            if self._turns:
+                parts.append(format_turns(self._turns))
+        return {'history': '\n'.join(parts)}
+
+    def clear(self):
+        self.wait()
+        with self._lock:
+            self.summary = ''
+            self._turns = []
+            self._window_tokens = 0
+            # Turns evicted by a save that raced with wait() must not reach the next summary
+            self._evicted = []
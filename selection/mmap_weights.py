@@ -0,0 +1,93 @@
+import os
+import json
+import struct
+import numpy as np
+
+# safetensors dtype codes and their little-endian NumPy equivalents
+safetensors_dtypes = {
+    'F64': '<f8', 'F32': '<f4', 'F16': '<f2',
+    'I64': '<i8', 'I32': '<i4', 'I16': '<i2', 'I8': 'i1', 'U8': 'u1', 'BOOL': '?',
+}
+
+
+def read_header(path):
+    """Returns the tensor table of a .safetensors file and the offset its data starts at."""
+    with open(path, 'rb') as f:
+        (header_size,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_size))
+    header.pop('__metadata__', None)
+    return header, 8 + header_size
+
+def mmap_arrays(path):
+    """Maps every tensor of a .safetensors file into memory without reading it.
+
+    The arrays are copy-on-write views of the file: pages are read from the
+    page cache on first touch, and every process that maps the same file
+    shares those physical pages until one of them writes to an array.
+
+    Returns:
+        dict: Maps tensor name to np.ndarray.
+    """
+    header, data_start = read_header(path)
+    arrays = {}
+    for name, info in header.items():
+        if info['dtype'] not in safetensors_dtypes:
+            raise ValueError(f"{name} in {path} is {info['dtype']}, which cannot be memory-mapped; "
+                             f"expected one of {sorted(safetensors_dtypes)}")
+        dtype = np.dtype(safetensors_dtypes[info['dtype']])
+        shape = tuple(info['shape'])
+        begin, end = info['data_offsets']
+        if begin == end:
+            arrays[name] = np.zeros(shape, dtype=dtype)
+            continue
+        arrays[name] = np.memmap(path, dtype=dtype, mode='c', offset=data_start + begin, shape=shape)
+    return arrays
+
+def mmap_state_dict(path):
+    """Like `mmap_arrays`, as torch tensors sharing the mapped memory."""
+    import torch
+    return {name: torch.from_numpy(array) for name, array in mmap_arrays(path).items()}
+
+def save_module_weights(module, path):
+    """Writes a module's parameters and buffers to a .safetensors file that `mmap_state_dict` can map.
+
+    Non-persistent buffers are included, so `assign_weights` can rebuild a
+    module created on the meta device without running its initialisers.
+    """
+    from safetensors.torch import save_file
+
+    tensors = dict(module.named_parameters())
+    tensors.update(module.named_buffers())
+    # Per process, so workers exporting at the same time never write to the same file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    save_file({name: tensor.detach().cpu().contiguous() for name, tensor in tensors.items()}, tmp_path)
+    os.replace(tmp_path, path)
+
+def assign_weights(module, tensors):
+    """Makes the tensors the module's parameters and buffers in place of its own, without copying.
+
+    Args:
+        module (torch.nn.Module): Usually created under `torch.device('meta')`,
+            so no memory is spent on weights that are about to be replaced.
+        tensors (dict): Maps parameter and buffer names to tensors, e.g. from
+            `mmap_state_dict`.
+    """
+    import torch
+
+    expected = {name for name, _ in module.named_parameters()} | {name for name, _ in module.named_buffers()}
+    missing = sorted(expected - tensors.keys())
+    unexpected = sorted(tensors.keys() - expected)
+    if missing or unexpected:
+        raise ValueError(f"Weights do not match the module: missing {missing[:5]}, unexpected {unexpected[:5]}")
+
+    for name, tensor in tensors.items():
+        owner_name, _, attribute = name.rpartition('.')
+        owner = module.get_submodule(owner_name)
+        if attribute in owner._parameters:
+            owner._parameters[attribute] = torch.nn.Parameter(tensor, requires_grad=False)
+        else:
+            owner._buffers[attribute] = tensor
+    # Tied weights appear under one name only; their other owners would still be empty
+    unassigned = [name for name, tensor in module.named_parameters(remove_duplicate=False) if tensor.is_meta]
+    if unassigned:
+        raise ValueError(f"Weights do not match the module: {unassigned[:5]} were not assigned")
@@ -0,0 +1,327 @@
+import os
+import io
+import ast
+import sys
+import time
+import queue
+import atexit
+import runpy
+import threading
+import traceback
+import subprocess
+import contextlib
+import importlib.util
+import multiprocessing
+from selection.result_cache import model_fingerprint
+
+# Seconds a single model call may take before its worker is killed and replaced
+default_timeout = 60.0
+# Workers, and so models that can run at once; MODEL_RUNTIME_WORKERS raises it for fan-out
+default_num_workers = int(os.getenv("MODEL_RUNTIME_WORKERS") or 2)
+
+
+def _defines_run(script_path):
+    """Checks whether a predictor script defines a top-level `run()` function."""
+    with open(script_path) as f:
+        tree = ast.parse(f.read(), filename=script_path)
+    return any(isinstance(node, ast.FunctionDef) and node.name == 'run' for node in tree.body)
+
+
+@contextlib.contextmanager
+def _script_environment(script_path):
+    """Sets sys.argv and sys.path as `python script_path` would, restoring both afterwards."""
+    argv, path = sys.argv, list(sys.path)
+    sys.argv = [script_path]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script_path)))
+    try:
+        yield
+    finally:
+        sys.argv = argv
+        sys.path[:] = path
+
+
+def _load_predictor(script_path):
+    module_name = '_dama_predictor_' + str(abs(hash(os.path.abspath(script_path))))
+    spec = importlib.util.spec_from_file_location(module_name, script_path)
+    module = importlib.util.module_from_spec(spec)
+    with _script_environment(script_path):
+        spec.loader.exec_module(module)
+    return module
+
+
+def _cached_predictor(model_path, predictors):
+    """Returns the loaded predictor for the script as it is now, or None if it must be (re)loaded.
+
+    `predictors` maps a script's absolute path to (fingerprint, module); an
+    edited script or retrained weights change the fingerprint, so the stale
+    module is never run again.
+    """
+    cached = predictors.get(os.path.abspath(model_path))
+    if cached is None or cached[0] != model_fingerprint(model_path):
+        return None
+    return cached
+
+
+def _load(model_path, predictors):
+    """Loads the script's predictor into `predictors`, or records None for scripts without run()."""
+    # Taken before loading, so a script edited meanwhile is reloaded on the next call
+    fingerprint = model_fingerprint(model_path)
+    # Scripts without run() cannot be kept loaded and are re-executed per call
+    module = _load_predictor(model_path) if _defines_run(model_path) else None
+    predictors[os.path.abspath(model_path)] = (fingerprint, module)
+    return module
+
+
+def _preload(model_path, predictors):
+    if not os.path.isfile(model_path) or not _defines_run(model_path):
+        return False
+    if _cached_predictor(model_path, predictors) is not None:
+        return False
+    with contextlib.redirect_stdout(io.StringIO()):
+        _load(model_path, predictors)
+    return True
+
+
+def _execute(model_path, predictors):
+    """Runs one predictor inside a worker and captures it like a subprocess would."""
+    if not os.path.isfile(model_path):
+        return 2, '', (f"{sys.executable}: can't open file {os.path.abspath(model_path)!r}: "
+                       f"[Errno 2] No such file or directory\n")
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+    returncode = 0
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            cached = _cached_predictor(model_path, predictors)
+            predictor = cached[1] if cached is not None else _load(model_path, predictors)
+            with _script_environment(model_path):
+                if predictor is not None:
+                    predictor.run()
+                else:
+                    runpy.run_path(model_path, run_name='__main__')
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                returncode = e.code if isinstance(e.code, int) else 1
+                if not isinstance(e.code, int):
+                    print(e.code, file=sys.stderr)
+        except BaseException:
+            predictors.pop(os.path.abspath(model_path), None)
+            traceback.print_exc()
+            returncode = 1
+    return returncode, stdout.getvalue(), stderr.getvalue()
+
+
+def _worker_main(conn):
+    predictors = {}
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if message[0] == 'ping':
+            conn.send(('pong', os.getpid()))
+        elif message[0] == 'run':
+            conn.send(('result',) + _execute(message[1], predictors))
+        elif message[0] == 'load':
+            try:
+                conn.send(('loaded', _preload(message[1], predictors)))
+            except Exception:
+                conn.send(('loaded', False))
+        elif message[0] == 'stop':
+            break
+    conn.close()
+
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def request(self, message, timeout):
+        """Sends a message and waits for the reply.
+
+        Raises:
+            TimeoutError: If no reply arrives within `timeout` seconds.
+            EOFError: If the worker died before replying.
+        """
+        self.conn.send(message)
+        if not self.conn.poll(timeout):
+            raise TimeoutError
+        return self.conn.recv()
+
+    def stop(self):
+        try:
+            self.conn.send(('stop',))
+        except (OSError, EOFError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class ModelRuntime:
+    """Pool of long-lived worker processes that execute predictor scripts.
+
+    Each worker imports torch, numpy and a predictor's weights once and serves
+    later calls from memory instead of starting a fresh interpreter per call. A
+    predictor stays loaded if its script defines a top-level `run()` function
+    that prints its answer; other scripts are executed with runpy on each call,
+    which still skips interpreter start-up and repeated library imports.
+    A loaded predictor is imported again once its script or the weight files
+    next to it change (see `result_cache.model_fingerprint`).
+
+    Workers run in separate processes, so a crash or a hung model only takes
+    down its own worker, which is then replaced.
+
+    Args:
+        num_workers (int): Number of worker processes.
+        timeout (float): Default per-call timeout in seconds.
+    """
+
+    def __init__(self, num_workers=default_num_workers, timeout=default_timeout):
+        self.timeout = timeout
+        self._context = multiprocessing.get_context('spawn')
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = []
+        self._closed = False
+        for _ in range(num_workers):
+            worker = _Worker(self._context)
+            self._workers.append(worker)
+            self._idle.put(worker)
+
+    def _replace(self, worker):
+        worker.process.kill()
+        worker.process.join()
+        worker.conn.close()
+        replacement = _Worker(self._context)
+        with self._lock:
+            self._workers[self._workers.index(worker)] = replacement
+        return replacement
+
+    def run(self, model_path, timeout=None, deadline=None):
+        """Executes a predictor script in a warm worker.
+
+        Args:
+            model_path (str): The path to the Python script that should be executed.
+            timeout (float): Seconds to wait before giving up on the call,
+                including the wait for a free worker.
+            deadline (float): `time.monotonic()` value by which the call must
+                end, shared by every model of a fan-out. A call that gets no
+                worker before it is not run at all.
+
+        Returns:
+            subprocess.CompletedProcess: The exit status and captured output,
+            as `subprocess.run(..., capture_output=True, text=True)` would return.
+        """
+        if self._closed:
+            raise RuntimeError("ModelRuntime is closed")
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        end = start + timeout if deadline is None else min(start + timeout, deadline)
+        budget = round(max(0.0, end - start), 3)
+        args = ['python', model_path]
+        no_worker = subprocess.CompletedProcess(args, 1, '', f"Model timed out after {budget:g} seconds "
+                                                             f"waiting for a free worker")
+
+        try:
+            worker = self._idle.get(timeout=max(0.0, end - start))
+        except queue.Empty:
+            return no_worker
+        try:
+            if not worker.is_alive():
+                worker = self._replace(worker)
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return no_worker
+            _, returncode, stdout, stderr = worker.request(('run', model_path), remaining)
+            return subprocess.CompletedProcess(args, returncode, stdout, stderr)
+        except TimeoutError:
+            worker = self._replace(worker)
+            return subprocess.CompletedProcess(args, 1, '', f"Model timed out after {budget:g} seconds")
+        except (EOFError, OSError) as e:
+            worker = self._replace(worker)
+            return subprocess.CompletedProcess(args, 1, '', f"Model worker crashed: {e!r}")
+        finally:
+            self._idle.put(worker)
+
+    def preload(self, model_paths, timeout=None):
+        """Imports predictors in every worker ahead of their first call.
+
+        Paths that do not exist or do not define `run()` are skipped.
+
+        Returns:
+            list: The model paths that were loaded.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        workers = [self._idle.get() for _ in range(len(self._workers))]
+        loaded = set()
+        try:
+            for i, worker in enumerate(workers):
+                for model_path in model_paths:
+                    try:
+                        if worker.request(('load', model_path), timeout)[1]:
+                            loaded.add(model_path)
+                    except (TimeoutError, EOFError, OSError):
+                        workers[i] = worker = self._replace(worker)
+        finally:
+            for worker in workers:
+                self._idle.put(worker)
+        return [model_path for model_path in model_paths if model_path in loaded]
+
+    def health_check(self, timeout=5.0):
+        """Pings every idle worker and restarts the ones that do not answer.
+
+        Workers busy with a model call are not interrupted.
+
+        Returns:
+            dict: Counts of 'healthy', 'restarted' and 'busy' workers.
+        """
+        status = {'healthy': 0, 'restarted': 0, 'busy': 0}
+        checked = []
+        while True:
+            try:
+                checked.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        status['busy'] = len(self._workers) - len(checked)
+
+        for worker in checked:
+            try:
+                if not worker.is_alive():
+                    raise EOFError
+                worker.request(('ping',), timeout)
+                status['healthy'] += 1
+            except (TimeoutError, EOFError, OSError):
+                worker = self._replace(worker)
+                status['restarted'] += 1
+            self._idle.put(worker)
+        return status
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for worker in list(self._workers):
+            worker.stop()
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+def get_runtime():
+    """Returns the shared runtime, starting its workers on first use."""
+    global _runtime
+    if _runtime is None:
+        with _runtime_lock:
+            if _runtime is None:
+                _runtime = ModelRuntime()
+                atexit.register(_runtime.close)
+    return _runtime
@@ -0,0 +1,172 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import namedtuple
+from selection.tracing import span
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+models_path = os.path.join(base_dir, 'models.json')
+
+# Seconds between checks of models.json for changes; 0 disables hot reload
+default_poll_interval = float(os.getenv("MODEL_REGISTRY_POLL_SECONDS") or 2.0)
+
+logger = logging.getLogger(__name__)
+
+# Entries are compared by model_path; added/changed hold the new entries, removed the old ones
+RegistryChange = namedtuple('RegistryChange', ['added', 'changed', 'removed', 'metadata', 'version'])
+
+
+def diff_models(old_models, new_models):
+    """Compares two lists of registry entries by model_path.
+
+    Returns:
+        tuple: (added, changed, removed) lists of entries.
+    """
+    old_by_path = {model['model_path']: model for model in old_models}
+    new_by_path = {model['model_path']: model for model in new_models}
+    added = [model for path, model in new_by_path.items() if path not in old_by_path]
+    changed = [model for path, model in new_by_path.items() if path in old_by_path and old_by_path[path] != model]
+    removed = [model for path, model in old_by_path.items() if path not in new_by_path]
+    return added, changed, removed
+
+
+class ModelRegistry:
+    """The parsed models.json, shared by every selector and reloaded when the file changes.
+
+    `metadata` is replaced as a whole on reload, never mutated, so a reader that
+    takes it once sees one consistent version of the registry; `snapshot`
+    returns it together with the matching content hash. After a reload,
+    listeners are called with a `RegistryChange` naming the added, changed and
+    removed entries, so derived structures can be updated for just those.
+
+    Listeners run one reload at a time, on the thread that noticed the change.
+
+    Args:
+        path (str): Path of models.json.
+        poll_interval (float): Seconds between mtime checks by `watch`.
+    """
+
+    def __init__(self, path=models_path, poll_interval=default_poll_interval):
+        self.path = path
+        self.poll_interval = poll_interval
+        # (metadata, hash, version), swapped in one assignment on reload
+        self._state = (None, None, 0)
+        self._stat = None
+        self._listeners = []
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self.reload()
+
+    @property
+    def metadata(self):
+        return self._state[0]
+
+    @property
+    def hash(self):
+        """sha256 of the models.json bytes, identifying the registry version."""
+        return self._state[1]
+
+    @property
+    def version(self):
+        return self._state[2]
+
+    @property
+    def models(self):
+        return self._state[0]['models']
+
+    def snapshot(self):
+        """Returns (metadata, hash) of the same registry version."""
+        metadata, digest, _ = self._state
+        return metadata, digest
+
+    def subscribe(self, listener):
+        """Registers listener(change) to be called after every reload that changes the registry."""
+        self._listeners.append(listener)
+        return listener
+
+    def unsubscribe(self, listener):
+        self._listeners.remove(listener)
+
+    def _file_stat(self):
+        stat = os.stat(self.path)
+        # The inode changes when the file is atomically replaced rather than rewritten
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def reload(self, force=False):
+        """Re-reads models.json if it changed since the last load.
+
+        Raises:
+            OSError, ValueError: If the file cannot be read or parsed. The
+            previous version of the registry stays in place.
+
+        Returns:
+            RegistryChange: What changed, or None if nothing did.
+        """
+        with self._reload_lock:
+            stat = self._file_stat()
+            if stat == self._stat and not force:
+                return None
+            with span('registry.load'):
+                with open(self.path, 'rb') as f:
+                    data = f.read()
+                # A file that fails to parse is not re-read until it changes again
+                self._stat = stat
+                digest = hashlib.sha256(data).hexdigest()
+                if digest == self.hash:
+                    return None
+                metadata = json.loads(data)
+            if not isinstance(metadata, dict) or not isinstance(metadata.get('models'), list):
+                raise ValueError(f"{self.path} has no 'models' list")
+
+            old_models = self.metadata['models'] if self.metadata is not None else []
+            added, changed, removed = diff_models(old_models, metadata['models'])
+            version = self.version + 1
+            self._state = (metadata, digest, version)
+
+            change = RegistryChange(added, changed, removed, metadata, version)
+            with span('registry.update', added=len(added), changed=len(changed), removed=len(removed)):
+                for listener in list(self._listeners):
+                    try:
+                        listener(change)
+                    except Exception:
+                        logger.exception("Registry listener %r failed", listener)
+            return change
+
+    def check(self):
+        """Like `reload`, but a file that is missing or half-written is retried on the next check."""
+        try:
+            return self.reload()
+        except (OSError, ValueError) as error:
+            logger.warning("Could not reload %s: %s", self.path, error)
+            return None
+
+    def watch(self):
+        """Starts a daemon thread that checks the file every `poll_interval` seconds."""
+        if self._watcher is not None or self.poll_interval <= 0:
+            return
+        self._watcher = threading.Thread(target=self._watch, name='model-registry-watch', daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.check()
+
+    def close(self):
+        self._stop.set()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry():
+    """Returns the process-wide registry for models.json, watching it for changes."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+                _registry.watch()
+    return _registry
@@ -0,0 +1,150 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from selection.tracing import span
+
+# Files next to a predictor script that hold its weights or fitted state
+artifact_extensions = ('.pth', '.pt', '.pkl', '.joblib', '.npz', '.npy', '.safetensors', '.onnx', '.h5', '.bin', '.json')
+
+default_max_entries = int(os.getenv("RESULT_CACHE_SIZE") or 256)
+
+
+def model_fingerprint(model_path):
+    """Identifies the current version of a model by its files' mtimes and sizes.
+
+    Covers the script itself and every artifact (`artifact_extensions`) in its
+    directory, so retraining or editing a model changes its fingerprint.
+    Returns None when the script does not exist.
+    """
+    script = os.path.abspath(model_path)
+    try:
+        stat = os.stat(script)
+    except OSError:
+        return None
+    parts = [(script, stat.st_mtime_ns, stat.st_size)]
+    try:
+        with os.scandir(os.path.dirname(script)) as entries:
+            for entry in entries:
+                if entry.name.endswith(artifact_extensions) and entry.is_file():
+                    entry_stat = entry.stat()
+                    parts.append((entry.name, entry_stat.st_mtime_ns, entry_stat.st_size))
+    except OSError:
+        pass
+    parts.sort()
+    return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()
+
+def payload_hash(payload):
+    """Hashes a JSON-serialisable model input; key order does not matter."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """In-memory LRU cache of model outputs keyed by model, input and model version.
+
+    A key combines the script's absolute path, the hash of the input payload
+    and the model's fingerprint, so an edited script or retrained weights
+    produce a new key and the old output is never served again. Entries left
+    behind by an older fingerprint are dropped when the new one is stored.
+
+    Args:
+        max_entries (int): Entries kept before the least recently used is evicted.
+            0 disables caching.
+    """
+
+    def __init__(self, max_entries=default_max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, model_path, payload=None):
+        """Builds the cache key for running `model_path` on `payload` as the files are now.
+
+        Returns None when the script does not exist, which is never cached.
+        """
+        fingerprint = model_fingerprint(model_path)
+        if fingerprint is None:
+            return None
+        return (os.path.abspath(model_path), payload_hash(payload), fingerprint)
+
+    def get(self, key):
+        if key is None or self.max_entries <= 0:
+            return None
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result):
+        if key is None or self.max_entries <= 0:
+            return
+        path, payload, fingerprint = key
+        with self._lock:
+            stale = [k for k in self._entries if k[0] == path and k[1] == payload and k[2] != fingerprint]
+            for k in stale:
+                del self._entries[k]
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+def get_result_cache():
+    """Returns the process-wide result cache, sized by RESULT_CACHE_SIZE."""
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = ResultCache()
+    return _result_cache
+
+def cached_run(runtime, model_path, payload=None, cache=None, timeout=None, deadline=None):
+    """Runs a model through `runtime`, serving repeated calls from the result cache.
+
+    Only successful runs are cached. The key is taken before the run, so a
+    model that changes while it runs is not cached under its new version.
+
+    Args:
+        runtime: Object with a blocking `run(path)`, such as the shared model runtime.
+        model_path (str): The path to the Python script that should be executed.
+        payload: JSON-serialisable input the model is run on, if any.
+        cache (ResultCache): Defaults to the process-wide cache.
+        timeout (float): Seconds the run may take; defaults to the runtime's own timeout.
+        deadline (float): `time.monotonic()` value by which the run must end,
+            passed on to `runtime.run`.
+
+    Returns:
+        subprocess.CompletedProcess: As returned by `runtime.run`.
+    """
+    cache = get_result_cache() if cache is None else cache
+    with span('result_cache.get') as lookup:
+        key = cache.key(model_path, payload)
+        result = cache.get(key)
+        lookup.set(hit=result is not None)
+    if result is not None:
+        return result
+    with span('runtime.run', model_path=model_path) as run:
+        limits = {name: value for name, value in (('timeout', timeout), ('deadline', deadline)) if value is not None}
+        result = runtime.run(model_path, **limits)
+        run.set(returncode=result.returncode)
+    if result.returncode == 0:
+        cache.put(key, result)
+    return result
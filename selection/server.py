@@ -0,0 +1,342 @@
+import sys
+import os
+import json
+import asyncio
+import argparse
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selection.batching import MicroBatcher
+from selection.registry import get_registry
+from selection.result_cache import cached_run, get_result_cache
+from selection import tracing
+from selection.tracing import span
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Largest number of queries per BERT forward pass, and how long the first one waits for company
+default_max_batch_size = int(os.getenv("SERVER_MAX_BATCH_SIZE") or 32)
+default_max_wait_ms = float(os.getenv("SERVER_MAX_WAIT_MS") or 5)
+
+max_body_bytes = 1 << 20
+selection_methods = ('embedding', 'keyword', 'bm25', 'random', 'llm', 'hybrid', 'cascade')
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _embedding_batch(queries):
+    from selection.embedding_based_selection import embedding_model_selection_batch
+    return embedding_model_selection_batch(queries, batch_size=len(queries))
+
+def _keyword_selection(query):
+    from selection.keyword_based_selection import keyword_model_scores
+    with span('selection', selector='keyword'):
+        scores = keyword_model_scores(query)
+    if not scores:
+        return None, None
+    model_path = max(scores, key=scores.get)
+    return model_path, scores[model_path]
+
+def _bm25_selection(query):
+    from selection.bm25_selection import bm25_top_k
+    with span('selection', selector='bm25'):
+        top = bm25_top_k(query, k=1)
+    return top[0] if top else (None, None)
+
+
+class SelectionServer:
+    """Serves model selection and model execution over HTTP/1.1 with asyncio.
+
+    Endpoints:
+        POST /select  {"query": str, "method": "embedding"} -> {"model_path", "score", "method"}
+        POST /run     {"model_path": str} or {"query": str, "method": ...} -> {"model_path", "returncode", "stdout", "stderr"}
+        POST /run     {"model_paths": [str, ...]} or {"query": str, "top_k": int} -> {"results": [...], "partial": bool}
+        GET  /health  -> registry version, request count, batching and result cache statistics
+        GET  /metrics -> per-stage latency histograms in the Prometheus text format
+
+    Embedding selections from concurrent requests are grouped by a
+    `MicroBatcher`, so BERT runs one forward pass per batch instead of one per
+    request. Every other selector, and model runs, are blocking calls and run
+    on a thread pool, so the event loop never scores a query itself. Only
+    scripts listed in models.json can be run, and their outputs are served
+    from the result cache until the model's files change.
+
+    Args:
+        max_batch_size (int): Largest number of queries per BERT forward pass.
+        max_wait (float): Seconds a query waits for others to join its batch.
+        embedding_batch_fn (callable): Maps a list of queries to
+            (model_path, score) tuples; defaults to the BERT selector.
+        runtime: Object with a blocking `run(path)` returning a
+            `subprocess.CompletedProcess`; defaults to the shared model runtime.
+        result_cache (ResultCache): Cache of model outputs; defaults to the
+            process-wide one.
+    """
+
+    def __init__(self, max_batch_size=default_max_batch_size, max_wait=default_max_wait_ms / 1000,
+                 embedding_batch_fn=None, runtime=None, result_cache=None):
+        self.registry = get_registry()
+        # One batch at a time: BERT already uses every core for a single forward pass
+        self._batch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='server-batch')
+        self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='server')
+        self.batcher = MicroBatcher(embedding_batch_fn or _embedding_batch, max_batch_size=max_batch_size,
+                                    max_wait=max_wait, executor=self._batch_executor)
+        self._runtime = runtime
+        self.result_cache = get_result_cache() if result_cache is None else result_cache
+        self.requests = 0
+
+    @property
+    def runtime(self):
+        if self._runtime is None:
+            from selection.model_runtime import get_runtime
+            self._runtime = get_runtime()
+        return self._runtime
+
+    async def _blocking(self, fn, *args):
+        # Run in a copy of this context so spans opened by fn join the request's trace
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, context.run, fn, *args)
+
+    async def select(self, query, method='embedding'):
+        if method == 'embedding':
+            model_path, score = await self.batcher.submit(query)
+            return model_path, score
+        if method == 'keyword':
+            return await self._blocking(_keyword_selection, query)
+        if method == 'bm25':
+            return await self._blocking(_bm25_selection, query)
+        if method == 'random':
+            from selection.random_selection import random_model_selection
+            return await self._blocking(random_model_selection, query), None
+        if method == 'llm':
+            from selection.llm_based_selection import llm_model_selection
+            return (await self._blocking(llm_model_selection, query) or '').strip(), None
+        if method == 'hybrid':
+            from selection.hybrid_selection import hybrid_model_selection
+            return (await self._blocking(hybrid_model_selection, query) or '').strip(), None
+        if method == 'cascade':
+            from selection.cascade_selection import cascade_model_selection
+            model_path, details = await self._blocking(
+                lambda: cascade_model_selection(query, return_details=True))
+            return model_path, details['confidence']
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"Unknown method {method!r}, expected one of {selection_methods}")
+
+    async def handle(self, method, path, body):
+        """Routes one request.
+
+        Returns:
+            tuple: (HTTPStatus, JSON-serialisable payload, or str for plain text)
+        """
+        self.requests += 1
+        route = path.split('?', 1)[0].rstrip('/') or '/'
+
+        if route == '/health':
+            if method != 'GET':
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use GET")
+            return HTTPStatus.OK, {
+                'status': 'ok',
+                'registry_version': self.registry.version,
+                'models': len(self.registry.models),
+                'requests': self.requests,
+                'batching': self.batcher.stats(),
+                'result_cache': self.result_cache.stats(),
+            }
+
+        if route == '/metrics':
+            if method != 'GET':
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use GET")
+            return HTTPStatus.OK, tracing.render_metrics()
+
+        if route not in ('/select', '/run'):
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {route}")
+        if method != 'POST':
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST")
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body is not valid JSON")
+        if not isinstance(request, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+        selection_method = request.get('method', 'embedding')
+
+        if route == '/select':
+            query = request.get('query')
+            if not isinstance(query, str) or not query.strip():
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "'query' must be a non-empty string")
+            model_path, score = await self.select(query, selection_method)
+            return HTTPStatus.OK, {'model_path': model_path, 'score': score, 'method': selection_method}
+
+        top_k = request.get('top_k', 1)
+        if not isinstance(top_k, int) or top_k < 1:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'top_k' must be a positive integer")
+        if request.get('model_paths') is not None or top_k > 1:
+            return HTTPStatus.OK, await self.run_many(request)
+
+        model_path = request.get('model_path')
+        if model_path is None:
+            query = request.get('query')
+            if not isinstance(query, str) or not query.strip():
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Pass either 'model_path' or 'query'")
+            model_path, _ = await self.select(query, selection_method)
+            if not model_path:
+                raise HTTPError(HTTPStatus.UNPROCESSABLE_ENTITY, f"No model selected for the query by {selection_method!r}")
+        if model_path not in {model['model_path'] for model in self.registry.models}:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"{model_path!r} is not in the model registry")
+        result = await self._blocking(cached_run, self.runtime, os.path.normpath(os.path.join(base_dir, model_path)),
+                                      None, self.result_cache)
+        return HTTPStatus.OK, {
+            'model_path': model_path,
+            'returncode': result.returncode,
+            'stdout': result.stdout.strip(),
+            'stderr': result.stderr.strip(),
+        }
+
+    async def run_many(self, request):
+        """Runs every model in 'model_paths', or the query's top-k candidates, under one deadline."""
+        from selection.fanout import run_models, default_deadline
+
+        deadline = request.get('deadline')
+        if deadline is None:
+            deadline = default_deadline
+        if isinstance(deadline, bool) or not isinstance(deadline, (int, float)) or not 0 < deadline < float('inf'):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'deadline' must be a positive number of seconds")
+
+        model_paths = request.get('model_paths')
+        if model_paths is None:
+            query = request.get('query')
+            if not isinstance(query, str) or not query.strip():
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Pass either 'model_paths' or 'query'")
+            from selection.fanout import candidate_models
+            model_paths = await self._blocking(candidate_models, query, int(request['top_k']))
+        if not isinstance(model_paths, list) or not all(isinstance(path, str) for path in model_paths):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'model_paths' must be a list of strings")
+        registered = {model['model_path'] for model in self.registry.models}
+        unknown = [path for path in model_paths if path not in registered]
+        if unknown:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"{unknown[0]!r} is not in the model registry")
+
+        scripts = {os.path.normpath(os.path.join(base_dir, path)): path for path in model_paths}
+        results = await self._blocking(run_models, list(scripts), deadline, self.runtime, self.result_cache)
+        for result in results:
+            result['model_path'] = scripts[result['model_path']]
+        return {'results': results, 'partial': any(result['status'] != 'ok' for result in results)}
+
+    async def handle_connection(self, reader, writer):
+        """Serves requests on one keep-alive connection until the client closes it."""
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except HTTPError as error:
+                    await _write_response(writer, error.status, {'error': str(error)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                with span('http.request', method=method, path=path) as request_span:
+                    try:
+                        status, payload = await self.handle(method, path, body)
+                    except HTTPError as error:
+                        status, payload = error.status, {'error': str(error)}
+                    except Exception as error:
+                        status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f"{type(error).__name__}: {error}"}
+                    request_span.set(status=status.value)
+                await _write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8000, ready=None):
+        """Listens until cancelled; `ready`, if given, is called with the bound (host, port)."""
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            if ready is not None:
+                ready(server.sockets[0].getsockname()[:2])
+            try:
+                await server.serve_forever()
+            finally:
+                await self.batcher.close()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self._batch_executor.shutdown(wait=False)
+
+
+async def _read_request(reader):
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, path, version = request_line.decode('latin-1').split()
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if version == 'HTTP/1.0' and headers.get('connection', '').lower() != 'keep-alive':
+        headers['connection'] = 'close'
+
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+    if length > max_body_bytes:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+    body = await reader.readexactly(length) if length else b''
+    return method, path, headers, body
+
+async def _write_response(writer, status, payload, keep_alive):
+    if isinstance(payload, str):
+        body, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4'
+    else:
+        body, content_type = json.dumps(payload).encode('utf-8'), 'application/json'
+    head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve model selection and model execution over HTTP.')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on')
+    parser.add_argument('--max-batch-size', type=int, default=default_max_batch_size, help='Largest number of queries per BERT forward pass')
+    parser.add_argument('--max-wait-ms', type=float, default=default_max_wait_ms, help='Milliseconds a query waits for others to join its batch')
+    parser.add_argument('--no-warm-up', action='store_true', help='Load BERT on the first request instead of at start-up')
+    parser.add_argument('--no-tracing', action='store_true', help='Do not record the stage timings served on /metrics')
+    args = parser.parse_args()
+
+    if not args.no_tracing:
+        tracing.enable()
+
+    if not args.no_warm_up:
+        from selection.embedding_based_selection import warm_up
+        warm_up()
+
+    selection_server = SelectionServer(max_batch_size=args.max_batch_size, max_wait=args.max_wait_ms / 1000)
+    try:
+        asyncio.run(selection_server.serve(
+            args.host, args.port,
+            ready=lambda address: print(f"Serving on http://{address[0]}:{address[1]} "
+                                        f"(max batch {args.max_batch_size}, max wait {args.max_wait_ms} ms)")))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        selection_server.close()
@@ -0,0 +1,80 @@
+import re
+import math
+
+word_pattern = re.compile(r'\w+')
+
+shortlist_methods = ('embedding', 'lexical', 'bm25')
+
+
+class LexicalRanker:
+    """Ranks models by the idf-weighted words a query shares with them.
+
+    A model's words come from its description, tags and keywords.
+
+    Args:
+        models (list): Model entries as found in models.json.
+    """
+
+    def __init__(self, models):
+        self.models = models
+        self.model_words = []
+        document_frequency = {}
+        for model in models:
+            text = ' '.join([model.get('description', '')] + model.get('tags', []) + model.get('keywords', []))
+            words = set(word_pattern.findall(text.lower()))
+            self.model_words.append(words)
+            for word in words:
+                document_frequency[word] = document_frequency.get(word, 0) + 1
+        self.idf = {word: math.log(1 + len(models) / count) for word, count in document_frequency.items()}
+
+    def top_k(self, user_message, k):
+        query_words = set(word_pattern.findall(user_message.lower())) & self.idf.keys()
+        scores = [sum(self.idf[word] for word in query_words & words) for words in self.model_words]
+        ranked = sorted(range(len(self.models)), key=lambda i: -scores[i])
+        return [(self.models[i]['model_path'], scores[i]) for i in ranked[:k]]
+
+
+_lexical_rankers = {}
+
+def _lexical_ranker(models):
+    cached = _lexical_rankers.get(id(models))
+    # The list itself is kept alongside so a reused id() is never mistaken for it
+    if cached is None or cached[0] is not models:
+        cached = (models, LexicalRanker(models))
+        _lexical_rankers[id(models)] = cached
+    return cached[1]
+
+def shortlist_models(user_message, models_metadata, k, method='embedding'):
+    """Keeps only the k registry entries most relevant to a query.
+
+    Args:
+        user_message (str): The user query.
+        models_metadata (dict): The parsed models.json.
+        k (int): Number of entries to keep.
+        method (str): 'embedding' ranks by BERT cosine similarity, 'lexical' by
+            shared words, which needs no model and costs microseconds, and
+            'bm25' by the registry's BM25 index.
+
+    Returns:
+        dict: models.json-shaped metadata with at most k entries, in registry order.
+    """
+    models = models_metadata['models']
+    if k is None or k >= len(models):
+        return models_metadata
+
+    if method == 'embedding':
+        from selection.embedding_based_selection import embedding_top_k
+        ranked = embedding_top_k(user_message, k=k)
+    elif method == 'lexical':
+        ranked = _lexical_ranker(models).top_k(user_message, k)
+    elif method == 'bm25':
+        from selection.bm25_selection import bm25_top_k
+        ranked = bm25_top_k(user_message, k=k)
+        # BM25 only ranks models sharing a word with the query; with none, let the LLM see them all
+        if not ranked:
+            return models_metadata
+    else:
+        raise ValueError(f"Unknown shortlist method {method!r}, expected one of {shortlist_methods}")
+
+    selected = {model_path for model_path, _ in ranked}
+    return {'models': [model for model in models if model['model_path'] in selected]}
@@ -0,0 +1,259 @@
+import os
+import json
+import time
+import atexit
+import bisect
+import secrets
+import functools
+import threading
+import contextvars
+
+# TRACE_PATH: append every finished span to this JSONL file
+# METRICS_PATH: write Prometheus text-format histograms here when the process exits
+# TRACING=1: record spans and histograms without either file, e.g. for the server's /metrics
+trace_path = os.getenv("TRACE_PATH") or None
+metrics_path = os.getenv("METRICS_PATH") or None
+
+# Upper bounds in seconds, from sub-millisecond dictionary lookups to minute-long model runs
+default_buckets = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_enabled = bool(trace_path or metrics_path or (os.getenv("TRACING") or '').lower() in ('1', 'true', 'yes'))
+_current = contextvars.ContextVar('dama_span', default=None)
+_histograms = {}
+_metrics_lock = threading.Lock()
+_trace_file = None
+_trace_lock = threading.Lock()
+
+
+class Histogram:
+    """Cumulative latency histogram in the Prometheus layout."""
+
+    def __init__(self, buckets=default_buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.errors = 0
+
+    def observe(self, seconds, error=False):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        if error:
+            self.errors += 1
+
+
+class Span:
+    """Times one stage of a request and records it when the `with` block ends.
+
+    Spans opened inside another span (in the same thread or asyncio task)
+    share its trace id and name it as their parent.
+    """
+
+    __slots__ = ('name', 'selector', 'attributes', 'trace_id', 'span_id', 'parent_id',
+                 'start_time', '_start', '_token', 'duration')
+
+    def __init__(self, name, selector=None, attributes=None):
+        self.name = name
+        self.selector = selector
+        self.attributes = attributes or {}
+        self.duration = None
+
+    def set(self, **attributes):
+        """Adds attributes known only once the stage has run, such as a cache hit."""
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        parent = _current.get()
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.span_id = secrets.token_hex(4)
+        self.start_time = time.time()
+        self._token = _current.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._start
+        _current.reset(self._token)
+        _record(self, exc_type)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_noop_span = _NoopSpan()
+
+
+def is_enabled():
+    return _enabled
+
+def enable(trace_file=None):
+    """Starts recording spans, and writing them to `trace_file` if given."""
+    global _enabled, trace_path
+    if trace_file is not None:
+        _close_trace_file()
+        trace_path = trace_file
+    _enabled = True
+
+def disable():
+    """Stops recording spans and writing the trace file."""
+    global _enabled, trace_path
+    _enabled = False
+    _close_trace_file()
+    trace_path = None
+
+def span(name, selector=None, **attributes):
+    """Context manager timing the stage `name`.
+
+    Durations are added to the histogram for (name, selector) and, when
+    TRACE_PATH is set, written to the trace file. While tracing is disabled
+    this returns a shared object whose enter and exit do nothing.
+
+    Args:
+        name (str): The stage, e.g. 'encoder.forward' or 'llm.request'.
+        selector (str): The selector the stage belongs to, if any; becomes a
+            histogram label.
+        **attributes: Extra fields for the trace record.
+    """
+    if not _enabled:
+        return _noop_span
+    return Span(name, selector, attributes)
+
+def traced(name, selector=None):
+    """Decorator running every call of the function inside `span(name, selector)`."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(name, selector):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def current_span():
+    """Returns the innermost open span, or a no-op span when there is none."""
+    return _current.get() or _noop_span
+
+
+def _record(finished, exc_type):
+    key = (finished.name, finished.selector or '')
+    with _metrics_lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(finished.duration, error=exc_type is not None)
+
+    if trace_path is None:
+        return
+    record = {
+        'trace_id': finished.trace_id,
+        'span_id': finished.span_id,
+        'parent_id': finished.parent_id,
+        'name': finished.name,
+        'start': finished.start_time,
+        'duration_ms': finished.duration * 1000,
+    }
+    if finished.selector is not None:
+        record['selector'] = finished.selector
+    if exc_type is not None:
+        record['error'] = exc_type.__name__
+    if finished.attributes:
+        record['attributes'] = finished.attributes
+    line = json.dumps(record, default=str) + '\n'
+    with _trace_lock:
+        if trace_path is None:
+            return
+        trace_file = _open_trace_file()
+        trace_file.write(line)
+        # Flushed per request rather than per span to keep the write off the hot path
+        if finished.parent_id is None:
+            trace_file.flush()
+
+def _open_trace_file():
+    global _trace_file
+    if _trace_file is None:
+        directory = os.path.dirname(os.path.abspath(trace_path))
+        os.makedirs(directory, exist_ok=True)
+        _trace_file = open(trace_path, 'a', encoding='utf-8')
+    return _trace_file
+
+def _close_trace_file():
+    global _trace_file
+    with _trace_lock:
+        if _trace_file is not None:
+            _trace_file.close()
+            _trace_file = None
+
+
+def histograms():
+    """Returns a copy of the recorded histograms keyed by (stage, selector)."""
+    with _metrics_lock:
+        return {key: _copy_histogram(histogram) for key, histogram in _histograms.items()}
+
+def _copy_histogram(histogram):
+    copy = Histogram(histogram.buckets)
+    copy.counts = list(histogram.counts)
+    copy.sum, copy.count, copy.errors = histogram.sum, histogram.count, histogram.errors
+    return copy
+
+def reset_metrics():
+    with _metrics_lock:
+        _histograms.clear()
+
+def _labels(stage, selector):
+    escaped = [value.replace('\\', '\\\\').replace('"', '\\"') for value in (stage, selector)]
+    return f'stage="{escaped[0]}",selector="{escaped[1]}"'
+
+def render_metrics():
+    """Formats the histograms in the Prometheus text exposition format."""
+    lines = [
+        '# HELP dama_stage_duration_seconds Time spent in each stage of a request.',
+        '# TYPE dama_stage_duration_seconds histogram',
+    ]
+    snapshot = histograms()
+    for (stage, selector), histogram in sorted(snapshot.items()):
+        labels = _labels(stage, selector)
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f'dama_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'dama_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f'dama_stage_duration_seconds_sum{{{labels}}} {histogram.sum:.9f}')
+        lines.append(f'dama_stage_duration_seconds_count{{{labels}}} {histogram.count}')
+    lines.append('# HELP dama_stage_errors_total Stages that ended with an exception.')
+    lines.append('# TYPE dama_stage_errors_total counter')
+    for (stage, selector), histogram in sorted(snapshot.items()):
+        lines.append(f'dama_stage_errors_total{{{_labels(stage, selector)}}} {histogram.errors}')
+    return '\n'.join(lines) + '\n'
+
+def write_metrics(path=None):
+    """Writes `render_metrics()` to `path` (default METRICS_PATH) atomically."""
+    path = path or metrics_path
+    if path is None:
+        return None
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(render_metrics())
+    os.replace(tmp_path, path)
+    return path
+
+
+@atexit.register
+def _flush_at_exit():
+    if metrics_path is not None and _histograms:
+        write_metrics(metrics_path)
+    _close_trace_file()
@@ -0,0 +1,52 @@
+import sys
+import os
+import time
+import argparse
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selection.ann_index import IVFIndex
+
+def make_clustered_vectors(n, dim, clusters, noise, rng):
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    vectors = centers[rng.integers(0, clusters, n)] + noise * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure IVF index latency and recall against brute force.')
+    parser.add_argument('-n', '--size', type=int, default=100000, help='Number of indexed vectors')
+    parser.add_argument('-d', '--dim', type=int, default=768, help='Vector dimensionality')
+    parser.add_argument('-q', '--queries', type=int, default=500, help='Number of timed queries')
+    parser.add_argument('-k', type=int, default=10, help='Results per query')
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[4, 8, 16, 32], help='nprobe values to compare')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = make_clustered_vectors(args.size, args.dim, clusters=max(1, args.size // 50), noise=0.02, rng=rng)
+    queries = vectors[rng.choice(args.size, args.queries)] + 0.01 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    start = time.perf_counter()
+    index = IVFIndex(args.dim)
+    index.add(vectors, np.arange(args.size))
+    index.search(queries[0], k=args.k)
+    print(f"Built index over {args.size} vectors ({index.nlist} lists) in {time.perf_counter() - start:.2f} seconds")
+
+    start = time.perf_counter()
+    exact = [np.argpartition(-(vectors @ query), args.k - 1)[:args.k] for query in queries]
+    exact_ms = (time.perf_counter() - start) / args.queries * 1000
+    print(f"Brute force: {exact_ms:.3f} ms/query")
+
+    for nprobe in args.nprobe:
+        latencies = []
+        recalls = []
+        for query, expected in zip(queries, exact):
+            start = time.perf_counter()
+            _, ids = index.search(query, k=args.k, nprobe=nprobe)
+            latencies.append(time.perf_counter() - start)
+            recalls.append(len(set(ids) & set(expected)) / args.k)
+        latencies = np.array(latencies) * 1000
+        print(f"nprobe={nprobe}: p50 {np.percentile(latencies, 50):.3f} ms, "
+              f"p99 {np.percentile(latencies, 99):.3f} ms, recall@{args.k} {np.mean(recalls):.3f}")
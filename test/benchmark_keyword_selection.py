@@ -0,0 +1,79 @@
+import sys
+import os
+import re
+import time
+import random
+import argparse
+import statistics
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selection.keyword_based_selection import KeywordMatcher
+
+def make_synthetic_models(num_keywords, keywords_per_model=5, seed=0):
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(num_keywords)]
+    models = []
+    for start in range(0, num_keywords, keywords_per_model):
+        keywords = vocabulary[start:start + keywords_per_model]
+        # Some keywords span two words, like "social media"
+        if rng.random() < 0.2:
+            keywords.append(f"{keywords[0]} {rng.choice(vocabulary)}")
+        models.append({
+            'model_path': f"model_{start // keywords_per_model}.py",
+            'keywords': keywords
+        })
+    return models, vocabulary
+
+def make_queries(vocabulary, count, words_per_query=20, seed=1):
+    rng = random.Random(seed)
+    filler = ['what', 'is', 'the', 'best', 'way', 'to', 'model', 'for', 'my', 'data']
+    queries = []
+    for _ in range(count):
+        words = [rng.choice(filler) for _ in range(words_per_query - 2)]
+        words += rng.sample(vocabulary, 2)
+        rng.shuffle(words)
+        queries.append(' '.join(words))
+    return queries
+
+def regex_per_keyword_selection(keyword_model_map, user_message):
+    """The previous implementation: one regex search per keyword, first hit wins."""
+    user_message_lower = user_message.lower()
+    for keyword, model_path in keyword_model_map.items():
+        if re.search(r'\b' + re.escape(keyword) + r'\b', user_message_lower):
+            return model_path
+    return None
+
+def time_per_query(select, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        select(query)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e6, max(timings) * 1e6
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare keyword matchers on large keyword lists.')
+    parser.add_argument('-k', '--keywords', type=int, nargs='+', default=[100, 1000, 10000, 50000], help='Keyword list sizes')
+    parser.add_argument('-q', '--queries', type=int, default=200, help='Queries per size')
+    parser.add_argument('--skip-regex-above', type=int, default=10000, help='Skip the slow per-keyword regex baseline above this size')
+    args = parser.parse_args()
+
+    for num_keywords in args.keywords:
+        models, vocabulary = make_synthetic_models(num_keywords)
+        queries = make_queries(vocabulary, args.queries)
+
+        start = time.perf_counter()
+        matcher = KeywordMatcher(models)
+        build_ms = (time.perf_counter() - start) * 1000
+        median_us, max_us = time_per_query(matcher.select, queries)
+        print(f"{num_keywords} keywords: trie build {build_ms:.1f} ms, "
+              f"median {median_us:.1f} us/query, max {max_us:.1f} us/query")
+
+        if num_keywords <= args.skip_regex_above:
+            keyword_model_map = {}
+            for model in models:
+                for keyword in model['keywords']:
+                    keyword_model_map.setdefault(keyword.lower(), model['model_path'])
+            median_us, max_us = time_per_query(lambda q: regex_per_keyword_selection(keyword_model_map, q), queries[:20])
+            print(f"{num_keywords} keywords: regex per keyword median {median_us:.1f} us/query")
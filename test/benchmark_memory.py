@@ -0,0 +1,110 @@
+import sys
+import os
+import json
+import time
+import random
+import argparse
+import statistics
+from rich.table import Table
+from rich.console import Console
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selection.memory import TokenBudgetMemory, count_tokens, format_turns, truncate_to_tokens
+
+
+class UnboundedMemory:
+    """Keeps every turn verbatim, like ConversationBufferMemory."""
+
+    def __init__(self):
+        self.turns = []
+
+    def save_context(self, inputs, outputs):
+        self.turns.append((inputs['input'], outputs['output'], None))
+
+    def load_memory_variables(self, inputs=None):
+        return {'history': format_turns(self.turns)}
+
+
+def make_turn(rng):
+    words = ['glucose', 'risk', 'model', 'patient', 'weather', 'forecast', 'the', 'is', 'a', 'for', 'my', 'data']
+    human = ' '.join(rng.choice(words) for _ in range(rng.randint(5, 40)))
+    ai = ' '.join(rng.choice(words) for _ in range(rng.randint(20, 120)))
+    return human, ai
+
+def simulated_summarizer(latency):
+    def summarize(summary, turns_text):
+        # Stands in for an LLM call; the summary is bounded by the memory itself
+        time.sleep(latency)
+        return truncate_to_tokens(f"{summary} {turns_text}", 200)
+    return summarize
+
+def run_session(memory, turns, seed=0):
+    """Plays a session and records the history size and memory overhead of every turn."""
+    rng = random.Random(seed)
+    prompt_tokens = []
+    overhead = []
+    for _ in range(turns):
+        human, ai = make_turn(rng)
+        start = time.perf_counter()
+        history = memory.load_memory_variables({})['history']
+        memory.save_context({"input": human}, {"output": ai})
+        overhead.append(time.perf_counter() - start)
+        prompt_tokens.append(count_tokens(history))
+    return prompt_tokens, overhead
+
+def create_rich_table(results, checkpoints):
+    table = Table(title="History Tokens per Turn", expand=True)
+
+    table.add_column("Memory", style="cyan")
+    for turn in checkpoints:
+        table.add_column(f"Turn {turn}", justify="right", style="yellow")
+    table.add_column("Overhead p50 (us)", justify="right", style="green")
+    table.add_column("Overhead max (us)", justify="right", style="red")
+
+    for name, result in results.items():
+        table.add_row(
+            name,
+            *[str(result['prompt_tokens'][turn - 1]) for turn in checkpoints],
+            f"{result['overhead_p50_us']:.0f}",
+            f"{result['overhead_max_us']:.0f}",
+        )
+
+    return table
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure history size and memory overhead over long chat sessions.')
+    parser.add_argument('-t', '--turns', type=int, default=200, help='Turns per session')
+    parser.add_argument('--max-tokens', type=int, default=1000, help='Window budget of the bounded memory')
+    parser.add_argument('--summary-max-tokens', type=int, default=250, help='Summary budget of the bounded memory')
+    parser.add_argument('--summary-latency', type=float, default=0.5, help='Seconds each simulated summarisation call takes')
+    parser.add_argument('-o', '--output', help='Write per-turn results as JSON to this file')
+    args = parser.parse_args()
+
+    memories = {
+        'unbounded buffer': UnboundedMemory(),
+        'token budget': TokenBudgetMemory(
+            max_tokens=args.max_tokens,
+            summary_max_tokens=args.summary_max_tokens,
+            summarize=simulated_summarizer(args.summary_latency)
+        ),
+    }
+
+    results = {}
+    for name, memory in memories.items():
+        prompt_tokens, overhead = run_session(memory, args.turns)
+        results[name] = {
+            'prompt_tokens': prompt_tokens,
+            'overhead_p50_us': statistics.median(overhead) * 1e6,
+            'overhead_max_us': max(overhead) * 1e6,
+        }
+    memories['token budget'].wait()
+
+    checkpoints = sorted({1, 10, 50, 100, args.turns} & set(range(1, args.turns + 1)))
+    Console().print(create_rich_table(results, checkpoints))
+    print("Summarisation runs in the background, so its simulated "
+          f"{args.summary_latency * 1000:.0f} ms per call does not appear in the per-turn overhead.")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
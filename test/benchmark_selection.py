@@ -0,0 +1,309 @@
+import sys
+import os
+import json
+import time
+import random
+import argparse
+import platform
+import resource
+import subprocess
+import numpy as np
+from rich.table import Table
+from rich.console import Console
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+test_queries_path = os.path.join(base_dir, 'test_queries.json')
+models_path = os.path.join(base_dir, 'models.json')
+
+test_query_selectors = ['random', 'keyword', 'bm25', 'embedding', 'llm', 'hybrid']
+synthetic_selectors = ['random', 'keyword', 'bm25', 'embedding_exact', 'embedding_ivf', 'llm', 'llm_shortlist']
+replicated_selectors = ['keyword', 'bm25']
+
+# Sending a 100k-entry registry in every prompt is slow even against the stub
+max_llm_queries_large_registry = 20
+synthetic_dim = 768
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if platform.system() == 'Darwin' else peak / 1024
+
+
+def make_synthetic_registry(size, seed=0):
+    """Builds a registry of `size` models with one distinctive keyword each.
+
+    Every model also gets a unit vector standing in for its description
+    embedding. Each query names its target model's keyword and comes with a
+    noisy copy of the target vector as its query embedding.
+    """
+    rng = np.random.default_rng(seed)
+    shared = ['predict', 'forecast', 'risk', 'analysis', 'trend', 'recommend']
+    models = []
+    for i in range(size):
+        topic = f"topic{i}"
+        models.append({
+            'model_path': f"synthetic_{i}.py",
+            'description': f"Model for {topic} {shared[i % len(shared)]}",
+            'tags': [topic, shared[i % len(shared)]],
+            'keywords': [topic, shared[i % len(shared)], shared[(i + 1) % len(shared)]],
+        })
+    vectors = rng.standard_normal((size, synthetic_dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return models, vectors
+
+
+def make_replicated_registry(size):
+    """Builds a registry of `size` models by repeating the entries of models.json.
+
+    Unlike the synthetic registry, every query word is shared by thousands of
+    models, which is the hard case for the lexical selectors. The first copy
+    of each model keeps its path, so with ties going to registry order the
+    answers to test_queries.json stay checkable.
+    """
+    with open(models_path) as f:
+        base = json.load(f)['models']
+    copies = -(-size // len(base))
+    return [dict(model, model_path=model['model_path'] if copy == 0 else f"copy{copy}_{model['model_path']}")
+            for copy in range(copies) for model in base][:size]
+
+
+def make_synthetic_queries(models, vectors, count, seed=1):
+    rng = np.random.default_rng(seed)
+    targets = rng.integers(0, len(models), count)
+    queries = []
+    for target in targets:
+        model = models[target]
+        query_vector = vectors[target] + 0.5 * rng.standard_normal(synthetic_dim).astype(np.float32) / np.sqrt(synthetic_dim)
+        queries.append({
+            'user_query': f"What is the {model['keywords'][1]} for {model['keywords'][0]} next month?",
+            'expected_model': model['model_path'],
+            # float32 like the registry vectors; a float64 query would upcast the whole matrix per search
+            'embedding': (query_vector / np.linalg.norm(query_vector)).astype(np.float32),
+        })
+    return queries
+
+
+def build_test_query_selector(name):
+    """Returns (select, scored) for a selector over models.json; scored is False when accuracy is meaningless."""
+    if name == 'random':
+        from selection.random_selection import random_model_selection
+        return random_model_selection, True
+    if name == 'keyword':
+        from selection.keyword_based_selection import keyword_model_selection
+        return keyword_model_selection, True
+    if name == 'bm25':
+        from selection.bm25_selection import bm25_model_selection
+        return bm25_model_selection, True
+    if name == 'embedding':
+        from selection.embedding_based_selection import embedding_model_selection, warm_up
+        warm_up()
+        return embedding_model_selection, True
+    if name == 'llm':
+        from selection.llm_based_selection import llm_model_selection
+        return lambda query: llm_model_selection(query, use_cache=False), False
+    if name == 'hybrid':
+        from selection.embedding_based_selection import warm_up
+        from selection.hybrid_selection import hybrid_model_selection
+        warm_up()
+        return hybrid_model_selection, False
+    raise ValueError(f"Unknown selector {name!r}")
+
+def build_synthetic_selector(name, models, vectors):
+    """Returns (select, scored) where select takes a synthetic query dict."""
+    if name == 'random':
+        return lambda query: random.choice(models)['model_path'], True
+    if name == 'keyword':
+        from selection.keyword_based_selection import KeywordMatcher
+        matcher = KeywordMatcher(models)
+        return lambda query: matcher.select(query['user_query']), True
+    if name == 'bm25':
+        from selection.bm25_selection import BM25Index
+        index = BM25Index(models)
+        return lambda query: index.select(query['user_query']), True
+    if name == 'embedding_exact':
+        # Measures the lookup only; the BERT pass for the query does not depend on registry size
+        return lambda query: models[int(np.argmax(vectors @ query['embedding']))]['model_path'], True
+    if name == 'embedding_ivf':
+        from selection.ann_index import IVFIndex
+        index = IVFIndex(synthetic_dim)
+        index.add(vectors, np.arange(len(vectors)))
+        index.search(vectors[0], k=1)
+        return lambda query: models[int(index.search(query['embedding'], k=1)[1][0])]['model_path'], True
+    if name in ('llm', 'llm_shortlist'):
+        from selection.llm_client import get_openai_client, chat_completion
+        from selection.llm_based_selection import selection_messages, llm_model_name
+        from selection.shortlist import shortlist_models
+        metadata = {'models': models}
+        shortlist_k = 5 if name == 'llm_shortlist' else None
+        def select(query):
+            prompt_metadata = shortlist_models(query['user_query'], metadata, shortlist_k, method='lexical')
+            response = chat_completion(get_openai_client(), model=llm_model_name,
+                                       messages=selection_messages(query['user_query'], prompt_metadata))
+            return response.choices[0].message.content
+        # The stub answers from the real registry, so only latency is meaningful
+        return select, False
+    raise ValueError(f"Unknown selector {name!r}")
+
+
+def run_worker(suite, selector, num_queries):
+    """Benchmarks one selector on one suite in this process and returns the result row."""
+    start = time.perf_counter()
+    if suite == 'test_queries':
+        with open(test_queries_path) as f:
+            queries = json.load(f)
+        select, scored = build_test_query_selector(selector)
+        run = lambda query: select(query['user_query'])
+        registry_size = None
+    elif suite.startswith('replicated-'):
+        registry_size = int(suite.split('-')[1])
+        with open(test_queries_path) as f:
+            queries = json.load(f)
+        models = make_replicated_registry(registry_size)
+        select, scored = build_synthetic_selector(selector, models, None)
+        run = select
+    else:
+        registry_size = int(suite.split('-')[1])
+        models, vectors = make_synthetic_registry(registry_size)
+        queries = make_synthetic_queries(models, vectors, num_queries)
+        if selector.startswith('llm') and registry_size > 1000:
+            queries = queries[:max_llm_queries_large_registry]
+        select, scored = build_synthetic_selector(selector, models, vectors)
+        run = select
+    setup_seconds = time.perf_counter() - start
+
+    latencies = []
+    correct = 0
+    wall_start = time.perf_counter()
+    for query in queries:
+        start = time.perf_counter()
+        answer = run(query)
+        latencies.append(time.perf_counter() - start)
+        if answer is not None and answer.strip() == query['expected_model']:
+            correct += 1
+    wall_seconds = time.perf_counter() - wall_start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'suite': suite,
+        'registry_size': registry_size,
+        'selector': selector,
+        'queries': len(queries),
+        'accuracy': correct / len(queries) * 100 if scored else None,
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'qps': len(queries) / wall_seconds if wall_seconds > 0 else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'setup_s': setup_seconds,
+    }
+
+def run_in_subprocess(suite, selector, num_queries, env, timeout):
+    """Runs one benchmark in a fresh interpreter so peak RSS belongs to that selector alone."""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', suite, selector, '--queries', str(num_queries)],
+        capture_output=True, text=True, cwd=base_dir, env=env, timeout=timeout
+    )
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        error = (result.stderr.strip().splitlines() or ['unknown error'])[-1]
+        return {'suite': suite, 'selector': selector, 'error': error}
+    return json.loads(lines[-1])
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=base_dir, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def create_rich_table(results):
+    table = Table(title="Selection Benchmark", expand=True)
+
+    table.add_column("Suite", style="cyan")
+    table.add_column("Selector", style="cyan")
+    table.add_column("Accuracy", justify="right", style="green")
+    table.add_column("p50 (ms)", justify="right", style="yellow")
+    table.add_column("p95 (ms)", justify="right", style="yellow")
+    table.add_column("p99 (ms)", justify="right", style="yellow")
+    table.add_column("QPS", justify="right", style="blue")
+    table.add_column("Peak RSS (MB)", justify="right", style="magenta")
+
+    for row in results:
+        if 'error' in row:
+            table.add_row(row['suite'], row['selector'], f"[red]{row['error'][:60]}[/red]", '', '', '', '', '')
+            continue
+        table.add_row(
+            row['suite'],
+            row['selector'],
+            '-' if row['accuracy'] is None else f"{row['accuracy']:.2f}%",
+            f"{row['p50_ms']:.3f}",
+            f"{row['p95_ms']:.3f}",
+            f"{row['p99_ms']:.3f}",
+            f"{row['qps']:.1f}",
+            f"{row['peak_rss_mb']:.0f}",
+        )
+
+    return table
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark model selectors offline against a stubbed LLM endpoint.')
+    parser.add_argument('--registry-sizes', type=int, nargs='*', default=[10, 1000, 100000], help='Synthetic registry sizes')
+    parser.add_argument('--replicated-sizes', type=int, nargs='*', default=[100000],
+                        help='Sizes of registries made of repeated models.json entries')
+    parser.add_argument('--selectors', nargs='+', help='Only run these selectors')
+    parser.add_argument('--queries', type=int, default=200, help='Queries per synthetic registry')
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='Seconds the stub LLM waits before answering')
+    parser.add_argument('--skip-test-queries', action='store_true', help='Skip the models.json / test_queries.json suite')
+    parser.add_argument('--timeout', type=float, default=1800, help='Seconds allowed per selector run')
+    parser.add_argument('-o', '--output', default='selection_benchmark.json', help='JSON file for the results')
+    parser.add_argument('--worker', nargs=2, metavar=('SUITE', 'SELECTOR'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker[0], args.worker[1], args.queries)))
+        sys.exit(0)
+
+    from mock_openai_server import MockOpenAIServer
+
+    runs = []
+    if not args.skip_test_queries:
+        runs += [('test_queries', selector) for selector in test_query_selectors]
+    for size in args.registry_sizes:
+        runs += [(f"synthetic-{size}", selector) for selector in synthetic_selectors]
+    for size in args.replicated_sizes:
+        runs += [(f"replicated-{size}", selector) for selector in replicated_selectors]
+    if args.selectors:
+        runs = [(suite, selector) for suite, selector in runs if selector in args.selectors]
+
+    console = Console()
+    results = []
+    with MockOpenAIServer(latency=args.llm_latency) as server:
+        env = dict(os.environ, OPENAI_BASE_URL=server.base_url, OPENAI_API_KEY='benchmark', LLM_CACHE_PATH=':memory:')
+        for suite, selector in runs:
+            console.print(f"Running {selector} on {suite}...")
+            try:
+                results.append(run_in_subprocess(suite, selector, args.queries, env, args.timeout))
+            except subprocess.TimeoutExpired:
+                results.append({'suite': suite, 'selector': selector, 'error': f"timed out after {args.timeout} seconds"})
+
+    console.print(create_rich_table(results))
+
+    report = {
+        'git_revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            'registry_sizes': args.registry_sizes,
+            'replicated_sizes': args.replicated_sizes,
+            'queries': args.queries,
+            'llm_latency_s': args.llm_latency,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    console.print(f"Results written to {args.output}")
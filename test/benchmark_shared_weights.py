@@ -0,0 +1,118 @@
+import sys
+import os
+import json
+import time
+import argparse
+import subprocess
+from rich.table import Table
+from rich.console import Console
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selection.embedding_based_selection import encoder_name
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def memory_kb(pid):
+    """Reads Rss, Pss and their anonymous and file-backed parts from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return fields
+
+def run_worker(backend, encoder):
+    """Loads the encoder, embeds once so every weight page is touched, then idles until stdin closes."""
+    from selection.encoders import load_encoder
+    load_encoder(encoder, backend).embed(['warm up every layer of the encoder'])
+    print('ready', flush=True)
+    sys.stdin.read()
+
+def measure(backend, encoder, workers):
+    """Starts `workers` encoder processes side by side and sums their memory once all are loaded."""
+    processes = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), '--worker', backend, '--encoder', encoder],
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                         text=True, cwd=base_dir)
+        for _ in range(workers)
+    ]
+    try:
+        for process in processes:
+            if process.stdout.readline().strip() != 'ready':
+                raise RuntimeError(f"{backend} worker exited with {process.wait()}")
+        usage = [memory_kb(process.pid) for process in processes]
+    finally:
+        for process in processes:
+            process.stdin.close()
+            process.wait()
+
+    total = lambda field: sum(fields.get(field, 0) for fields in usage) / 1024
+    return {
+        'backend': backend,
+        'workers': workers,
+        'rss_mb': total('Rss'),
+        'pss_mb': total('Pss'),
+        'pss_anon_mb': total('Pss_Anon'),
+        'pss_file_mb': total('Pss_File'),
+        'pss_per_worker_mb': total('Pss') / workers,
+    }
+
+def create_rich_table(results):
+    table = Table(title="Encoder Memory per Worker Count", expand=True)
+
+    table.add_column("Backend", style="cyan")
+    table.add_column("Workers", justify="right", style="cyan")
+    table.add_column("Total RSS (MB)", justify="right", style="yellow")
+    table.add_column("Total PSS (MB)", justify="right", style="green")
+    table.add_column("PSS anon (MB)", justify="right", style="magenta")
+    table.add_column("PSS file (MB)", justify="right", style="magenta")
+    table.add_column("PSS / worker (MB)", justify="right", style="blue")
+
+    for row in results:
+        table.add_row(
+            row['backend'],
+            str(row['workers']),
+            f"{row['rss_mb']:.0f}",
+            f"{row['pss_mb']:.0f}",
+            f"{row['pss_anon_mb']:.0f}",
+            f"{row['pss_file_mb']:.0f}",
+            f"{row['pss_per_worker_mb']:.0f}",
+        )
+
+    return table
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure total RSS and PSS of N encoder worker processes.')
+    parser.add_argument('--backends', nargs='+', default=['fp32', 'mmap'], help='Encoder backends to compare')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='Worker counts')
+    parser.add_argument('--encoder', default=encoder_name, help='Hugging Face name or local path of the encoder')
+    parser.add_argument('-o', '--output', default='shared_weights_benchmark.json', help='JSON file for the results')
+    parser.add_argument('--worker', metavar='BACKEND', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.encoder)
+        sys.exit(0)
+
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        sys.exit("PSS is read from /proc/<pid>/smaps_rollup, which needs Linux 4.14 or later")
+
+    console = Console()
+    results = []
+    for backend in args.backends:
+        # One worker first, so the mmap export exists before several processes look for it
+        for workers in sorted(args.workers):
+            console.print(f"Measuring {workers} {backend} worker(s)...")
+            results.append(measure(backend, args.encoder, workers))
+
+    console.print(create_rich_table(results))
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'encoder': args.encoder,
+            'results': results,
+        }, f, indent=2)
+    console.print(f"Results written to {args.output}")
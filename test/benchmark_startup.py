@@ -0,0 +1,88 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from rich.table import Table
+from rich.console import Console
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+selector_modules = [
+    'selection.random_selection',
+    'selection.keyword_based_selection',
+    'selection.embedding_based_selection',
+    'selection.llm_based_selection',
+    'selection.hybrid_selection',
+]
+
+import_snippet = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+def measure_import_time(module, runs=5):
+    """Measures how long a cold import of a module takes.
+
+    Every run uses a fresh interpreter so nothing is already in sys.modules.
+
+    Args:
+        module (str): Dotted name of the module to import.
+        runs (int): Number of fresh interpreters to time.
+
+    Returns:
+        list: Import times in seconds, one per run.
+    """
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-c', import_snippet.format(module=module)],
+            capture_output=True, text=True, cwd=base_dir
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed: {result.stderr.strip()}")
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return timings
+
+def create_rich_table(results):
+    table = Table(title="Selector Import Time", expand=True)
+
+    table.add_column("Module", style="cyan")
+    table.add_column("Median (ms)", justify="right", style="green")
+    table.add_column("Min (ms)", justify="right", style="yellow")
+    table.add_column("Max (ms)", justify="right", style="red")
+
+    for row in results:
+        table.add_row(
+            row['module'],
+            f"{row['median_ms']:.1f}",
+            f"{row['min_ms']:.1f}",
+            f"{row['max_ms']:.1f}"
+        )
+
+    return table
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure the cold import time of each selector module.')
+    parser.add_argument('-n', '--runs', type=int, default=5, help='Fresh interpreters per module')
+    parser.add_argument('-o', '--output', help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    results = []
+    for module in selector_modules:
+        timings = measure_import_time(module, runs=args.runs)
+        results.append({
+            'module': module,
+            'median_ms': statistics.median(timings) * 1000,
+            'min_ms': min(timings) * 1000,
+            'max_ms': max(timings) * 1000,
+        })
+
+    Console().print(create_rich_table(results))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -1,33 +1,75 @@
-import openai
-import google.generativeai as genai
-from anthropic import Anthropic
 import os
 import json
+import asyncio
 import argparse
 from dotenv import load_dotenv
 from rich.table import Table
 from rich.console import Console
 from rich.progress import Progress, BarColumn, TextColumn, TimeElapsedColumn
+import numpy as np
+import sys
 import time
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selection.shortlist import shortlist_models, shortlist_methods
+from selection.llm_client import async_retrying, build_async_http_client, connection_stats, timeouts
+
 load_dotenv()
 
+providers = ['openai', 'gemini', 'anthropic']
+
+# Requests in flight per provider; keep these under each account's rate limits
+default_concurrency = {'openai': 8, 'gemini': 4, 'anthropic': 4}
+
 def create_rich_table(results):
     table = Table(title="Model Selection Results", expand=True)
-    
+
     table.add_column("User Query", style="cyan", width=20)
     table.add_column("Expected Model", style="green", width=20)
+    table.add_column("Provider", style="blue", width=8)
     table.add_column("Result", style="yellow", width=10)
+    table.add_column("Latency (s)", justify="right", style="magenta", width=7)
+    table.add_column("Tokens In/Out", justify="right", style="magenta", width=9)
     table.add_column("Correct", justify="center", style="green", width=5)
 
     for i, row in enumerate(results):
         table.add_row(
-            row['query'], 
-            row['expected_model'], 
-            row['result'], 
+            row['query'],
+            row['expected_model'],
+            row['provider'],
+            row['result'] if row['error'] is None else f"[red]{row['error']}[/red]",
+            f"{row['latency']:.2f}",
+            f"{row['input_tokens']}/{row['output_tokens']}",
             "✔️" if row['correct'] else "❌"
         )
-    
+
+    return table
+
+def create_summary_table(summaries):
+    table = Table(title="Provider Summary", expand=True)
+
+    table.add_column("Provider", style="cyan")
+    table.add_column("Accuracy", justify="right", style="green")
+    table.add_column("Errors", justify="right", style="red")
+    table.add_column("p50 (s)", justify="right", style="yellow")
+    table.add_column("p95 (s)", justify="right", style="yellow")
+    table.add_column("Tokens In", justify="right", style="magenta")
+    table.add_column("Tokens Out", justify="right", style="magenta")
+    table.add_column("Retries", justify="right", style="blue")
+
+    for provider, summary in summaries.items():
+        table.add_row(
+            provider,
+            f"{summary['accuracy']:.2f}%",
+            str(summary['errors']),
+            f"{summary['p50_latency']:.2f}",
+            f"{summary['p95_latency']:.2f}",
+            str(summary['input_tokens']),
+            str(summary['output_tokens']),
+            str(summary['retries']),
+        )
+
     return table
 
 base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -36,14 +78,9 @@ models_path = os.path.join(base_dir, 'models.json')
 with open(models_path) as f:
     models_metadata = json.load(f)
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
-anthropic_client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-
-models_metadata_str = json.dumps(models_metadata)
-system_message = f"""
+def build_system_message(metadata):
+    models_metadata_str = json.dumps(metadata)
+    return f"""
 You are a helpful assistant. You have the following models metadata: {models_metadata_str}.
 If the user asks anything, search the model and tell which model_path to use.
 Answer just the model path, no extra information. Just give the model path.
@@ -52,36 +89,153 @@ If the user query links to any of the model descriptions or tags, even the sligh
 If it's a random question, just answer as you normally do.
 """
 
-def llm_model_selection(user_message, api_provider='openai'):
+system_message = build_system_message(models_metadata)
+
+def build_client(api_provider):
+    """Creates the async client for a provider; only the SDKs of the providers being evaluated are imported.
+
+    The SDKs' own retries are turned off so that `call_with_backoff` is the
+    single place that waits out rate limits and counts retries. The OpenAI and
+    Anthropic clients use the shared keep-alive pool settings and timeouts;
+    Gemini's SDK manages its own transport.
+    """
+    if api_provider == 'openai':
+        import openai
+        return openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0,
+                                  timeout=timeouts(), http_client=build_async_http_client())
+    elif api_provider == 'gemini':
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        return genai
+    elif api_provider == 'anthropic':
+        from anthropic import AsyncAnthropic
+        return AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"), max_retries=0,
+                              timeout=timeouts(), http_client=build_async_http_client())
+    raise ValueError(f"Unknown provider {api_provider!r}")
+
+async def llm_model_selection(client, user_message, prompt, api_provider='openai'):
+    """Asks one provider for a model path.
+
+    Returns:
+        tuple: (answer, input_tokens, output_tokens)
+    """
     if api_provider == 'openai':
-        response = openai.chat.completions.create(
+        response = await client.chat.completions.create(
             model="gpt-4",
             messages=[
-                {"role": "system", "content": system_message},
+                {"role": "system", "content": prompt},
                 {"role": "user", "content": user_message}
             ]
         )
-        return response.choices[0].message.content.strip()
+        usage = response.usage
+        return (response.choices[0].message.content.strip(),
+                usage.prompt_tokens if usage else None, usage.completion_tokens if usage else None)
 
     elif api_provider == 'gemini':
-        model=genai.GenerativeModel(
-        model_name="gemini-1.5-flash",
-        system_instruction=system_message)
-        response = model.generate_content(user_message)
-        return response.text.strip()
+        model = client.GenerativeModel(
+            model_name="gemini-1.5-flash",
+            system_instruction=prompt)
+        response = await model.generate_content_async(user_message)
+        usage = response.usage_metadata
+        return response.text.strip(), usage.prompt_token_count, usage.candidates_token_count
 
     elif api_provider == 'anthropic':
-        response = anthropic_client.messages.create(
+        response = await client.messages.create(
             model="claude-3-5-sonnet-20240620",
             max_tokens=512,
-            system=system_message,
+            system=prompt,
             messages=[
                 {"role": "user", "content": user_message}
             ]
         )
-        return response.content[0].text.strip()
+        return response.content[0].text.strip(), response.usage.input_tokens, response.usage.output_tokens
+
+async def call_with_backoff(semaphore, request):
+    """Runs `request()` under the provider's concurrency limit, retrying transient failures.
+
+    Retries follow the shared policy in selection.llm_client: 429, 5xx and
+    dropped connections, with full-jitter exponential backoff that honours
+    Retry-After. The semaphore is released while backing off so other
+    queries can use the slot.
 
-def run_test_cases(api_provider='openai'):
+    Returns:
+        tuple: (result, latency of the successful attempt, retries)
+    """
+    async for attempt in async_retrying():
+        with attempt:
+            async with semaphore:
+                start = time.perf_counter()
+                result = await request()
+                latency = time.perf_counter() - start
+    return result, latency, attempt.retry_state.attempt_number - 1
+
+async def evaluate_case(client, semaphore, api_provider, test_case, prompt, progress, task):
+    row = {
+        'provider': api_provider,
+        'query': test_case['query'],
+        'expected_model': test_case['expected_model'],
+        'result': None,
+        'correct': False,
+        'latency': 0.0,
+        'input_tokens': None,
+        'output_tokens': None,
+        'retries': 0,
+        'error': None,
+    }
+    try:
+        (result, input_tokens, output_tokens), latency, retries = await call_with_backoff(
+            semaphore, lambda: llm_model_selection(client, test_case['query'], prompt, api_provider=api_provider))
+        row.update({
+            'result': result,
+            'correct': result.strip() == test_case['expected_model'],
+            'latency': latency,
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'retries': retries,
+        })
+    except Exception as error:
+        row['error'] = f"{type(error).__name__}: {error}"[:200]
+    progress.advance(task)
+    return row
+
+def summarize(rows):
+    latencies = [row['latency'] for row in rows if row['error'] is None] or [0.0]
+    return {
+        'accuracy': sum(row['correct'] for row in rows) / len(rows) * 100,
+        'errors': sum(row['error'] is not None for row in rows),
+        'p50_latency': float(np.percentile(latencies, 50)),
+        'p95_latency': float(np.percentile(latencies, 95)),
+        'input_tokens': sum(row['input_tokens'] or 0 for row in rows),
+        'output_tokens': sum(row['output_tokens'] or 0 for row in rows),
+        'retries': sum(row['retries'] for row in rows),
+    }
+
+async def evaluate(test_cases, prompts, api_providers, concurrency):
+    """Sends every test case to every provider at once, each provider bounded by its own semaphore."""
+    clients = {api_provider: build_client(api_provider) for api_provider in api_providers}
+    semaphores = {api_provider: asyncio.Semaphore(concurrency[api_provider]) for api_provider in api_providers}
+
+    with Progress(
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        "[progress.percentage]{task.percentage:>3.0f}%",
+        "•",
+        TimeElapsedColumn(),
+    ) as progress:
+        tasks = {api_provider: progress.add_task(api_provider, total=len(test_cases)) for api_provider in api_providers}
+        rows = await asyncio.gather(*[
+            evaluate_case(clients[api_provider], semaphores[api_provider], api_provider,
+                          test_case, prompt, progress, tasks[api_provider])
+            for api_provider in api_providers
+            for test_case, prompt in zip(test_cases, prompts)
+        ])
+
+    for client in clients.values():
+        if hasattr(client, 'close'):
+            await client.close()
+    return rows
+
+def run_test_cases(api_providers=('openai',), shortlist_k=None, shortlist_method='embedding', concurrency=None, output=None):
     test_cases = [
         {
             "query": "When is the optimal season to sow barley in temperate climates?",
@@ -133,55 +287,66 @@ def run_test_cases(api_provider='openai'):
         }
     ]
 
-    results = []
-    correct = 0
-    total = len(test_cases)
+    concurrency = dict(default_concurrency, **(concurrency or {}))
 
     start_time = time.time()
 
+    # Prompts depend only on the query, so they are built once and shared by all providers
+    if shortlist_k:
+        prompts = [build_system_message(shortlist_models(test_case['query'], models_metadata, shortlist_k, method=shortlist_method))
+                   for test_case in test_cases]
+    else:
+        prompts = [system_message] * len(test_cases)
+
     console = Console()
-    with Progress(
-        TextColumn("[progress.description]{task.description}"),
-        BarColumn(),
-        "[progress.percentage]{task.percentage:>3.0f}%",
-        "•",
-        TimeElapsedColumn(),
-    ) as progress:
-        task = progress.add_task("Processing...", total=total)
-
-        for i, test_case in enumerate(test_cases):
-            result = llm_model_selection(test_case['query'], api_provider=api_provider)
-            is_correct = result.strip() == test_case['expected_model']
-            results.append({
-                'query': test_case['query'],
-                'expected_model': test_case['expected_model'],
-                'result': result,
-                'correct': is_correct
-            })
-            if is_correct:
-                correct += 1
-
-            progress.advance(task)
+    results = asyncio.run(evaluate(test_cases, prompts, api_providers, concurrency))
 
     table = create_rich_table(results)
     console.print(table)
 
-    accuracy = (correct / total) * 100
-    console.print(f"Accuracy for {api_provider}: {accuracy:.2f}%")
+    summaries = {api_provider: summarize([row for row in results if row['provider'] == api_provider])
+                 for api_provider in api_providers}
+    console.print(create_summary_table(summaries))
+    connections = connection_stats.snapshot()
+    console.print(f"HTTP requests: {connections['requests']}, new connections: {connections['connections']}, "
+                  f"reused: {connections['reused']}")
 
     end_time = time.time()
     elapsed_time = end_time - start_time
     console.print(f"Total time taken: {elapsed_time:.2f} seconds")
 
+    if output:
+        with open(output, 'w') as f:
+            json.dump({'elapsed_seconds': elapsed_time, 'summaries': summaries, 'connections': connections,
+                       'results': results}, f, indent=2)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Run model selection using different LLMs.')
     parser.add_argument('-g', '--google', action='store_true', help='Use Google Gemini API')
     parser.add_argument('-a', '--anthropic', action='store_true', help='Use Anthropic API')
+    parser.add_argument('--all', action='store_true', help='Evaluate OpenAI, Gemini and Anthropic concurrently')
+    parser.add_argument('-k', '--shortlist-k', type=int, help='Send only the top-k retrieved models instead of the whole registry')
+    parser.add_argument('--shortlist-method', choices=shortlist_methods, default='embedding', help='Retrieval used for the shortlist')
+    parser.add_argument('-c', '--concurrency', nargs='+', metavar='PROVIDER=N', default=[],
+                        help='Requests in flight per provider, e.g. openai=16 anthropic=2')
+    parser.add_argument('-o', '--output', help='Write per-query results and summaries as JSON to this file')
     args = parser.parse_args()
 
-    if args.google:
-        run_test_cases(api_provider='gemini')
+    if args.all:
+        api_providers = providers
+    elif args.google:
+        api_providers = ['gemini']
     elif args.anthropic:
-        run_test_cases(api_provider='anthropic')
+        api_providers = ['anthropic']
     else:
-        run_test_cases(api_provider='openai')
+        api_providers = ['openai']
+
+    concurrency = {}
+    for item in args.concurrency:
+        name, _, value = item.partition('=')
+        if name not in providers or not value.isdigit() or int(value) < 1:
+            parser.error(f"invalid --concurrency entry {item!r}")
+        concurrency[name] = int(value)
+
+    run_test_cases(api_providers=api_providers, shortlist_k=args.shortlist_k, shortlist_method=args.shortlist_method,
+                   concurrency=concurrency, output=args.output)
@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+import itertools
+import httpx
+import numpy as np
+from rich.table import Table
+from rich.console import Console
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+test_queries_path = os.path.join(base_dir, 'test_queries.json')
+
+
+async def client_loop(client, url, payloads, deadline, latencies, errors):
+    """Sends requests back to back until the deadline, like one user with no think time."""
+    while time.perf_counter() < deadline:
+        payload = next(payloads)
+        start = time.perf_counter()
+        try:
+            response = await client.post(url, json=payload)
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors.append(f"HTTP {response.status_code}: {response.text[:80]}")
+        except httpx.HTTPError as error:
+            errors.append(f"{type(error).__name__}: {error}")
+
+async def run_level(base_url, endpoint, method, concurrency, duration, queries):
+    """Runs `concurrency` clients against the server for `duration` seconds."""
+    payloads = itertools.cycle([{'query': query, 'method': method} for query in queries])
+    latencies = []
+    errors = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        before = (await client.get('/health')).json()['batching']
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*[
+            client_loop(client, endpoint, payloads, deadline, latencies, errors)
+            for _ in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+        after = (await client.get('/health')).json()['batching']
+
+    batches = after['batches'] - before['batches']
+    latencies_ms = np.array(latencies or [0.0]) * 1000
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'throughput_rps': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'mean_batch_size': (after['items'] - before['items']) / batches if batches else None,
+    }
+
+def create_rich_table(results, method):
+    table = Table(title=f"Load Test ({method} selection)", expand=True)
+
+    table.add_column("Clients", justify="right", style="cyan")
+    table.add_column("Requests", justify="right", style="cyan")
+    table.add_column("Errors", justify="right", style="red")
+    table.add_column("Throughput (req/s)", justify="right", style="green")
+    table.add_column("p50 (ms)", justify="right", style="yellow")
+    table.add_column("p95 (ms)", justify="right", style="yellow")
+    table.add_column("p99 (ms)", justify="right", style="yellow")
+    table.add_column("Mean Batch", justify="right", style="magenta")
+
+    for row in results:
+        table.add_row(
+            str(row['concurrency']),
+            str(row['requests']),
+            str(row['errors']),
+            f"{row['throughput_rps']:.1f}",
+            f"{row['p50_ms']:.1f}",
+            f"{row['p95_ms']:.1f}",
+            f"{row['p99_ms']:.1f}",
+            '-' if row['mean_batch_size'] is None else f"{row['mean_batch_size']:.1f}",
+        )
+
+    return table
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure selection server throughput under many concurrent clients.')
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of selection/server.py')
+    parser.add_argument('-c', '--concurrency', type=int, nargs='+', default=[1, 8, 32, 64], help='Concurrent clients per level')
+    parser.add_argument('-d', '--duration', type=float, default=10, help='Seconds per level')
+    parser.add_argument('-m', '--method', default='embedding', help='Selection method sent with every request')
+    parser.add_argument('--endpoint', default='/select', choices=['/select', '/run'], help='Endpoint to load')
+    parser.add_argument('-o', '--output', help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    with open(test_queries_path) as f:
+        queries = [test_case['user_query'] for test_case in json.load(f)]
+
+    console = Console()
+    results = []
+    for concurrency in args.concurrency:
+        console.print(f"Running {concurrency} clients for {args.duration:.0f} s...")
+        results.append(asyncio.run(run_level(args.url, args.endpoint, args.method, concurrency, args.duration, queries)))
+        if results[-1]['first_error']:
+            console.print(f"[red]First error: {results[-1]['first_error']}[/red]")
+
+    console.print(create_rich_table(results, args.method))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
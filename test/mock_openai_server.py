@@ -0,0 +1,197 @@
+import sys
+import os
+import json
+import time
+import uuid
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def keyword_responder(request):
+    """Answers like the selection prompts expect, using the keyword selector.
+
+    Requests that offer functions get a `run_model` function call for the
+    matched model; plain requests get the model path as text. Queries that
+    match no keyword get a generic reply.
+    """
+    from selection.keyword_based_selection import keyword_model_selection
+
+    user_message = next((m['content'] for m in reversed(request['messages']) if m['role'] == 'user'), '')
+    model_path = keyword_model_selection(user_message)
+    if model_path is None:
+        return {'content': "I could not find a matching model. Could you tell me more about your question?"}
+    if request.get('functions'):
+        return {'function_call': {'name': 'run_model', 'arguments': json.dumps({'model_path': model_path})}}
+    return {'content': model_path}
+
+
+class MockOpenAIServer:
+    """Local stand-in for the OpenAI chat completions endpoint.
+
+    Serves POST /v1/chat/completions in both the plain and the streaming
+    (server-sent events) format, with configurable latency, so clients can be
+    tested and benchmarked without a network or an API key.
+
+    Args:
+        responder (callable): Maps the request body to {'content': str} or
+            {'function_call': {'name': str, 'arguments': str}}, or to
+            {'status': int, 'retry_after': float} to fail the request with that
+            HTTP status. Defaults to `keyword_responder`.
+        latency (float): Seconds before the first byte of every response.
+        token_delay (float): Seconds between streamed chunks.
+        chunk_size (int): Characters per streamed chunk.
+        port (int): Port to listen on; 0 picks a free one.
+    """
+
+    def __init__(self, responder=None, latency=0.0, token_delay=0.0, chunk_size=4, host='127.0.0.1', port=0):
+        self.responder = responder or keyword_responder
+        self.latency = latency
+        self.token_delay = token_delay
+        self.chunk_size = chunk_size
+        self.requests = []
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are written separately; without this, delayed ACKs add ~40 ms
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                mock.requests.append(body)
+                reply = mock.responder(body)
+                time.sleep(mock.latency)
+                if 'status' in reply:
+                    self._error(reply)
+                elif body.get('stream'):
+                    self._stream(body, reply)
+                else:
+                    self._respond(body, reply)
+
+            def _error(self, reply):
+                payload = json.dumps({'error': {'message': f"Mock error {reply['status']}", 'type': 'mock_error'}}).encode('utf-8')
+                self.send_response(reply['status'])
+                if 'retry_after' in reply:
+                    self.send_header('Retry-After', str(reply['retry_after']))
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _respond(self, body, reply):
+                message = {'role': 'assistant', 'content': reply.get('content')}
+                if 'function_call' in reply:
+                    message['function_call'] = reply['function_call']
+                content = reply.get('content') or ''
+                payload = json.dumps({
+                    'id': f"chatcmpl-{uuid.uuid4().hex}",
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': body.get('model', 'mock'),
+                    'choices': [{
+                        'index': 0,
+                        'message': message,
+                        'finish_reason': 'function_call' if 'function_call' in reply else 'stop',
+                    }],
+                    'usage': {
+                        'prompt_tokens': sum(len(m.get('content') or '') for m in body['messages']) // 4,
+                        'completion_tokens': len(content) // 4,
+                        'total_tokens': 0,
+                    },
+                }).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, body, reply):
+                completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+
+                def send(delta, finish_reason=None):
+                    event = json.dumps({
+                        'id': completion_id,
+                        'object': 'chat.completion.chunk',
+                        'created': int(time.time()),
+                        'model': body.get('model', 'mock'),
+                        'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+                    })
+                    self._write_chunk(f"data: {event}\n\n")
+
+                send({'role': 'assistant', 'content': '' if 'function_call' not in reply else None})
+                if 'function_call' in reply:
+                    send({'function_call': {'name': reply['function_call']['name'], 'arguments': ''}})
+                    text, key = reply['function_call']['arguments'], 'arguments'
+                else:
+                    text, key = reply.get('content') or '', 'content'
+                for start in range(0, len(text), mock.chunk_size):
+                    piece = text[start:start + mock.chunk_size]
+                    send({'function_call': {'arguments': piece}} if key == 'arguments' else {'content': piece})
+                    time.sleep(mock.token_delay)
+                for _ in range(reply.get('trailing_chunks', 0)):
+                    # Empty deltas, as sent while a real model finishes its turn
+                    send({})
+                    time.sleep(mock.token_delay)
+                send({}, finish_reason='function_call' if key == 'arguments' else 'stop')
+                self._write_chunk("data: [DONE]\n\n")
+                self._write_chunk('')
+
+            def _write_chunk(self, text):
+                data = text.encode('utf-8')
+                self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve a local mock of the OpenAI chat completions API.')
+    parser.add_argument('--port', type=int, default=8001, help='Port to listen on')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds before every response')
+    parser.add_argument('--token-delay', type=float, default=0.0, help='Seconds between streamed chunks')
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(latency=args.latency, token_delay=args.token_delay, port=args.port).start()
+    print(f"Mock OpenAI API listening on {server.base_url} (set OPENAI_BASE_URL to use it)")
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
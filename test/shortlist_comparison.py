@@ -0,0 +1,134 @@
+import sys
+import os
+import json
+import time
+import argparse
+import numpy as np
+from rich.table import Table
+from rich.console import Console
+from rich.progress import Progress, BarColumn, TextColumn, TimeElapsedColumn
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selection.shortlist import shortlist_models, shortlist_methods
+from selection.llm_based_selection import selection_messages, llm_model_name
+from selection.registry import get_registry
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+test_queries_path = os.path.join(base_dir, 'test_queries.json')
+
+with open(test_queries_path) as f:
+    test_queries = json.load(f)
+
+models_metadata = get_registry().metadata
+
+def evaluate(shortlist_k, method, offline):
+    """Runs every test query with either the full registry or a top-k shortlist in the prompt.
+
+    Returns:
+        dict: Shortlist recall, prompt size and, unless offline, accuracy and LLM latency.
+    """
+    from selection.llm_client import get_openai_client, chat_completion
+
+    in_shortlist = 0
+    correct = 0
+    prompt_chars = []
+    prompt_tokens = []
+    retrieval_latencies = []
+    llm_latencies = []
+
+    with Progress(
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        "[progress.percentage]{task.percentage:>3.0f}%",
+        "•",
+        TimeElapsedColumn(),
+    ) as progress:
+        label = 'full registry' if shortlist_k is None else f"{method} top-{shortlist_k}"
+        task = progress.add_task(label, total=len(test_queries))
+        for test_case in test_queries:
+            query = test_case['user_query']
+
+            start = time.perf_counter()
+            prompt_metadata = shortlist_models(query, models_metadata, shortlist_k, method=method)
+            retrieval_latencies.append(time.perf_counter() - start)
+
+            if any(model['model_path'] == test_case['expected_model'] for model in prompt_metadata['models']):
+                in_shortlist += 1
+            messages = selection_messages(query, prompt_metadata)
+            prompt_chars.append(sum(len(message['content']) for message in messages))
+
+            if not offline:
+                start = time.perf_counter()
+                response = chat_completion(get_openai_client(), model=llm_model_name, messages=messages)
+                llm_latencies.append(time.perf_counter() - start)
+                prompt_tokens.append(response.usage.prompt_tokens)
+                if response.choices[0].message.content.strip() == test_case['expected_model']:
+                    correct += 1
+
+            progress.advance(task)
+
+    total = len(test_queries)
+    result = {
+        'config': label,
+        'shortlist_recall': in_shortlist / total * 100,
+        'mean_prompt_chars': float(np.mean(prompt_chars)),
+        'mean_retrieval_ms': float(np.mean(retrieval_latencies) * 1000),
+    }
+    if not offline:
+        result.update({
+            'accuracy': correct / total * 100,
+            'mean_prompt_tokens': float(np.mean(prompt_tokens)),
+            'p50_llm_ms': float(np.percentile(llm_latencies, 50) * 1000),
+            'p95_llm_ms': float(np.percentile(llm_latencies, 95) * 1000),
+        })
+    return result
+
+def create_rich_table(results, offline):
+    table = Table(title="Full Registry vs Shortlisted Prompts", expand=True)
+
+    table.add_column("Prompt", style="cyan")
+    table.add_column("Shortlist Recall", justify="right", style="green")
+    table.add_column("Prompt Chars", justify="right", style="yellow")
+    table.add_column("Retrieval (ms)", justify="right", style="magenta")
+    if not offline:
+        table.add_column("Accuracy", justify="right", style="green")
+        table.add_column("Prompt Tokens", justify="right", style="yellow")
+        table.add_column("LLM p50 (ms)", justify="right", style="blue")
+        table.add_column("LLM p95 (ms)", justify="right", style="red")
+
+    for row in results:
+        cells = [
+            row['config'],
+            f"{row['shortlist_recall']:.2f}%",
+            f"{row['mean_prompt_chars']:.0f}",
+            f"{row['mean_retrieval_ms']:.2f}",
+        ]
+        if not offline:
+            cells += [
+                f"{row['accuracy']:.2f}%",
+                f"{row['mean_prompt_tokens']:.0f}",
+                f"{row['p50_llm_ms']:.0f}",
+                f"{row['p95_llm_ms']:.0f}",
+            ]
+        table.add_row(*cells)
+
+    return table
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare full-registry prompts with top-k shortlisted prompts on test_queries.json.')
+    parser.add_argument('-k', type=int, nargs='+', default=[1, 3, 5], help='Shortlist sizes to compare')
+    parser.add_argument('-m', '--method', choices=shortlist_methods, default='embedding', help='Retrieval used for the shortlist')
+    parser.add_argument('--offline', action='store_true', help='Only measure shortlist recall and prompt size, without calling the LLM')
+    parser.add_argument('-o', '--output', help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    results = [evaluate(None, args.method, args.offline)]
+    for k in args.k:
+        results.append(evaluate(k, args.method, args.offline))
+
+    Console().print(create_rich_table(results, args.offline))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,107 @@
+import sys
+import os
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selection.ann_index import IVFIndex
+
+def make_clustered_vectors(n, dim, clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    vectors = centers[rng.integers(0, clusters, n)] + 0.1 * rng.standard_normal((n, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+def exact_top_k(vectors, query, k):
+    return np.argsort(-(vectors @ query), kind='stable')[:k]
+
+def test_recall_against_brute_force():
+    vectors = make_clustered_vectors(5000, 64, clusters=50)
+    queries = make_clustered_vectors(100, 64, clusters=50, seed=1)
+    index = IVFIndex(64, nprobe=8)
+    index.add(vectors, np.arange(len(vectors)))
+
+    recalls = []
+    for query in queries:
+        _, ids = index.search(query, k=10)
+        recalls.append(len(set(ids) & set(exact_top_k(vectors, query, 10))) / 10)
+
+    assert np.mean(recalls) >= 0.9
+
+def test_scores_are_sorted_inner_products():
+    vectors = make_clustered_vectors(1000, 32, clusters=10)
+    index = IVFIndex(32)
+    index.add(vectors, np.arange(len(vectors)))
+
+    scores, ids = index.search(vectors[0], k=5)
+
+    assert ids[0] == 0
+    assert np.all(np.diff(scores) <= 0)
+    np.testing.assert_allclose(scores, vectors[ids] @ vectors[0], rtol=1e-5)
+
+def test_incremental_insert_is_searchable():
+    vectors = make_clustered_vectors(1000, 32, clusters=10)
+    index = IVFIndex(32)
+    index.add(vectors[:900], np.arange(900))
+    index.add(vectors[900:], np.arange(900, 1000))
+
+    assert len(index) == 1000
+    for i in (900, 950, 999):
+        _, ids = index.search(vectors[i], k=1)
+        assert ids[0] == i
+
+def test_save_and_load_round_trip(tmp_path):
+    vectors = make_clustered_vectors(1000, 32, clusters=10)
+    index = IVFIndex(32, nprobe=4, tag='registry-v1')
+    index.add(vectors, np.arange(len(vectors)))
+    path = str(tmp_path / 'index.npz')
+    index.save(path)
+
+    loaded = IVFIndex.load(path)
+
+    assert len(loaded) == len(index)
+    assert loaded.tag == 'registry-v1'
+    assert loaded.nprobe == 4
+    for query in vectors[:20]:
+        np.testing.assert_array_equal(loaded.search(query, k=5)[1], index.search(query, k=5)[1])
+
+def test_remapped_index_drops_and_renumbers_ids():
+    vectors = make_clustered_vectors(1000, 32, clusters=10)
+    index = IVFIndex(32)
+    index.add(vectors, np.arange(len(vectors)))
+    # Drop every even row and shift the odd ones down, as when entries are removed
+    mapping = np.where(np.arange(1000) % 2 == 1, np.arange(1000) // 2, -1)
+
+    remapped = index.remapped(mapping)
+
+    assert len(remapped) == 500
+    assert len(index) == 1000
+    for old_id in (1, 501, 999):
+        _, ids = remapped.search(vectors[old_id], k=1)
+        assert ids[0] == old_id // 2
+    _, ids = index.search(vectors[2], k=1)
+    assert ids[0] == 2
+
+def test_concurrent_adds_and_searches_lose_nothing():
+    import threading
+
+    vectors = make_clustered_vectors(2000, 32, clusters=10)
+    index = IVFIndex(32)
+    index.add(vectors[:400], np.arange(400))
+
+    def add_rows(start):
+        for i in range(start, 2000, 4):
+            index.add(vectors[i], [i])
+
+    threads = [threading.Thread(target=add_rows, args=(start,)) for start in range(400, 404)]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        index.search(vectors[0], k=5)
+    for thread in threads:
+        thread.join()
+
+    assert len(index) == 2000
+    _, ids = index.search(vectors[0], k=2000, nprobe=index.nlist)
+    assert sorted(ids.tolist()) == list(range(2000))
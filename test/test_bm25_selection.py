@@ -0,0 +1,104 @@
+import sys
+import os
+import math
+import random
+from collections import Counter
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selection.bm25_selection import BM25Index, model_terms, word_pattern
+
+weather = {'model_path': 'weather_model.py', 'description': 'Weather forecast', 'tags': ['weather'], 'keywords': ['rain', 'weather']}
+stock = {'model_path': 'stock_model.py', 'description': 'Stock forecast', 'tags': ['finance'], 'keywords': ['stock', 'market']}
+sales = {'model_path': 'sales_model.py', 'description': 'Sales forecast', 'tags': ['retail'], 'keywords': ['sales', 'market']}
+
+words = ['predict', 'weather', 'rain', 'stock', 'price', 'for', 'model', 'risk', 'trend', 'city']
+
+def random_models(n, seed=0):
+    rng = random.Random(seed)
+    return [{'model_path': f"model_{i}.py", 'description': ' '.join(rng.choices(words, k=rng.randint(1, 6))),
+             'tags': rng.choices(words, k=2), 'keywords': rng.choices(words, k=rng.randint(0, 2))}
+            for i in range(n)]
+
+def brute_force_top_k(models, query, k, k1=1.2, b=0.75):
+    """Scores every model term by term, ties going to registry order."""
+    docs = [Counter(model_terms(model)) for model in models]
+    average_length = sum(sum(doc.values()) for doc in docs) / len(docs)
+    scored = []
+    for position, (model, doc) in enumerate(zip(models, docs)):
+        shared = set(word_pattern.findall(query.lower())) & doc.keys()
+        if not shared:
+            continue
+        score = 0.0
+        for term in shared:
+            df = sum(term in other for other in docs)
+            idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+            norm = k1 * (1 - b + b * sum(doc.values()) / average_length)
+            score += idf * doc[term] * (k1 + 1) / (doc[term] + norm)
+        scored.append((-score, position, model['model_path']))
+    return [model_path for _, _, model_path in sorted(scored)[:k]]
+
+def ranked_paths(index, query, k):
+    return [model_path for model_path, _ in index.top_k(query, k)]
+
+def test_ranking_matches_brute_force_bm25():
+    models = random_models(300)
+    index = BM25Index(models)
+    rng = random.Random(1)
+    for _ in range(200):
+        query = ' '.join(rng.choices(words, k=rng.randint(1, 4)))
+        k = rng.randint(1, 6)
+        assert ranked_paths(index, query, k) == brute_force_top_k(models, query, k), query
+
+def test_only_matching_models_are_returned():
+    index = BM25Index([weather, stock, sales])
+    assert index.top_k('will it rain today', k=3)[0][0] == 'weather_model.py'
+    assert len(index.top_k('will it rain today', k=3)) == 1
+    assert index.select('hello there') is None
+    # Ties follow registry order
+    assert ranked_paths(index, 'market', 2) == ['stock_model.py', 'sales_model.py']
+
+def test_repeated_models_tie_in_registry_order():
+    # Every query word is shared by a third of the models, so nearly all of them tie
+    models = [dict(model, model_path=f"copy{copy}_{model['model_path']}")
+              for copy in range(100) for model in (weather, stock, sales)]
+    index = BM25Index(models)
+    for query in ('stock market forecast', 'weather forecast for rain', 'market', 'retail sales market'):
+        assert ranked_paths(index, query, 5) == brute_force_top_k(models, query, 5), query
+
+def test_update_matches_a_fresh_build():
+    index = BM25Index([weather, stock])
+    edited_weather = dict(weather, keywords=['storm'])
+
+    touched = index.update([sales, edited_weather])
+
+    fresh = BM25Index([sales, edited_weather])
+    assert touched == 3
+    assert index.select('will it rain') is None
+    assert index.select('storm ahead') == 'weather_model.py'
+    for query in ('storm and stock market', 'forecast', 'retail sales forecast', 'weather'):
+        assert index.top_k(query, 3) == fresh.top_k(query, 3)
+
+def test_many_updates_match_a_fresh_build():
+    models = random_models(200)
+    index = BM25Index(models)
+    rng = random.Random(2)
+    for round in range(10):
+        # Drop some entries, edit some and add new ones, enough to force a rebuild now and then
+        models = [model for model in models if rng.random() > 0.3]
+        models = [dict(model, description='risk trend') if rng.random() < 0.1 else model for model in models]
+        models += [dict(model, model_path=f"new_{round}_{i}.py") for i, model in enumerate(random_models(40, seed=round + 10))]
+        index.update(models)
+        fresh = BM25Index(models)
+        for query in ('predict weather', 'risk', 'stock price for city', 'trend model rain'):
+            assert ranked_paths(index, query, 5) == ranked_paths(fresh, query, 5)
+
+def test_select_on_100k_models_finds_the_rare_term():
+    # Latency at this size is measured by `benchmark_selection.py --selectors bm25`, on the synthetic-100000
+    # registry and on replicated-100000, where every query word is shared by thousands of models
+    models = [{'model_path': f"synthetic_{i}.py", 'description': f"Model for topic{i} {words[i % 3]}",
+               'tags': [f"topic{i}"], 'keywords': [words[i % 3]]} for i in range(100_000)]
+    index = BM25Index(models)
+
+    for i in range(0, 100_000, 997):
+        assert index.select(f"What is the {words[i % 3]} for topic{i} next month?") == f"synthetic_{i}.py"
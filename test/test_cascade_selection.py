@@ -0,0 +1,92 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from selection import cascade_selection
+from selection.cascade_selection import cascade_model_selection, estimate_llm_call, margin_confidence
+
+answers = {
+    'keyword': {'rain tomorrow': ('weather_model.py', 1.0), 'stock or rain': ('stock_model.py', 0.2)},
+    'bm25': {'stock or rain': ('stock_model.py', 0.3)},
+    'embedding': {'stock or rain': ('weather_model.py', 0.01), 'hello': ('sales_model.py', 0.02),
+                  'sell more': ('sales_model.py', 0.03)},
+    'llm': {'stock or rain': ('weather_model.py', 1.0), 'hello': ('', 0.0),
+            'sell more': ('Try a sales forecasting model.', 0.0)},
+}
+
+@pytest.fixture
+def fake_tiers(monkeypatch):
+    calls = []
+    def tier(name):
+        def select(user_message):
+            calls.append(name)
+            return answers[name].get(user_message, (None, 0.0))
+        return select
+    monkeypatch.setattr(cascade_selection, 'tier_selectors', {name: tier(name) for name in answers})
+    return calls
+
+thresholds = {'keyword': 0.5, 'bm25': 0.5, 'embedding': 0.05}
+
+def test_margin_confidence():
+    assert margin_confidence([]) == (None, 0.0)
+    assert margin_confidence([('a.py', 2.0)]) == ('a.py', 1.0)
+    assert margin_confidence([('a.py', 2.0), ('b.py', 1.5)]) == ('a.py', 0.25)
+    assert margin_confidence([('a.py', 1.0), ('b.py', 1.0)]) == ('a.py', 0.0)
+
+def test_confident_cheap_tier_answers_without_the_llm(fake_tiers):
+    model_path, details = cascade_model_selection('rain tomorrow', thresholds=thresholds, return_details=True)
+
+    assert model_path == 'weather_model.py'
+    assert fake_tiers == ['keyword']
+    assert details['tier'] == 'keyword'
+    assert details['llm_calls'] == 0
+    assert (details['estimated_tokens'], details['estimated_cost']) == (0, 0.0)
+    assert details['seconds'] >= details['attempts'][0]['seconds']
+
+def test_unsure_tiers_fall_through_to_the_llm(fake_tiers):
+    model_path, details = cascade_model_selection('stock or rain', thresholds=thresholds, return_details=True)
+
+    assert model_path == 'weather_model.py'
+    assert fake_tiers == ['keyword', 'bm25', 'embedding', 'llm']
+    assert details['tier'] == 'llm'
+    assert details['llm_calls'] == 1
+    assert (details['estimated_tokens'], details['estimated_cost']) == estimate_llm_call('stock or rain')
+    assert details['estimated_tokens'] > 0 and details['estimated_cost'] > 0
+    assert [attempt['model_path'] for attempt in details['attempts']] == \
+        ['stock_model.py', 'stock_model.py', 'weather_model.py', 'weather_model.py']
+
+def test_lower_threshold_stops_earlier(fake_tiers):
+    model_path, details = cascade_model_selection('stock or rain', thresholds=dict(thresholds, bm25=0.3),
+                                                  return_details=True)
+    assert model_path == 'stock_model.py'
+    assert details['tier'] == 'bm25'
+    assert fake_tiers == ['keyword', 'bm25']
+
+def test_most_confident_answer_is_kept_when_the_last_tier_gives_none(fake_tiers):
+    model_path, details = cascade_model_selection('hello', thresholds=thresholds, return_details=True)
+    assert model_path == 'sales_model.py'
+    assert details['tier'] == 'embedding'
+    assert details['llm_calls'] == 1
+
+def test_unsure_last_tier_is_not_taken_on_trust(fake_tiers):
+    model_path, details = cascade_model_selection('sell more', thresholds=thresholds, return_details=True)
+    assert model_path == 'sales_model.py'
+    assert details['tier'] == 'embedding'
+    assert fake_tiers == ['keyword', 'bm25', 'embedding', 'llm']
+
+def test_tuner_replays_the_cascade_rule(fake_tiers):
+    pytest.importorskip('rich')
+    from test.tune_cascade import simulate
+
+    tiers = ['embedding', 'llm']
+    # (correct, answered, confidence, seconds) per tier, as collected by the tuner
+    records = [{'embedding': (True, True, 0.03, 0.01), 'llm': (False, True, 0.0, 1.0)}]
+    result = simulate(records, tiers, {'embedding': 0.05}, llm_cost=0.01)
+    assert result['answered_by'] == {'embedding': 1, 'llm': 0}
+    assert result['accuracy'] == 100
+
+    model_path, details = cascade_model_selection('sell more', thresholds={'embedding': 0.05}, tiers=tuple(tiers),
+                                                  return_details=True)
+    assert details['tier'] == 'embedding'
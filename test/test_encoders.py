@@ -0,0 +1,64 @@
+import sys
+import os
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selection.encoders import mean_pool
+
+def test_mean_pool_ignores_padding():
+    rng = np.random.default_rng(0)
+    hidden = rng.standard_normal((2, 5, 8)).astype(np.float32)
+    mask = np.array([[1, 1, 1, 0, 0], [1, 1, 1, 1, 1]])
+
+    pooled = mean_pool(hidden, mask)
+
+    np.testing.assert_allclose(pooled[0], hidden[0, :3].mean(axis=0), rtol=1e-6)
+    np.testing.assert_allclose(pooled[1], hidden[1].mean(axis=0), rtol=1e-6)
+
+def test_mean_pool_of_an_empty_mask_is_zero():
+    hidden = np.ones((1, 3, 4), dtype=np.float32)
+
+    assert not mean_pool(hidden, np.zeros((1, 3), dtype=np.int64)).any()
+
+def test_each_encoder_gets_its_own_cache(monkeypatch):
+    from selection import embedding_based_selection as embedding
+
+    paths = {}
+    for backend in ('fp32', 'mmap', 'int8', 'torchscript'):
+        monkeypatch.setattr(embedding, 'encoder_backend', backend)
+        paths[backend] = embedding.cache_path('model_embeddings')
+
+    # mmap runs the fp32 weights, so it reads and writes the fp32 cache
+    assert paths['mmap'] == paths['fp32']
+    assert paths['fp32'].endswith(os.path.join('.cache', 'model_embeddings.npz'))
+    assert len({paths['fp32'], paths['int8'], paths['torchscript']}) == 3
+
+def local_encoder_name():
+    from selection.embedding_based_selection import encoder_name
+    transformers = pytest.importorskip('transformers')
+    pytest.importorskip('torch')
+    try:
+        transformers.BertTokenizer.from_pretrained(encoder_name, local_files_only=True)
+        transformers.BertConfig.from_pretrained(encoder_name, local_files_only=True)
+    except (OSError, ValueError):
+        pytest.skip(f"{encoder_name} is not available locally")
+    return encoder_name
+
+@pytest.mark.parametrize('backend,min_cosine', [('torchscript', 0.9999), ('mmap', 0.9999), ('int8', 0.98)])
+def test_backends_match_fp32(backend, min_cosine, tmp_path, monkeypatch):
+    from selection import encoders
+
+    name = local_encoder_name()
+    monkeypatch.setattr(encoders, 'export_dir', str(tmp_path))
+    texts = ['Will it rain in London tomorrow?', 'Predict my risk of diabetes', 'stock market']
+
+    reference = encoders.load_encoder(name, 'fp32').embed(texts)
+    embeddings = encoders.load_encoder(name, backend).embed(texts)
+
+    cosine = (reference * embeddings).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(embeddings, axis=1))
+    assert cosine.min() >= min_cosine
+    # Every backend must still rank the texts the same way against each other
+    assert np.array_equal(np.argsort(reference @ reference.T), np.argsort(embeddings @ embeddings.T))
@@ -0,0 +1,76 @@
+import sys
+import os
+import time
+import subprocess
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selection.fanout import run_models, merge_results
+from selection.result_cache import ResultCache
+
+class SleepingRuntime:
+    """Stands in for the model runtime: each model sleeps for its configured time."""
+
+    def __init__(self, delays, failing=()):
+        self.delays = delays
+        self.failing = failing
+
+    def run(self, model_path, timeout=None, deadline=None):
+        time.sleep(self.delays[model_path])
+        if model_path in self.failing:
+            return subprocess.CompletedProcess(['python', model_path], 1, '', 'Traceback: boom')
+        return subprocess.CompletedProcess(['python', model_path], 0, f"{model_path} says hi\n", '')
+
+def test_models_run_concurrently():
+    runtime = SleepingRuntime({'heart.py': 0.2, 'diabetes.py': 0.2, 'stroke.py': 0.2})
+
+    start = time.monotonic()
+    results = run_models(['heart.py', 'diabetes.py', 'stroke.py', 'heart.py'], deadline=5,
+                         runtime=runtime, cache=ResultCache(max_entries=0))
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 0.5
+    assert [result['model_path'] for result in results] == ['heart.py', 'diabetes.py', 'stroke.py']
+    assert all(result['status'] == 'ok' for result in results)
+    assert results[0]['output'] == 'heart.py says hi'
+
+def test_slow_models_time_out_without_losing_the_others():
+    runtime = SleepingRuntime({'heart.py': 0.05, 'diabetes.py': 2.0, 'broken.py': 0.05}, failing={'broken.py'})
+
+    start = time.monotonic()
+    results = run_models(['heart.py', 'diabetes.py', 'broken.py'], deadline=0.3,
+                         runtime=runtime, cache=ResultCache(max_entries=0))
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 1.0
+    assert [result['status'] for result in results] == ['ok', 'timeout', 'error']
+    assert results[1]['elapsed'] is None
+
+    merged = merge_results(results).splitlines()
+    assert merged[0] == 'heart.py: heart.py says hi'
+    assert merged[1].startswith('diabetes.py: no answer')
+    assert merged[2] == 'Error running the model at broken.py: Traceback: boom'
+
+def test_models_queued_behind_busy_workers_share_the_deadline(tmp_path):
+    from selection.model_runtime import ModelRuntime
+
+    scripts = []
+    for name in ('a', 'b', 'c'):
+        script = tmp_path / f"{name}.py"
+        script.write_text("import os, time\n"
+                          "def run():\n"
+                          "    time.sleep(0.6)\n"
+                          f"    open(os.path.join(os.path.dirname(__file__), '{name}.done'), 'w').close()\n"
+                          "    print('done')\n")
+        scripts.append(str(script))
+
+    runtime = ModelRuntime(num_workers=2, timeout=30)
+    try:
+        results = run_models(scripts, deadline=1.0, runtime=runtime, cache=ResultCache(max_entries=0))
+        # Long enough for a model given a fresh full deadline after the first two to finish
+        time.sleep(1.0)
+    finally:
+        runtime.close()
+
+    assert sorted(result['status'] for result in results) == ['ok', 'ok', 'timeout']
+    assert len(list(tmp_path.glob('*.done'))) == 2
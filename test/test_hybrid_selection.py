@@ -0,0 +1,54 @@
+import sys
+import os
+import json
+import time
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selection import hybrid_selection, tracing
+
+def fake_llm(answer=None, delay=0.0, error=None):
+    def select(user_message):
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return answer
+    return select
+
+@pytest.fixture
+def traces(tmp_path, monkeypatch):
+    monkeypatch.setattr(hybrid_selection, 'embedding_model_selection', lambda user_message: 'embedding_model.py')
+    trace_file = tmp_path / 'trace.jsonl'
+    tracing.enable(str(trace_file))
+
+    def selection_spans():
+        tracing.disable()
+        records = [json.loads(line) for line in trace_file.read_text().splitlines()]
+        return [record for record in records if record['name'] == 'selection' and record['selector'] == 'hybrid']
+
+    yield selection_spans
+    tracing.disable()
+
+def test_llm_answer_is_preferred(traces, monkeypatch):
+    monkeypatch.setattr(hybrid_selection, 'llm_model_selection', fake_llm('llm_model.py'))
+
+    assert hybrid_selection.hybrid_model_selection('query', return_source=True) == ('llm_model.py', 'llm')
+    assert traces()[0]['attributes'] == {'source': 'llm'}
+
+def test_slow_llm_falls_back_at_the_deadline(traces, monkeypatch):
+    monkeypatch.setattr(hybrid_selection, 'llm_model_selection', fake_llm('llm_model.py', delay=1.0))
+
+    start = time.perf_counter()
+    result = hybrid_selection.hybrid_model_selection('query', deadline=0.05, return_source=True)
+    elapsed = time.perf_counter() - start
+
+    assert result == ('embedding_model.py', 'embedding')
+    assert elapsed < 0.5
+    assert traces()[0]['attributes'] == {'llm_outcome': 'timeout', 'source': 'embedding'}
+
+def test_failed_llm_falls_back_and_records_the_error(traces, monkeypatch):
+    monkeypatch.setattr(hybrid_selection, 'llm_model_selection', fake_llm(error=ConnectionError('refused')))
+
+    assert hybrid_selection.hybrid_model_selection('query') == 'embedding_model.py'
+    assert traces()[0]['attributes'] == {'llm_outcome': 'error', 'llm_error': 'ConnectionError', 'source': 'embedding'}
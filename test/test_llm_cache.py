@@ -0,0 +1,89 @@
+import sys
+import os
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selection.llm_cache import LLMCache
+
+def bag_of_words_embed(texts):
+    vocabulary = ['rain', 'weather', 'tomorrow', 'stock', 'market', 'diabetes']
+    return np.array([[text.split().count(word) + 0.01 for word in vocabulary] for text in texts], dtype=np.float32)
+
+def test_exact_hit_ignores_case_whitespace_and_trailing_punctuation(tmp_path):
+    cache = LLMCache(path=str(tmp_path / 'cache.sqlite3'))
+    cache.put('Will it rain tomorrow?', 'gpt-4o', 'v1', 'weather_model.py')
+
+    assert cache.get('  will it   RAIN tomorrow ', 'gpt-4o', 'v1') == 'weather_model.py'
+    assert cache.stats()['hits'] == 1
+
+def test_llm_and_registry_are_part_of_the_key(tmp_path):
+    cache = LLMCache(path=str(tmp_path / 'cache.sqlite3'))
+    cache.put('Will it rain tomorrow?', 'gpt-4o', 'v1', 'weather_model.py')
+
+    assert cache.get('Will it rain tomorrow?', 'gpt-4o', 'v2') is None
+    assert cache.get('Will it rain tomorrow?', 'gpt-3.5-turbo', 'v1') is None
+    assert cache.stats()['misses'] == 2
+
+def test_entries_persist_across_instances(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    LLMCache(path=path).put('Will it rain tomorrow?', 'gpt-4o', 'v1', 'weather_model.py')
+
+    assert LLMCache(path=path).get('Will it rain tomorrow?', 'gpt-4o', 'v1') == 'weather_model.py'
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = LLMCache(path=str(tmp_path / 'cache.sqlite3'), max_entries=2)
+    cache.put('first', 'gpt-4o', 'v1', 'a.py')
+    time.sleep(0.01)
+    cache.put('second', 'gpt-4o', 'v1', 'b.py')
+    time.sleep(0.01)
+    cache.get('first', 'gpt-4o', 'v1')
+    time.sleep(0.01)
+    cache.put('third', 'gpt-4o', 'v1', 'c.py')
+
+    assert cache.get('first', 'gpt-4o', 'v1') == 'a.py'
+    assert cache.get('second', 'gpt-4o', 'v1') is None
+    assert cache.get('third', 'gpt-4o', 'v1') == 'c.py'
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = LLMCache(path=str(tmp_path / 'cache.sqlite3'), ttl=0.01)
+    cache.put('Will it rain tomorrow?', 'gpt-4o', 'v1', 'weather_model.py')
+    time.sleep(0.02)
+
+    assert cache.get('Will it rain tomorrow?', 'gpt-4o', 'v1') is None
+
+def test_semantic_tier_reuses_answers_for_similar_queries(tmp_path):
+    cache = LLMCache(path=str(tmp_path / 'cache.sqlite3'), semantic_threshold=0.95, embed=bag_of_words_embed)
+    cache.put('rain tomorrow', 'gpt-4o', 'v1', 'weather_model.py')
+
+    assert cache.get('rain tomorrow weather tomorrow rain', 'gpt-4o', 'v1') is None
+    assert cache.get('tomorrow rain', 'gpt-4o', 'v1') == 'weather_model.py'
+    assert cache.get('stock market', 'gpt-4o', 'v1') is None
+    assert cache.stats()['semantic_hits'] == 1
+
+def test_entry_count_is_tracked_without_recounting(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    cache = LLMCache(path=path, max_entries=3, ttl=None)
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+
+    for i in range(10):
+        cache.put(f"query {i}", 'gpt-4o', 'v1', f"{i}.py")
+        # Replacing an answer does not grow the cache
+        cache.put(f"query {i}", 'gpt-4o', 'v1', f"{i}.py")
+
+    cache._conn.set_trace_callback(None)
+    assert cache.stats()['entries'] == 3
+    assert cache.stats()['evictions'] == 7
+    # A key another process already removed is not counted again
+    cache._delete([cache._key('query 0', cache._scope('gpt-4o', 'v1'))])
+    assert cache.stats()['evictions'] == 7
+    # Only puts that went over the limit recounted
+    assert sum('COUNT(*)' in statement for statement in statements) == 7
+
+    # A second process sharing the file is noticed at its next eviction
+    other = LLMCache(path=path, max_entries=3, ttl=None)
+    other.put('from another process', 'gpt-4o', 'v1', 'other.py')
+    cache.put('one more', 'gpt-4o', 'v1', 'more.py')
+    assert cache.stats()['entries'] == 3
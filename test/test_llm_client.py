@@ -0,0 +1,68 @@
+import sys
+import os
+import time
+import itertools
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+import openai
+import pytest
+from selection.llm_client import ConnectionStats, build_http_client, chat_completion, get_openai_client
+from test.mock_openai_server import MockOpenAIServer
+
+messages = [{'role': 'user', 'content': 'Will it rain?'}]
+
+def make_client(server, stats, **kwargs):
+    return openai.OpenAI(base_url=server.base_url, api_key='test', max_retries=0,
+                         http_client=build_http_client(stats, **kwargs))
+
+def test_requests_reuse_one_connection():
+    stats = ConnectionStats()
+    with MockOpenAIServer(responder=lambda request: {'content': 'weather_model.py'}) as server:
+        client = make_client(server, stats)
+        for _ in range(5):
+            assert chat_completion(client, model='mock', messages=messages).choices[0].message.content == 'weather_model.py'
+
+    assert stats.snapshot() == {'requests': 5, 'connections': 1, 'tls_handshakes': 0, 'reused': 4}
+
+def test_shared_client_is_reused_per_endpoint():
+    first = get_openai_client(api_key='test', base_url='http://127.0.0.1:1/v1')
+    assert get_openai_client(api_key='test', base_url='http://127.0.0.1:1/v1') is first
+    assert get_openai_client(api_key='test', base_url='http://127.0.0.1:2/v1') is not first
+
+def test_rate_limits_and_server_errors_are_retried():
+    attempts = itertools.count()
+    def responder(request):
+        attempt = next(attempts)
+        if attempt == 0:
+            return {'status': 429, 'retry_after': 0.2}
+        if attempt == 1:
+            return {'status': 503}
+        return {'content': 'weather_model.py'}
+
+    with MockOpenAIServer(responder=responder) as server:
+        client = make_client(server, ConnectionStats())
+        start = time.monotonic()
+        response = chat_completion(client, model='mock', messages=messages)
+        elapsed = time.monotonic() - start
+
+    assert response.choices[0].message.content == 'weather_model.py'
+    assert len(server.requests) == 3
+    # The Retry-After of the 429 is honoured
+    assert elapsed >= 0.2
+
+def test_client_errors_are_not_retried():
+    with MockOpenAIServer(responder=lambda request: {'status': 400}) as server:
+        client = make_client(server, ConnectionStats())
+        with pytest.raises(openai.BadRequestError):
+            chat_completion(client, model='mock', messages=messages)
+    assert len(server.requests) == 1
+
+def test_slow_responses_time_out():
+    with MockOpenAIServer(responder=lambda request: {'content': 'late'}, latency=1.0) as server:
+        client = make_client(server, ConnectionStats())
+        start = time.monotonic()
+        with pytest.raises(openai.APITimeoutError):
+            chat_completion(client, max_retries=0, model='mock', messages=messages, timeout=httpx.Timeout(0.2))
+    assert time.monotonic() - start < 0.9
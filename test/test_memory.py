@@ -0,0 +1,29 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selection.memory import TokenBudgetMemory, count_tokens
+
+def test_history_stays_within_budget():
+    memory = TokenBudgetMemory(max_tokens=100, summary_max_tokens=30, background=False)
+    for turn in range(200):
+        memory.save_context({"input": f"question {turn} " * 5}, {"output": f"answer {turn} " * 10})
+        history = memory.load_memory_variables({})['history']
+        assert count_tokens(history) <= 100 + 30 + 10
+
+def test_evicted_turns_are_summarised():
+    summaries = []
+    def summarize(summary, turns_text):
+        summaries.append(turns_text)
+        return f"{summary} [{turns_text.count('Human:')} turns]".strip()
+
+    memory = TokenBudgetMemory(max_tokens=40, summary_max_tokens=50, summarize=summarize)
+    for turn in range(10):
+        memory.save_context({"input": f"question {turn}"}, {"output": f"answer {turn} " * 5})
+    memory.wait()
+
+    history = memory.load_memory_variables({})['history']
+    assert history.startswith("Summary of earlier conversation:")
+    assert "question 0" in ''.join(summaries)
+    assert "question 9" in history
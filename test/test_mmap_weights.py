@@ -0,0 +1,101 @@
+import sys
+import os
+import subprocess
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selection.mmap_weights import mmap_arrays
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def save_arrays(path, arrays):
+    from safetensors.numpy import save_file
+    save_file(arrays, str(path))
+
+def mapped_kb(pid, path):
+    """Sums Rss and Pss over the mappings of one file in /proc/<pid>/smaps."""
+    rss = pss = 0
+    in_file = False
+    with open(f"/proc/{pid}/smaps") as f:
+        for line in f:
+            fields = line.split()
+            if '-' in fields[0] and len(fields) >= 5:
+                in_file = fields[-1] == path
+            elif in_file and fields[0] == 'Rss:':
+                rss += int(fields[1])
+            elif in_file and fields[0] == 'Pss:':
+                pss += int(fields[1])
+    return rss, pss
+
+def test_arrays_round_trip(tmp_path):
+    rng = np.random.default_rng(0)
+    arrays = {
+        'weight': rng.standard_normal((64, 32)).astype(np.float32),
+        'half': rng.standard_normal(7).astype(np.float16),
+        'position_ids': np.arange(512, dtype=np.int64)[None],
+        'empty': np.zeros((0, 4), dtype=np.float32),
+    }
+    path = tmp_path / 'weights.safetensors'
+    save_arrays(path, arrays)
+
+    mapped = mmap_arrays(str(path))
+
+    assert mapped.keys() == arrays.keys()
+    for name, array in arrays.items():
+        assert mapped[name].dtype == array.dtype
+        np.testing.assert_array_equal(mapped[name], array)
+    assert isinstance(mapped['weight'], np.memmap)
+
+def test_module_weights_are_assigned_without_copying(tmp_path):
+    torch = pytest.importorskip('torch')
+    pytest.importorskip('safetensors')
+    from selection.mmap_weights import assign_weights, mmap_state_dict, save_module_weights
+
+    def build():
+        module = torch.nn.Sequential(torch.nn.Linear(8, 4), torch.nn.LayerNorm(4))
+        module.register_buffer('offset', torch.arange(4, dtype=torch.float32), persistent=False)
+        return module
+
+    torch.manual_seed(0)
+    original = build().eval()
+    path = str(tmp_path / 'module.safetensors')
+    save_module_weights(original, path)
+
+    with torch.device('meta'):
+        mapped = build()
+    tensors = mmap_state_dict(path)
+    assign_weights(mapped, tensors)
+
+    inputs = torch.randn(3, 8)
+    with torch.inference_mode():
+        torch.testing.assert_close(mapped(inputs) + mapped.offset, original(inputs) + original.offset)
+    assert mapped[0].weight.data_ptr() == tensors['0.weight'].data_ptr()
+
+    with torch.device('meta'):
+        with pytest.raises(ValueError):
+            assign_weights(build(), {name: tensor for name, tensor in tensors.items() if name != '0.bias'})
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/smaps'), reason='needs /proc/<pid>/smaps')
+def test_processes_share_one_physical_copy(tmp_path):
+    path = str(tmp_path / 'weights.safetensors')
+    save_arrays(path, {'weight': np.ones((2048, 2048), dtype=np.float32)})
+    script = ("import sys; from selection.mmap_weights import mmap_arrays; "
+              "weights = mmap_arrays(sys.argv[1]); print(float(weights['weight'].sum()), flush=True); "
+              "sys.stdin.read()")
+
+    processes = [subprocess.Popen([sys.executable, '-c', script, path], stdin=subprocess.PIPE,
+                                  stdout=subprocess.PIPE, text=True, cwd=base_dir) for _ in range(3)]
+    try:
+        assert [process.stdout.readline().strip() for process in processes] == [str(2048.0 * 2048)] * 3
+        usage = [mapped_kb(process.pid, path) for process in processes]
+    finally:
+        for process in processes:
+            process.stdin.close()
+            process.wait()
+
+    file_kb = os.path.getsize(path) / 1024
+    # Every process has the whole file resident, but the physical pages are counted once
+    assert all(rss >= 0.9 * file_kb for rss, _ in usage)
+    assert sum(pss for _, pss in usage) < 1.2 * file_kb
@@ -0,0 +1,144 @@
+import sys
+import os
+import time
+import textwrap
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from selection.model_runtime import ModelRuntime
+
+def write_script(path, source):
+    path.write_text(textwrap.dedent(source))
+    # Make the rewrite visible to mtime checks even on coarse-grained filesystems
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    return str(path)
+
+@pytest.fixture
+def runtime():
+    runtime = ModelRuntime(num_workers=1, timeout=30)
+    yield runtime
+    runtime.close()
+
+def test_predictor_stays_loaded_between_calls(runtime, tmp_path):
+    script = write_script(tmp_path / 'counter.py', """
+        calls = 0
+        def run():
+            global calls
+            calls += 1
+            print(calls)
+    """)
+    assert [runtime.run(script).stdout.strip() for _ in range(3)] == ['1', '2', '3']
+
+def test_edited_predictor_is_reloaded(runtime, tmp_path):
+    script = write_script(tmp_path / 'versioned.py', "def run():\n    print('v1')\n")
+    assert runtime.run(script).stdout.strip() == 'v1'
+
+    write_script(tmp_path / 'versioned.py', "def run():\n    print('v2')\n")
+    assert runtime.run(script).stdout.strip() == 'v2'
+
+def test_new_weights_reload_the_predictor(runtime, tmp_path):
+    (tmp_path / 'weights.json').write_text('1')
+    script = write_script(tmp_path / 'weighted.py', """
+        import os
+        with open(os.path.join(os.path.dirname(__file__), 'weights.json')) as f:
+            weights = f.read()
+        def run():
+            print(weights)
+    """)
+    assert runtime.run(script).stdout.strip() == '1'
+
+    write_script(tmp_path / 'weights.json', '22')
+    assert runtime.run(script).stdout.strip() == '22'
+
+def test_scripts_without_run_are_executed_each_call(runtime, tmp_path):
+    script = write_script(tmp_path / 'plain.py', """
+        import sys
+        print('plain')
+        print('warning', file=sys.stderr)
+        sys.exit(3)
+    """)
+    for _ in range(2):
+        result = runtime.run(script)
+        assert (result.returncode, result.stdout, result.stderr) == (3, 'plain\n', 'warning\n')
+
+def test_errors_and_missing_scripts_are_reported(runtime, tmp_path):
+    script = write_script(tmp_path / 'broken.py', "def run():\n    raise ValueError('bad input')\n")
+    result = runtime.run(script)
+    assert result.returncode == 1
+    assert 'ValueError: bad input' in result.stderr
+
+    assert runtime.run(str(tmp_path / 'missing.py')).returncode == 2
+
+def test_slow_call_times_out_and_its_worker_is_replaced(runtime, tmp_path):
+    slow = write_script(tmp_path / 'slow.py', "import time\ndef run():\n    time.sleep(30)\n")
+    fast = write_script(tmp_path / 'fast.py', "def run():\n    print('ok')\n")
+
+    result = runtime.run(slow, timeout=0.5)
+    assert result.returncode == 1
+    assert 'timed out' in result.stderr
+    assert runtime.run(fast).stdout.strip() == 'ok'
+
+def test_crashed_worker_is_replaced(runtime, tmp_path):
+    crash = write_script(tmp_path / 'crash.py', "import os\ndef run():\n    os._exit(1)\n")
+    fast = write_script(tmp_path / 'fast.py', "def run():\n    print('ok')\n")
+
+    result = runtime.run(crash)
+    assert result.returncode == 1
+    assert 'crashed' in result.stderr
+    assert runtime.run(fast).stdout.strip() == 'ok'
+
+def test_health_check_restarts_dead_workers(runtime):
+    assert runtime.health_check() == {'healthy': 1, 'restarted': 0, 'busy': 0}
+
+    runtime._workers[0].process.kill()
+    runtime._workers[0].process.join()
+    assert runtime.health_check() == {'healthy': 0, 'restarted': 1, 'busy': 0}
+    assert runtime.health_check() == {'healthy': 1, 'restarted': 0, 'busy': 0}
+
+def test_preload_loads_only_scripts_with_run(runtime, tmp_path):
+    loaded_at_import = write_script(tmp_path / 'preloaded.py', """
+        print('loading')
+        def run():
+            print('ready')
+    """)
+    plain = write_script(tmp_path / 'plain.py', "print('plain')\n")
+
+    assert runtime.preload([loaded_at_import, plain, str(tmp_path / 'missing.py')]) == [loaded_at_import]
+    # Import-time output went to the preload, so the first call prints only the answer
+    assert runtime.run(loaded_at_import).stdout == 'ready\n'
+
+def test_scripts_see_their_own_argv_and_directory(runtime, tmp_path):
+    (tmp_path / 'helper.py').write_text("answer = 'from helper'\n")
+    loaded = write_script(tmp_path / 'loaded.py', """
+        import sys
+        import helper
+        def run():
+            print(helper.answer, sys.argv)
+    """)
+    plain = write_script(tmp_path / 'plain.py', """
+        import sys
+        import helper
+        print(helper.answer, sys.argv)
+    """)
+
+    for script in (loaded, plain):
+        result = runtime.run(script)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == f"from helper {[script]}"
+
+def test_waiting_for_a_busy_worker_counts_against_the_timeout(runtime, tmp_path):
+    slow = write_script(tmp_path / 'slow.py', "import time\ndef run():\n    time.sleep(2)\n    print('slow')\n")
+    fast = write_script(tmp_path / 'fast.py', "def run():\n    print('ok')\n")
+    occupied = threading.Thread(target=runtime.run, args=(slow,))
+    occupied.start()
+    try:
+        time.sleep(0.2)
+        result = runtime.run(fast, timeout=0.2)
+        assert result.returncode == 1
+        assert result.stderr.startswith('Model timed out') and 'free worker' in result.stderr
+    finally:
+        occupied.join()
+    assert runtime.run(fast).stdout.strip() == 'ok'
@@ -9,9 +9,10 @@ from rich.progress import Progress, BarColumn, TextColumn, TimeElapsedColumn
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from selection.llm_based_selection import llm_model_selection
-from selection.embedding_based_selection import embedding_model_selection
+from selection.embedding_based_selection import embedding_model_selection_batch
 from selection.hybrid_selection import hybrid_model_selection
 from selection.keyword_based_selection import keyword_model_selection
+from selection.bm25_selection import bm25_model_selection
 from selection.random_selection import random_model_selection
 
 base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -32,12 +33,18 @@ def test_selection_methods():
     correct_embedding = 0
     correct_hybrid = 0
     correct_keyword = 0
+    correct_bm25 = 0
     correct_random = 0
     total = len(test_queries)
     results = []
     
-    llm_cache = {}
-    embedding_cache = {}
+    embedding_cache = {
+        test_case['user_query']: model_path
+        for test_case, (model_path, _) in zip(
+            test_queries,
+            embedding_model_selection_batch([test_case['user_query'] for test_case in test_queries])
+        )
+    }
     
     with Progress(
         TextColumn("[progress.description]{task.description}"),
@@ -52,18 +59,10 @@ def test_selection_methods():
             user_query = truncate_text(user_query_full, max_length=10)
             expected_model = truncate_text(test_case['expected_model'], max_length=10)
             
-            if user_query_full in llm_cache:
-                llm_model_full = llm_cache[user_query_full]
-            else:
-                llm_model_full = llm_model_selection(user_query_full)
-                llm_cache[user_query_full] = llm_model_full
+            llm_model_full = llm_model_selection(user_query_full)
             llm_model = truncate_text(llm_model_full, max_length=10)
             
-            if user_query_full in embedding_cache:
-                embedding_model_full = embedding_cache[user_query_full]
-            else:
-                embedding_model_full = embedding_model_selection(user_query_full)
-                embedding_cache[user_query_full] = embedding_model_full
+            embedding_model_full = embedding_cache[user_query_full]
             embedding_model = truncate_text(embedding_model_full, max_length=10)
             
             hybrid_model_full = hybrid_model_selection(user_query_full)
@@ -72,6 +71,9 @@ def test_selection_methods():
             keyword_model_full = keyword_model_selection(user_query_full)
             keyword_model = truncate_text(keyword_model_full if keyword_model_full else '', max_length=10)
             
+            bm25_model_full = bm25_model_selection(user_query_full)
+            bm25_model = truncate_text(bm25_model_full if bm25_model_full else '', max_length=10)
+            
             random_model_full = random_model_selection(user_query_full)
             random_model = truncate_text(random_model_full, max_length=10)
             
@@ -79,6 +81,7 @@ def test_selection_methods():
             embedding_correct = embedding_model == expected_model
             hybrid_correct = hybrid_model == expected_model
             keyword_correct = keyword_model == expected_model
+            bm25_correct = bm25_model == expected_model
             random_correct = random_model == expected_model
             
             if llm_correct:
@@ -89,6 +92,8 @@ def test_selection_methods():
                 correct_hybrid += 1
             if keyword_correct:
                 correct_keyword +=1
+            if bm25_correct:
+                correct_bm25 +=1
             if random_correct:
                 correct_random +=1
 
@@ -98,6 +103,7 @@ def test_selection_methods():
                 "✔" if embedding_correct else "✘",
                 "✔" if hybrid_correct else "✘",
                 "✔" if keyword_correct else "✘",
+                "✔" if bm25_correct else "✘",
                 "✔" if random_correct else "✘"
             ])
             
@@ -107,9 +113,10 @@ def test_selection_methods():
     embedding_accuracy = correct_embedding / total * 100
     hybrid_accuracy = correct_hybrid / total * 100
     keyword_accuracy = correct_keyword / total * 100
+    bm25_accuracy = correct_bm25 / total * 100
     random_accuracy = correct_random / total * 100
 
-    return llm_accuracy, embedding_accuracy, hybrid_accuracy, keyword_accuracy, random_accuracy, results
+    return llm_accuracy, embedding_accuracy, hybrid_accuracy, keyword_accuracy, bm25_accuracy, random_accuracy, results
 
 def create_rich_table(results):
     table = Table(title="Model Selection Results", expand=True)
@@ -119,6 +126,7 @@ def create_rich_table(results):
     table.add_column("Embedding Correct", justify="center", style="yellow", width=15)
     table.add_column("Hybrid Correct", justify="center", style="blue", width=10)
     table.add_column("Keyword Correct", justify="center", style="magenta", width=15)
+    table.add_column("BM25 Correct", justify="center", style="cyan", width=10)
     table.add_column("Random Correct", justify="center", style="red", width=15)
     
     for row in results:
@@ -129,7 +137,7 @@ def create_rich_table(results):
 if __name__ == "__main__":
     start_time = time.time()
     
-    llm_accuracy, embedding_accuracy, hybrid_accuracy, keyword_accuracy, random_accuracy, results = test_selection_methods()
+    llm_accuracy, embedding_accuracy, hybrid_accuracy, keyword_accuracy, bm25_accuracy, random_accuracy, results = test_selection_methods()
     
     table = create_rich_table(results)
     console.print(table)
@@ -138,6 +146,7 @@ if __name__ == "__main__":
     print(f"Embedding-Based Selection Accuracy: {embedding_accuracy:.2f}%")
     print(f"Hybrid Selection Accuracy: {hybrid_accuracy:.2f}%")
     print(f"Keyword-Based Selection Accuracy: {keyword_accuracy:.2f}%")
+    print(f"BM25 Selection Accuracy: {bm25_accuracy:.2f}%")
     print(f"Random Selection Accuracy: {random_accuracy:.2f}%\n")
     
     end_time = time.time()
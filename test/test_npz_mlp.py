@@ -0,0 +1,50 @@
+import sys
+import os
+import subprocess
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from models.npz_mlp import NpzMLP, export_mlp
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def random_patients(n, seed=0):
+    rng = np.random.default_rng(seed)
+    low = np.array([0, 40, 30, 0, 0, 15, 18])
+    high = np.array([17, 200, 120, 60, 800, 60, 85])
+    return rng.uniform(low, high, size=(n, 7))
+
+def test_numpy_runtime_matches_torch(tmp_path):
+    torch = pytest.importorskip('torch')
+    pytest.importorskip('sklearn')
+    from models.diabetes_prediction.torch_model import load_model, layer_activations
+
+    net, scaler = load_model()
+    path = str(tmp_path / 'diabetes.npz')
+    export_mlp(net.state_dict(), layer_activations, path, scaler=scaler)
+
+    features = random_patients(1000)
+    with torch.inference_mode():
+        expected = net(torch.tensor(scaler.transform(features), dtype=torch.float32)).numpy().reshape(-1)
+    actual = NpzMLP(path).predict(features).reshape(-1)
+
+    np.testing.assert_allclose(actual, expected, atol=1e-6)
+    assert np.array_equal(actual > 0.5, expected > 0.5)
+
+def test_export_rejects_mismatched_activations(tmp_path):
+    torch = pytest.importorskip('torch')
+    state_dict = {'fc1.weight': torch.zeros(2, 3), 'fc1.bias': torch.zeros(2)}
+    with pytest.raises(ValueError):
+        export_mlp(state_dict, ['tanh', 'sigmoid'], str(tmp_path / 'model.npz'))
+    with pytest.raises(ValueError):
+        export_mlp(state_dict, ['softmax'], str(tmp_path / 'model.npz'))
+
+def test_predictor_runs_without_torch():
+    script = ("import runpy, sys; "
+              "runpy.run_path('models/diabetes_prediction/predict.py', run_name='__main__'); "
+              "print(sorted(name for name in ('torch', 'sklearn', 'joblib') if name in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, cwd=base_dir)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines() == ['Positive', '[]']
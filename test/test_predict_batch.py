@@ -0,0 +1,95 @@
+import sys
+import os
+import io
+import json
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from models.diabetes_prediction.predict import feature_names, predict_batch, score_file
+
+def random_patients(n, seed=0):
+    rng = np.random.default_rng(seed)
+    low = np.array([0, 40, 30, 0, 0, 15, 18])
+    high = np.array([17, 200, 120, 60, 800, 60, 85])
+    return rng.uniform(low, high, size=(n, 7)).round(1)
+
+def score(text, input_format, chunk_size=10000):
+    output = io.StringIO()
+    count = score_file(io.StringIO(text), output, input_format, chunk_size=chunk_size)
+    return count, output.getvalue()
+
+def csv_probabilities(output):
+    lines = output.splitlines()
+    assert lines[0] == 'probability'
+    return np.array([float(line) for line in lines[1:]])
+
+def jsonl_probabilities(output):
+    return np.array([json.loads(line)['probability'] for line in output.splitlines()])
+
+def test_csv_without_header_matches_predict_batch():
+    features = random_patients(25)
+    text = ''.join(','.join(str(value) for value in row) + '\n' for row in features)
+
+    count, output = score(text, 'csv')
+
+    assert count == 25
+    np.testing.assert_allclose(csv_probabilities(output), predict_batch(features), atol=1e-6)
+
+def test_csv_header_selects_columns_by_name():
+    features = random_patients(10)
+    # Shuffled columns plus one the model ignores
+    order = [6, 2, 0, 5, 1, 4, 3]
+    header = ['PatientId'] + [feature_names[i] for i in order]
+    rows = [[str(i)] + [str(row[j]) for j in order] for i, row in enumerate(features)]
+    text = '\n'.join(','.join(row) for row in [header] + rows) + '\n'
+
+    count, output = score(text, 'csv')
+
+    assert count == 10
+    np.testing.assert_allclose(csv_probabilities(output), predict_batch(features), atol=1e-6)
+
+def test_csv_header_missing_columns_is_named():
+    header = [name for name in feature_names if name not in ('Glucose', 'BMI')]
+    text = ','.join(header) + '\n' + ','.join('1' for _ in header) + '\n'
+
+    with pytest.raises(ValueError, match='Glucose, BMI'):
+        score(text, 'csv')
+
+def test_jsonl_dicts_and_lists_match_predict_batch():
+    features = random_patients(12)
+    lines = []
+    for i, row in enumerate(features):
+        if i % 2:
+            lines.append(json.dumps(row.tolist()))
+        else:
+            lines.append(json.dumps({'id': i, **dict(zip(feature_names, row.tolist()))}))
+    text = '\n'.join(lines) + '\n\n'
+
+    count, output = score(text, 'jsonl')
+
+    assert count == 12
+    np.testing.assert_allclose(jsonl_probabilities(output), predict_batch(features), atol=1e-6)
+
+def test_jsonl_missing_fields_are_named():
+    record = dict(zip(feature_names, random_patients(1)[0].tolist()))
+    del record['Insulin']
+
+    with pytest.raises(ValueError, match='Insulin'):
+        score(json.dumps(record) + '\n', 'jsonl')
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 10, 11, 1000])
+def test_output_does_not_depend_on_chunk_size(chunk_size):
+    features = random_patients(10, seed=1)
+    text = ''.join(','.join(str(value) for value in row) + '\n' for row in features)
+
+    count, output = score(text, 'csv', chunk_size=chunk_size)
+
+    assert count == 10
+    np.testing.assert_allclose(csv_probabilities(output), predict_batch(features), atol=1e-6)
+
+def test_predict_batch_rejects_wrong_shapes():
+    with pytest.raises(ValueError):
+        predict_batch(np.zeros((3, 6)))
+    assert predict_batch(np.zeros((0, 7))).shape == (0,)
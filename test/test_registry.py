@@ -0,0 +1,123 @@
+import sys
+import os
+import json
+import time
+import subprocess
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selection.registry import ModelRegistry
+from selection.keyword_based_selection import KeywordMatcher
+
+weather = {'model_path': 'weather_model.py', 'description': 'Weather', 'tags': ['weather'], 'keywords': ['rain', 'weather']}
+stock = {'model_path': 'stock_model.py', 'description': 'Stocks', 'tags': ['finance'], 'keywords': ['stock', 'market']}
+sales = {'model_path': 'sales_model.py', 'description': 'Sales', 'tags': ['retail'], 'keywords': ['sales', 'market']}
+
+def write_registry(path, models):
+    with open(path, 'w') as f:
+        json.dump({'models': models}, f)
+    # Make the rewrite visible to mtime checks even on coarse-grained filesystems
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+def test_reload_reports_added_changed_and_removed_entries(tmp_path):
+    path = tmp_path / 'models.json'
+    write_registry(path, [weather, stock])
+    registry = ModelRegistry(str(path), poll_interval=0)
+    changes = []
+    registry.subscribe(changes.append)
+
+    edited_weather = dict(weather, keywords=['rain', 'storm'])
+    write_registry(path, [edited_weather, sales])
+    change = registry.reload()
+
+    assert change.added == [sales]
+    assert change.changed == [edited_weather]
+    assert change.removed == [stock]
+    assert changes == [change]
+    assert registry.models == [edited_weather, sales]
+    assert registry.version == 2
+
+def test_unchanged_file_does_not_reload(tmp_path):
+    path = tmp_path / 'models.json'
+    write_registry(path, [weather])
+    registry = ModelRegistry(str(path), poll_interval=0)
+    old_hash = registry.hash
+
+    write_registry(path, [weather])
+
+    assert registry.reload() is None
+    assert registry.hash == old_hash
+    assert registry.version == 1
+
+def test_half_written_file_keeps_previous_version(tmp_path):
+    path = tmp_path / 'models.json'
+    write_registry(path, [weather])
+    registry = ModelRegistry(str(path), poll_interval=0)
+
+    path.write_text('{"models": [')
+
+    assert registry.check() is None
+    assert registry.models == [weather]
+    write_registry(path, [weather, stock])
+    assert registry.check().added == [stock]
+
+def test_watcher_picks_up_changes(tmp_path):
+    path = tmp_path / 'models.json'
+    write_registry(path, [weather])
+    registry = ModelRegistry(str(path), poll_interval=0.01)
+    registry.watch()
+    try:
+        write_registry(path, [weather, stock])
+        deadline = time.time() + 5
+        while registry.version < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        assert [model['model_path'] for model in registry.models] == ['weather_model.py', 'stock_model.py']
+    finally:
+        registry.close()
+
+def test_keyword_matcher_update_matches_a_fresh_build():
+    matcher = KeywordMatcher([weather, stock])
+    edited_weather = dict(weather, keywords=['storm'])
+
+    touched = matcher.update([sales, edited_weather])
+
+    fresh = KeywordMatcher([sales, edited_weather])
+    assert touched == 3
+    assert matcher.trie == fresh.trie
+    assert matcher.keyword_models == fresh.keyword_models
+    assert matcher.select('will it rain') is None
+    assert matcher.select('storm ahead') == 'weather_model.py'
+    # Ties follow the new registry order, where sales comes first
+    assert matcher.scores('storm and stock market') == {'sales_model.py': 1.0, 'weather_model.py': 1.0}
+    assert matcher.select('storm and stock market') == 'sales_model.py'
+
+def test_importing_selectors_leaves_the_registry_unloaded():
+    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    script = ("import threading, selection.registry, selection.keyword_based_selection, selection.bm25_selection, "
+              "selection.embedding_based_selection, selection.llm_based_selection, selection.cascade_selection, "
+              "selection.random_selection; "
+              "print(selection.registry._registry is None, "
+              "any(thread.name == 'model-registry-watch' for thread in threading.enumerate()))")
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, cwd=base_dir)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ['True', 'False']
+
+def test_embeddings_are_rebuilt_outside_the_lock(monkeypatch):
+    import numpy as np
+    from selection import embedding_based_selection as embedding
+
+    def build_model_embeddings(models, known=None):
+        # Readers and the initial build must not wait on a re-embed
+        assert not embedding._embeddings_lock.locked()
+        return np.stack([known.get(embedding.entry_hash(model), np.ones(4, dtype=np.float32)) for model in models])
+
+    monkeypatch.setattr(embedding, 'build_model_embeddings', build_model_embeddings)
+    monkeypatch.setattr(embedding, '_embedding_state',
+                        ([weather], np.zeros((1, 4), dtype=np.float32), [embedding.entry_hash(weather)], None))
+
+    assert embedding.update_model_embeddings([stock, weather]) == 1
+    models, embeddings, hashes, _ = embedding._embedding_state
+    assert models == [stock, weather]
+    np.testing.assert_array_equal(embeddings, [[1, 1, 1, 1], [0, 0, 0, 0]])
+    assert hashes == [embedding.entry_hash(stock), embedding.entry_hash(weather)]
@@ -0,0 +1,108 @@
+import sys
+import os
+import subprocess
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selection.result_cache import ResultCache, cached_run, model_fingerprint
+
+class CountingRuntime:
+    def __init__(self, returncode=0):
+        self.returncode = returncode
+        self.calls = 0
+
+    def run(self, model_path):
+        self.calls += 1
+        return subprocess.CompletedProcess(['python', model_path], self.returncode, f"run {self.calls}\n", '')
+
+def make_model(directory, name='predict.py'):
+    directory.mkdir(parents=True, exist_ok=True)
+    script = directory / name
+    script.write_text("def run():\n    print('Positive')\n")
+    (directory / 'model.pth').write_bytes(b'weights')
+    return str(script)
+
+def touch(path):
+    # Move mtime forward explicitly so the change is visible on coarse-grained filesystems
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+def test_repeated_runs_are_served_from_cache(tmp_path):
+    script = make_model(tmp_path / 'diabetes')
+    runtime = CountingRuntime()
+    cache = ResultCache(max_entries=4)
+
+    first = cached_run(runtime, script, cache=cache)
+    second = cached_run(runtime, script, cache=cache)
+
+    assert runtime.calls == 1
+    assert second.stdout == first.stdout
+    assert cache.stats() == {'entries': 1, 'hits': 1, 'misses': 1}
+
+    cached_run(runtime, script, payload={'glucose': 148}, cache=cache)
+    cached_run(runtime, script, payload={'glucose': 90}, cache=cache)
+    assert runtime.calls == 3
+
+def test_changed_script_or_weights_invalidate_results(tmp_path):
+    script = make_model(tmp_path / 'diabetes')
+    runtime = CountingRuntime()
+    cache = ResultCache(max_entries=4)
+
+    cached_run(runtime, script, cache=cache)
+    fingerprint = model_fingerprint(script)
+
+    touch(tmp_path / 'diabetes' / 'model.pth')
+    assert model_fingerprint(script) != fingerprint
+    assert cached_run(runtime, script, cache=cache).stdout == 'run 2\n'
+
+    touch(script)
+    assert cached_run(runtime, script, cache=cache).stdout == 'run 3\n'
+    assert cached_run(runtime, script, cache=cache).stdout == 'run 3\n'
+    # Outputs of the older versions are dropped rather than left to age out
+    assert cache.stats()['entries'] == 1
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    scripts = [make_model(tmp_path / name) for name in ('a', 'b', 'c')]
+    runtime = CountingRuntime()
+    cache = ResultCache(max_entries=2)
+
+    cached_run(runtime, scripts[0], cache=cache)
+    cached_run(runtime, scripts[1], cache=cache)
+    cached_run(runtime, scripts[0], cache=cache)
+    cached_run(runtime, scripts[2], cache=cache)
+    assert runtime.calls == 3
+
+    cached_run(runtime, scripts[0], cache=cache)
+    assert runtime.calls == 3
+    cached_run(runtime, scripts[1], cache=cache)
+    assert runtime.calls == 4
+
+def test_failures_and_missing_scripts_are_not_cached(tmp_path):
+    script = make_model(tmp_path / 'broken')
+    runtime = CountingRuntime(returncode=1)
+    cache = ResultCache(max_entries=4)
+
+    cached_run(runtime, script, cache=cache)
+    cached_run(runtime, script, cache=cache)
+    cached_run(runtime, str(tmp_path / 'missing.py'), cache=cache)
+    cached_run(runtime, str(tmp_path / 'missing.py'), cache=cache)
+    assert runtime.calls == 4
+    assert cache.stats()['entries'] == 0
+
+def test_warm_runtime_never_caches_a_stale_output(tmp_path):
+    from selection.model_runtime import ModelRuntime
+
+    script = make_model(tmp_path / 'versioned')
+    cache = ResultCache(max_entries=4)
+    runtime = ModelRuntime(num_workers=1, timeout=30)
+    try:
+        assert cached_run(runtime, script, cache=cache).stdout == 'Positive\n'
+
+        with open(script, 'w') as f:
+            f.write("def run():\n    print('Negative')\n")
+        touch(script)
+        assert cached_run(runtime, script, cache=cache).stdout == 'Negative\n'
+        assert cached_run(runtime, script, cache=cache).stdout == 'Negative\n'
+    finally:
+        runtime.close()
+    assert cache.stats() == {'entries': 1, 'hits': 1, 'misses': 2}
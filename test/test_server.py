@@ -0,0 +1,181 @@
+import sys
+import os
+import time
+import asyncio
+import subprocess
+import threading
+import httpx
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selection.batching import MicroBatcher
+from selection.server import SelectionServer
+from selection.result_cache import ResultCache
+
+class RecordingBatchFn:
+    """Stands in for BERT: picks a model by query length and records batch sizes."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batch_sizes = []
+
+    def __call__(self, queries):
+        self.batch_sizes.append(len(queries))
+        time.sleep(self.delay)
+        return [(f"model_{len(query)}.py", 1.0) for query in queries]
+
+class FakeRuntime:
+    def __init__(self):
+        self.paths = []
+
+    def run(self, model_path, timeout=None, deadline=None):
+        self.paths.append(model_path)
+        return subprocess.CompletedProcess(['python', model_path], 0, 'Positive\n', '')
+
+def test_concurrent_requests_share_batches():
+    batch_fn = RecordingBatchFn(delay=0.01)
+
+    async def main():
+        batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait=0.05)
+        results = await asyncio.gather(*[batcher.submit('q' * i) for i in range(1, 21)])
+        await batcher.close()
+        return results
+
+    results = asyncio.run(main())
+
+    assert results == [(f"model_{i}.py", 1.0) for i in range(1, 21)]
+    assert sum(batch_fn.batch_sizes) == 20
+    assert max(batch_fn.batch_sizes) == 8
+    assert len(batch_fn.batch_sizes) == 3
+
+def test_a_lone_request_waits_at_most_max_wait():
+    batch_fn = RecordingBatchFn()
+
+    async def main():
+        batcher = MicroBatcher(batch_fn, max_batch_size=32, max_wait=0.02)
+        start = time.perf_counter()
+        result = await batcher.submit('rain')
+        elapsed = time.perf_counter() - start
+        await batcher.close()
+        return result, elapsed
+
+    result, elapsed = asyncio.run(main())
+
+    assert result == ('model_4.py', 1.0)
+    assert elapsed < 0.5
+    assert batch_fn.batch_sizes == [1]
+
+def test_batch_errors_reach_every_caller():
+    def failing(queries):
+        raise RuntimeError("encoder unavailable")
+
+    async def main():
+        batcher = MicroBatcher(failing, max_wait=0.01)
+        results = await asyncio.gather(batcher.submit('a'), batcher.submit('b'), return_exceptions=True)
+        await batcher.close()
+        return results
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(main()))
+
+def start_server(server):
+    address = {}
+    ready = threading.Event()
+    loop = asyncio.new_event_loop()
+
+    def on_ready(bound):
+        address['url'] = f"http://{bound[0]}:{bound[1]}"
+        ready.set()
+
+    task = loop.create_task(server.serve('127.0.0.1', 0, ready=on_ready))
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert ready.wait(5)
+    return address['url'], loop, task
+
+def test_http_endpoints():
+    batch_fn = RecordingBatchFn(delay=0.01)
+    runtime = FakeRuntime()
+    server = SelectionServer(max_batch_size=16, max_wait=0.02, embedding_batch_fn=batch_fn, runtime=runtime,
+                             result_cache=ResultCache(max_entries=8))
+    url, loop, task = start_server(server)
+    try:
+        async def concurrent_selects():
+            async with httpx.AsyncClient(base_url=url) as client:
+                return await asyncio.gather(*[client.post('/select', json={'query': 'q' * i}) for i in range(1, 11)])
+
+        responses = asyncio.run(concurrent_selects())
+        assert [r.json()['model_path'] for r in responses] == [f"model_{i}.py" for i in range(1, 11)]
+        assert len(batch_fn.batch_sizes) < 10
+
+        with httpx.Client(base_url=url) as client:
+            keyword = client.post('/select', json={'query': 'Will it rain tomorrow?', 'method': 'keyword'})
+            assert keyword.json()['model_path'] == 'weather_model.py'
+
+            run = client.post('/run', json={'model_path': './models/diabetes_prediction/predict.py'})
+            assert run.status_code == 200
+            assert run.json()['stdout'] == 'Positive'
+            assert runtime.paths[0].endswith(os.path.join('models', 'diabetes_prediction', 'predict.py'))
+            again = client.post('/run', json={'model_path': './models/diabetes_prediction/predict.py'})
+            assert again.json()['stdout'] == 'Positive'
+            assert len(runtime.paths) == 1
+
+            assert client.post('/run', json={'model_path': '/etc/passwd'}).status_code == 404
+
+            fan_out = client.post('/run', json={'model_paths': ['./models/diabetes_prediction/predict.py',
+                                                                './models/heart_disease_prediction/predict.py']})
+            assert fan_out.status_code == 200
+            assert [result['status'] for result in fan_out.json()['results']] == ['ok', 'ok']
+            assert fan_out.json()['results'][1]['model_path'] == './models/heart_disease_prediction/predict.py'
+            assert not fan_out.json()['partial']
+            assert client.post('/run', json={'model_paths': ['/etc/passwd']}).status_code == 404
+            for deadline in ('soon', -1, 0, True, [5]):
+                bad_deadline = client.post('/run', json={'model_paths': ['./models/diabetes_prediction/predict.py'],
+                                                         'deadline': deadline})
+                assert bad_deadline.status_code == 400, deadline
+            nothing = client.post('/run', json={'query': 'hello there', 'method': 'keyword'})
+            assert nothing.status_code == 422
+            assert 'No model selected' in nothing.json()['error']
+            assert client.post('/select', json={'query': ''}).status_code == 400
+            assert client.post('/select', content=b'not json').status_code == 400
+            assert client.get('/select').status_code == 405
+            assert client.get('/missing').status_code == 404
+
+            health = client.get('/health').json()
+            assert health['status'] == 'ok'
+            assert health['batching']['items'] == 10
+            assert health['result_cache']['hits'] == 2
+
+            metrics = client.get('/metrics')
+            assert metrics.headers['content-type'].startswith('text/plain')
+            assert '# TYPE dama_stage_duration_seconds histogram' in metrics.text
+    finally:
+        loop.call_soon_threadsafe(task.cancel)
+        server.close()
+
+def test_cheap_selectors_run_off_the_event_loop(monkeypatch):
+    from selection import keyword_based_selection, bm25_selection, random_selection
+
+    threads = []
+    def recording(result):
+        def select(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return result
+        return select
+    monkeypatch.setattr(keyword_based_selection, 'keyword_model_scores', recording({'keyword.py': 1.0}))
+    monkeypatch.setattr(bm25_selection, 'bm25_top_k', recording([('bm25.py', 2.0)]))
+    monkeypatch.setattr(random_selection, 'random_model_selection', recording('random.py'))
+    server = SelectionServer(embedding_batch_fn=RecordingBatchFn(), runtime=FakeRuntime(),
+                             result_cache=ResultCache(max_entries=8))
+
+    async def select_all():
+        return [await server.select('query', method) for method in ('keyword', 'bm25', 'random')]
+
+    assert asyncio.run(select_all()) == [('keyword.py', 1.0), ('bm25.py', 2.0), ('random.py', None)]
+    assert len(threads) == 3 and all(name.startswith('server') for name in threads)
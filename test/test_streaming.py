@@ -0,0 +1,79 @@
+import sys
+import os
+import time
+import json
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import openai
+import pytest
+import selection.main as chat
+from test.mock_openai_server import MockOpenAIServer
+
+@pytest.fixture
+def mock_chat(monkeypatch):
+    servers = []
+    def start(reply, token_delay=0.0):
+        server = MockOpenAIServer(responder=lambda request: reply, token_delay=token_delay).start()
+        servers.append(server)
+        monkeypatch.setattr(chat, 'client', openai.OpenAI(base_url=server.base_url, api_key='test'))
+        return server
+    yield start
+    for server in servers:
+        server.stop()
+
+def test_text_is_streamed_token_by_token(mock_chat, monkeypatch):
+    monkeypatch.setattr(chat, 'memory', chat.TokenBudgetMemory(background=False))
+    mock_chat({'content': "Could you tell me which condition you are asking about?"}, token_delay=0.01)
+    tokens = []
+
+    answer = chat.get_completion("I need a health prediction", stream=True, on_token=tokens.append)
+
+    assert len(tokens) > 1
+    assert ''.join(tokens) == answer == "Could you tell me which condition you are asking about?"
+    assert "Human: I need a health prediction" in chat.memory.load_memory_variables({})['history']
+
+def test_model_starts_before_the_stream_ends(mock_chat, monkeypatch):
+    started = []
+    def run_model(model_path):
+        started.append((model_path, time.monotonic()))
+        return "Positive"
+    monkeypatch.setattr(chat, 'run_model', run_model)
+    arguments = json.dumps({'model_path': './models/diabetes_prediction/predict.py'})
+    mock_chat({'function_call': {'name': 'run_model', 'arguments': arguments}, 'trailing_chunks': 20},
+              token_delay=0.02)
+
+    answer = chat.get_completion("Run the diabetes model", stream=True)
+    finished = time.monotonic()
+
+    assert answer == "Positive"
+    assert started[0][0] == './models/diabetes_prediction/predict.py'
+    # The 20 trailing chunks take ~0.4s after the arguments are complete
+    assert finished - started[0][1] > 0.2
+
+def test_streamed_and_plain_answers_match(mock_chat):
+    arguments = json.dumps({'model_path': 'weather_model.py'})
+    server = mock_chat({'function_call': {'name': 'run_model', 'arguments': arguments}})
+
+    streamed = chat.get_completion("Will it rain?", stream=True)
+    plain = chat.get_completion("Will it rain?")
+
+    assert streamed == plain
+    assert streamed.startswith("Error running the model at weather_model.py")
+    assert [request.get('stream', False) for request in server.requests] == [True, False]
+
+def test_run_models_call_fans_out(mock_chat, monkeypatch):
+    requested = []
+    def fan_out(model_paths):
+        requested.append(model_paths)
+        return [{'model_path': path, 'status': 'ok', 'output': 'Positive', 'elapsed': 0.1} for path in model_paths]
+    monkeypatch.setattr(chat, 'fan_out', fan_out)
+    model_paths = ['./models/heart_disease_prediction/predict.py', './models/diabetes_prediction/predict.py']
+    mock_chat({'function_call': {'name': 'run_models', 'arguments': json.dumps({'model_paths': model_paths})}})
+
+    streamed = chat.get_completion("What is my heart and diabetes risk?", stream=True)
+    plain = chat.get_completion("What is my heart and diabetes risk?")
+
+    assert streamed == plain == '\n'.join(f"{path}: Positive" for path in model_paths)
+    assert requested == [model_paths, model_paths]
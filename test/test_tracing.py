@@ -0,0 +1,89 @@
+import sys
+import os
+import json
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selection import tracing
+from selection.tracing import span, traced
+
+def test_disabled_spans_record_nothing(tmp_path, monkeypatch):
+    trace_file = tmp_path / 'trace.jsonl'
+    tracing.enable(str(trace_file))
+    tracing.disable()
+    tracing.reset_metrics()
+    recorded = []
+    monkeypatch.setattr(tracing, '_record', lambda finished, exc_type: recorded.append(finished))
+
+    @traced('selection', selector='keyword')
+    def select():
+        tracing.current_span().set(tier='keyword')
+        return 'model.py'
+
+    with span('encoder.forward') as first, span('llm.request') as second:
+        first.set(texts=1)
+        assert tracing.current_span() is first
+    assert select() == 'model.py'
+
+    # Disabled spans are one shared no-op object that is never timed, recorded or written
+    assert first is second
+    assert recorded == []
+    assert tracing.histograms() == {}
+    assert not trace_file.exists()
+
+def test_nested_spans_are_written_to_one_trace(tmp_path):
+    trace_file = tmp_path / 'trace.jsonl'
+    tracing.reset_metrics()
+    tracing.enable(str(trace_file))
+
+    @traced('selection', selector='embedding')
+    def select():
+        with span('encoder.forward', texts=1):
+            time.sleep(0.002)
+        with span('embedding.search') as search:
+            search.set(models=3)
+        return 'model.py'
+
+    try:
+        assert select() == 'model.py'
+        try:
+            with span('llm.request'):
+                raise TimeoutError
+        except TimeoutError:
+            pass
+    finally:
+        tracing.disable()
+
+    records = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    forward, search, selection, failed = records
+    assert forward['name'] == 'encoder.forward' and forward['duration_ms'] >= 2
+    assert forward['parent_id'] == search['parent_id'] == selection['span_id']
+    assert forward['trace_id'] == search['trace_id'] == selection['trace_id']
+    assert selection['parent_id'] is None and selection['selector'] == 'embedding'
+    assert search['attributes'] == {'models': 3}
+    assert failed['error'] == 'TimeoutError' and failed['trace_id'] != selection['trace_id']
+
+    histograms = tracing.histograms()
+    assert histograms[('selection', 'embedding')].count == 1
+    assert histograms[('llm.request', '')].errors == 1
+
+def test_metrics_render_in_prometheus_format(tmp_path):
+    tracing.reset_metrics()
+    tracing.enable()
+    try:
+        for _ in range(3):
+            with span('selection', selector='keyword'):
+                pass
+    finally:
+        tracing.disable()
+
+    text = tracing.render_metrics()
+    assert '# TYPE dama_stage_duration_seconds histogram' in text
+    assert 'dama_stage_duration_seconds_bucket{stage="selection",selector="keyword",le="+Inf"} 3' in text
+    assert 'dama_stage_duration_seconds_count{stage="selection",selector="keyword"} 3' in text
+    assert 'dama_stage_errors_total{stage="selection",selector="keyword"} 0' in text
+
+    path = tracing.write_metrics(str(tmp_path / 'metrics.prom'))
+    with open(path) as f:
+        assert f.read() == text
@@ -0,0 +1,205 @@
+import sys
+import os
+import json
+import time
+import argparse
+import itertools
+import numpy as np
+from rich.table import Table
+from rich.console import Console
+from rich.progress import Progress, BarColumn, TextColumn, TimeElapsedColumn
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selection.cascade_selection import tier_selectors, llm_tier, default_tiers, estimate_llm_call
+from selection.registry import get_registry
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+test_queries_path = os.path.join(base_dir, 'test_queries.json')
+
+with open(test_queries_path) as f:
+    test_queries = json.load(f)
+
+console = Console()
+
+def collect(tiers, offline, llm_latency):
+    """Runs every tier on every test query once.
+
+    Returns:
+        list: Per query, a dict mapping tier to (correct, answered, confidence, seconds).
+    """
+    if 'embedding' in tiers:
+        from selection.embedding_based_selection import warm_up
+        warm_up()
+
+    records = []
+    with Progress(
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        "[progress.percentage]{task.percentage:>3.0f}%",
+        "•",
+        TimeElapsedColumn(),
+    ) as progress:
+        task = progress.add_task("Running tiers...", total=len(test_queries))
+        for test_case in test_queries:
+            query = test_case['user_query']
+            record = {}
+            for tier in tiers:
+                if tier == 'llm' and offline:
+                    # No API calls: the LLM is assumed to always be right, an upper bound
+                    record[tier] = (True, True, 1.0, llm_latency)
+                    continue
+                select = (lambda message: llm_tier(message, use_cache=False)) if tier == 'llm' else tier_selectors[tier]
+                start = time.perf_counter()
+                model_path, confidence = select(query)
+                seconds = time.perf_counter() - start
+                record[tier] = (model_path == test_case['expected_model'], bool(model_path), confidence, seconds)
+            records.append(record)
+            progress.advance(task)
+    return records
+
+def simulate(records, tiers, thresholds, llm_cost):
+    """Replays the cascade on collected tier results.
+
+    A tier whose threshold is None is left out of the cascade; the last tier
+    answers whenever its confidence is above zero, as in cascade_model_selection.
+
+    Returns:
+        dict: Accuracy, mean latency, LLM call rate, spend and which tier answered.
+    """
+    active = [tier for tier in tiers if thresholds.get(tier, 0.0) is not None]
+    correct = 0
+    seconds = 0.0
+    llm_calls = 0
+    answered_by = dict.fromkeys(active, 0)
+    for record in records:
+        chosen = None
+        for position, tier in enumerate(active):
+            tier_correct, answered, confidence, tier_seconds = record[tier]
+            seconds += tier_seconds
+            llm_calls += tier == 'llm'
+            last = position == len(active) - 1
+            if answered and (confidence > 0 if last else confidence >= thresholds[tier]):
+                chosen = tier
+                break
+        if chosen is None:
+            # Same fallback as the cascade: the most confident answer seen
+            tried = [tier for tier in active if record[tier][1]]
+            chosen = max(tried, key=lambda tier: record[tier][2]) if tried else active[-1]
+        answered_by[chosen] += 1
+        correct += record[chosen][0]
+    total = len(records)
+    return {
+        'tiers': active,
+        'thresholds': {tier: thresholds[tier] for tier in active if tier != active[-1]},
+        'accuracy': correct / total * 100,
+        'mean_latency_ms': seconds / total * 1000,
+        'llm_call_rate': llm_calls / total,
+        'cost_per_1k_queries': llm_calls / total * 1000 * llm_cost,
+        'answered_by': answered_by,
+    }
+
+def threshold_grid(records, tier, points):
+    """Candidate thresholds for a tier: quantiles of its observed confidences, plus None to skip it."""
+    confidences = [record[tier][2] for record in records if record[tier][1]]
+    if not confidences:
+        return [None]
+    grid = np.unique(np.round(np.quantile(confidences, np.linspace(0, 1, points)), 4))
+    return [None] + [float(value) for value in grid]
+
+def search(records, tiers, points, llm_cost):
+    gated = tiers[:-1]
+    grids = [threshold_grid(records, tier, points) for tier in gated]
+    results = []
+    for combination in itertools.product(*grids):
+        results.append(simulate(records, tiers, dict(zip(gated, combination)), llm_cost))
+    return results
+
+def pareto_front(results):
+    """Keeps the configurations that no other one beats on accuracy, latency and spend at once."""
+    def dominates(a, b):
+        at_least = (a['accuracy'] >= b['accuracy'] and a['mean_latency_ms'] <= b['mean_latency_ms']
+                    and a['cost_per_1k_queries'] <= b['cost_per_1k_queries'])
+        better = (a['accuracy'] > b['accuracy'] or a['mean_latency_ms'] < b['mean_latency_ms']
+                  or a['cost_per_1k_queries'] < b['cost_per_1k_queries'])
+        return at_least and better
+    front = [result for result in results if not any(dominates(other, result) for other in results)]
+    # Nearby thresholds often route every query the same way; keep the first of each
+    distinct = {}
+    for result in front:
+        key = (tuple(result['tiers']), result['accuracy'], result['mean_latency_ms'], result['cost_per_1k_queries'])
+        distinct.setdefault(key, result)
+    return sorted(distinct.values(), key=lambda result: (-result['accuracy'], result['cost_per_1k_queries']))
+
+def recommend(front, max_accuracy_drop):
+    """The cheapest, then fastest, configuration within max_accuracy_drop points of the best accuracy."""
+    best = max(result['accuracy'] for result in front)
+    eligible = [result for result in front if result['accuracy'] >= best - max_accuracy_drop]
+    return min(eligible, key=lambda result: (result['cost_per_1k_queries'], result['mean_latency_ms']))
+
+def estimated_llm_cost():
+    """Dollars per LLM selection call with the full registry in the prompt, averaged over the test queries."""
+    metadata = get_registry().metadata
+    return float(np.mean([estimate_llm_call(test_case['user_query'], metadata)[1] for test_case in test_queries]))
+
+def describe(result):
+    thresholds = ', '.join(f"{tier}≥{value:g}" for tier, value in result['thresholds'].items())
+    return ' → '.join(result['tiers']) + (f" ({thresholds})" if thresholds else '')
+
+def create_rich_table(front, recommended):
+    table = Table(title="Cascade Configurations (Pareto front)", expand=True)
+
+    table.add_column("Cascade", style="cyan")
+    table.add_column("Accuracy", justify="right", style="green")
+    table.add_column("Mean latency (ms)", justify="right", style="yellow")
+    table.add_column("LLM calls", justify="right", style="blue")
+    table.add_column("$ / 1k queries", justify="right", style="magenta")
+    table.add_column("Answered by", style="white")
+
+    for result in front:
+        marker = "[bold]*[/bold] " if result is recommended else ''
+        table.add_row(
+            marker + describe(result),
+            f"{result['accuracy']:.2f}%",
+            f"{result['mean_latency_ms']:.1f}",
+            f"{result['llm_call_rate'] * 100:.0f}%",
+            f"{result['cost_per_1k_queries']:.2f}",
+            ', '.join(f"{tier} {count}" for tier, count in result['answered_by'].items()),
+        )
+
+    return table
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Tune the selector cascade thresholds on test_queries.json.')
+    parser.add_argument('--tiers', nargs='+', choices=list(tier_selectors), default=list(default_tiers),
+                        help='Tiers to consider, cheapest first')
+    parser.add_argument('--offline', action='store_true',
+                        help='Do not call the LLM; assume it is always right and takes --llm-latency seconds')
+    parser.add_argument('--llm-latency', type=float, default=1.0, help='Seconds per LLM call with --offline')
+    parser.add_argument('--llm-cost', type=float, help='Dollars per LLM call; estimated from prompt size by default')
+    parser.add_argument('--points', type=int, default=11, help='Candidate thresholds per tier')
+    parser.add_argument('--max-accuracy-drop', type=float, default=1.0,
+                        help='Accuracy points to give up, at most, for a cheaper cascade')
+    parser.add_argument('-o', '--output', default='cascade_tuning.json', help='JSON file for the results')
+    args = parser.parse_args()
+
+    llm_cost = args.llm_cost if args.llm_cost is not None else estimated_llm_cost()
+    records = collect(args.tiers, args.offline, args.llm_latency)
+    front = pareto_front(search(records, args.tiers, args.points, llm_cost))
+    recommended = recommend(front, args.max_accuracy_drop)
+
+    console.print(create_rich_table(front, recommended))
+    console.print(f"Recommended: {describe(recommended)}")
+    console.print(f"CASCADE_TIERS={','.join(recommended['tiers'])}")
+    for tier, value in recommended['thresholds'].items():
+        console.print(f"CASCADE_{tier.upper()}_THRESHOLD={value:g}")
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'offline': args.offline,
+            'llm_cost_per_call': llm_cost,
+            'recommended': recommended,
+            'pareto_front': front,
+        }, f, indent=2)
+    console.print(f"Results written to {args.output}")
@@ -0,0 +1,197 @@
+import gc
+import sys
+import os
+import json
+import time
+import argparse
+import subprocess
+import numpy as np
+from rich.table import Table
+from rich.console import Console
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmark_selection import peak_rss_mb
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+test_queries_path = os.path.join(base_dir, 'test_queries.json')
+
+# Accuracy a fast backend may lose against fp32 on test_queries.json, in percentage points
+default_tolerance = 2.0
+
+
+def current_rss_mb():
+    """Resident memory right now, from /proc on Linux; None elsewhere."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def run_worker(backend, repeats):
+    """Measures one encoder backend in this process and returns its result row."""
+    from selection.encoders import load_encoder
+    from selection.embedding_based_selection import encoder_name, model_text, normalize
+    from selection.registry import get_registry
+
+    with open(test_queries_path) as f:
+        test_queries = json.load(f)
+    queries = [test_case['user_query'] for test_case in test_queries]
+    models = get_registry().models
+
+    start = time.perf_counter()
+    encoder = load_encoder(encoder_name, backend)
+    load_seconds = time.perf_counter() - start
+
+    model_embeddings = normalize(encoder.embed([model_text(model) for model in models]))
+    query_embeddings = normalize(encoder.embed(queries))
+    gc.collect()
+    rss_after_load = current_rss_mb()
+    predictions = [models[i]['model_path'] for i in np.argmax(query_embeddings @ model_embeddings.T, axis=1)]
+    correct = sum(prediction == test_case['expected_model'] for prediction, test_case in zip(predictions, test_queries))
+
+    # One query per call is what the interactive selectors and the server's lone requests see
+    single = []
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            encoder.embed([query])
+            single.append(time.perf_counter() - start)
+
+    batch = (queries * (32 // len(queries) + 1))[:32]
+    batched = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        encoder.embed(batch)
+        batched.append(time.perf_counter() - start)
+
+    return {
+        'backend': backend,
+        'accuracy': correct / len(test_queries) * 100,
+        'predictions': predictions,
+        'query_embeddings': query_embeddings.tolist(),
+        'load_s': load_seconds,
+        'single_p50_ms': float(np.percentile(single, 50) * 1000),
+        'batch32_ms': float(np.median(batched) * 1000),
+        'rss_mb': rss_after_load,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+def prepare_worker(backend):
+    """Loads the backend once so one-off work such as the ONNX export is not measured."""
+    from selection.encoders import load_encoder
+    from selection.embedding_based_selection import encoder_name
+    load_encoder(encoder_name, backend)
+    return {'backend': backend}
+
+def run_in_subprocess(backend, repeats, timeout, prepare=False):
+    """Runs one backend in a fresh interpreter so its memory use is its own."""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', backend, '--repeats', str(repeats)]
+        + (['--prepare'] if prepare else []),
+        capture_output=True, text=True, cwd=base_dir, timeout=timeout
+    )
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        error = (result.stderr.strip().splitlines() or ['unknown error'])[-1]
+        return {'backend': backend, 'error': error}
+    return json.loads(lines[-1])
+
+def compare_to_reference(row, reference, tolerance):
+    """Adds agreement, embedding similarity and the pass/fail verdict against the fp32 row."""
+    if 'error' in row:
+        row['passed'] = False
+        return row
+    agreement = np.mean([a == b for a, b in zip(row['predictions'], reference['predictions'])])
+    cosines = np.sum(np.array(row['query_embeddings']) * np.array(reference['query_embeddings']), axis=1)
+    row.update({
+        'top1_agreement': float(agreement * 100),
+        'min_cosine_to_fp32': float(cosines.min()),
+        'accuracy_drop': reference['accuracy'] - row['accuracy'],
+        'speedup_single': reference['single_p50_ms'] / row['single_p50_ms'],
+        'speedup_batch32': reference['batch32_ms'] / row['batch32_ms'],
+        'rss_saved_mb': (reference['rss_mb'] - row['rss_mb']) if row['rss_mb'] is not None else None,
+    })
+    row['passed'] = row['accuracy_drop'] <= tolerance
+    return row
+
+def create_rich_table(results, tolerance):
+    table = Table(title=f"Encoder Backends (tolerance {tolerance:.1f} pp accuracy vs fp32)", expand=True)
+
+    table.add_column("Backend", style="cyan")
+    table.add_column("Accuracy", justify="right", style="green")
+    table.add_column("Top-1 = fp32", justify="right", style="green")
+    table.add_column("Min Cosine", justify="right", style="green")
+    table.add_column("1 Query (ms)", justify="right", style="yellow")
+    table.add_column("32 Queries (ms)", justify="right", style="yellow")
+    table.add_column("Speed-up", justify="right", style="blue")
+    table.add_column("RSS (MB)", justify="right", style="magenta")
+    table.add_column("Peak RSS (MB)", justify="right", style="magenta")
+    table.add_column("Pass", justify="center")
+
+    for row in results:
+        if 'error' in row:
+            table.add_row(row['backend'], f"[red]{row['error'][:60]}[/red]", '', '', '', '', '', '', '', "❌")
+            continue
+        table.add_row(
+            row['backend'],
+            f"{row['accuracy']:.2f}%",
+            f"{row['top1_agreement']:.0f}%",
+            f"{row['min_cosine_to_fp32']:.4f}",
+            f"{row['single_p50_ms']:.1f}",
+            f"{row['batch32_ms']:.1f}",
+            f"{row['speedup_single']:.1f}x / {row['speedup_batch32']:.1f}x",
+            '-' if row['rss_mb'] is None else f"{row['rss_mb']:.0f}",
+            f"{row['peak_rss_mb']:.0f}",
+            "✔️" if row['passed'] else "❌",
+        )
+
+    return table
+
+if __name__ == "__main__":
+    from selection.encoders import encoder_backends
+
+    parser = argparse.ArgumentParser(description='Check that fast encoder backends route test_queries.json like fp32 BERT.')
+    parser.add_argument('-b', '--backends', nargs='+', choices=encoder_backends, default=list(encoder_backends[1:]),
+                        help='Backends to validate against fp32')
+    parser.add_argument('-t', '--tolerance', type=float, default=default_tolerance,
+                        help='Accuracy in percentage points a backend may lose against fp32')
+    parser.add_argument('-r', '--repeats', type=int, default=5, help='Timing repeats over the test queries')
+    parser.add_argument('--timeout', type=float, default=1800, help='Seconds allowed per backend')
+    parser.add_argument('-o', '--output', help='Write the results as JSON to this file')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--prepare', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(prepare_worker(args.worker) if args.prepare else run_worker(args.worker, args.repeats)))
+        sys.exit(0)
+
+    console = Console()
+    console.print("Running fp32...")
+    reference = run_in_subprocess('fp32', args.repeats, args.timeout)
+    if 'error' in reference:
+        console.print(f"[red]fp32 reference failed: {reference['error']}[/red]")
+        sys.exit(2)
+    results = [compare_to_reference(dict(reference), reference, args.tolerance)]
+    for backend in args.backends:
+        if backend == 'fp32':
+            continue
+        console.print(f"Running {backend}...")
+        if backend.startswith('onnx'):
+            prepared = run_in_subprocess(backend, args.repeats, args.timeout, prepare=True)
+            if 'error' in prepared:
+                results.append(compare_to_reference(prepared, reference, args.tolerance))
+                continue
+        results.append(compare_to_reference(run_in_subprocess(backend, args.repeats, args.timeout), reference, args.tolerance))
+
+    console.print(create_rich_table(results, args.tolerance))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump([{k: v for k, v in row.items() if k != 'query_embeddings'} for row in results], f, indent=2)
+
+    sys.exit(0 if all(row['passed'] for row in results) else 1)